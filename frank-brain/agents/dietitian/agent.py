@@ -0,0 +1,191 @@
+from langchain.schema import HumanMessage, SystemMessage
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import re
+import time
+from dotenv import load_dotenv
+from agents.llm.gateway import get_gateway
+from agents.websearch.agent import WebSearchAgent
+from agents.websearch.cache import normalize_question
+from .nutrition import NutritionIndex, describe_portion
+from .store import MealStore, MealStoreFullError, day_key
+
+load_dotenv()
+
+CALORIES_PROMPT = "Przeszukaj internet i podaj wartość kaloryczną: {text}. Odpowiedz krótko, podaj liczbę kcal."
+MEAL_EXTRACTION_PROMPT = (
+    "Użytkownik mówi, co zjadł lub wypił. Wypisz każdy produkt jako obiekt JSON z polami: "
+    "\"product\" (nazwa w mianowniku liczby pojedynczej), \"quantity\" (liczba), "
+    "\"unit\" (\"g\", \"ml\" albo \"szt\") i \"calories\" (szacowane kcal dla całej porcji, liczba). "
+    "Zwróć wyłącznie listę JSON, bez komentarza. Jeśli nic nie zjedzono, zwróć []."
+)
+
+# Patterns on normalized text (lowercase, no diacritics, no punctuation)
+SUMMARY_PATTERN = re.compile(r"\b(ile|podsumuj\w*|bilans\w*|suma|razem)\b")
+SUMMARY_SUBJECT_PATTERN = re.compile(r"\b(zjadl\w*|zjedli\w*|wypil\w*|kalori\w*|kcal|bilans\w*|podsumuj\w*)\b")
+EATEN_PATTERN = re.compile(r"\b(zjadl\w*|zjedli\w*|wypil\w*)\b")
+MEAL_PATTERN = re.compile(r"\b(zjadl\w*|zjedli\w*|wypil\w*|zapisz|dodaj|na (sniadanie|obiad|kolacje|podwieczorek))\b")
+YESTERDAY_PATTERN = re.compile(r"\bwczoraj\w*\b")
+WEEK_PATTERN = re.compile(r"\b(tydzien|tygodni\w*)\b")
+TODAY_PATTERN = re.compile(r"\b(dzis\w*|dzien|dnia)\b")
+# The local index only knows calories; other nutrients still go to the web
+NUTRIENT_PATTERN = re.compile(r"\b(bialk\w*|tluszcz\w*|weglowodan\w*|blonnik\w*|witamin\w*|cholesterol\w*|sol|soli)\b")
+
+SUMMARY = "summary"  # totals from the rollups, no LLM
+MEAL = "meal"        # extract products with the LLM and log them
+LOOKUP = "lookup"    # "how many calories does X have" - web search
+
+
+class DietitianAgent:
+    """
+    Counts calories and keeps the meal log (PRD F9).
+
+    Three kinds of requests, told apart with regexes (no LLM call):
+    totals ("ile dziś zjadłem") are answered straight from the MealStore
+    rollups; meals ("zjadłem dwa jajka") and calorie questions ("ile
+    kalorii ma banan") are looked up in the local NutritionIndex. Only
+    foods the index does not know fall back to the LLM (meals) or to a
+    web search (questions).
+    """
+
+    def __init__(self, websearch_agent: WebSearchAgent, store: Optional[MealStore] = None,
+                 nutrition: Optional[NutritionIndex] = None, model_name: str = "gpt-4o-mini",
+                 temperature: float = 0.0, callbacks: Optional[list] = None):
+        self.websearch_agent = websearch_agent
+        self.store = store or MealStore()
+        self.nutrition = nutrition or NutritionIndex.load()
+        self.llm = get_gateway().chat("dietitian", model=model_name, temperature=temperature, callbacks=callbacks)
+
+    @staticmethod
+    def classify(text: str) -> Tuple[str, Optional[str]]:
+        """
+        Decide how to handle a calorie-related request
+
+        Returns:
+            tuple: (SUMMARY, "today" | "yesterday" | "week"), (MEAL, None) or (LOOKUP, None)
+        """
+        normalized = normalize_question(text)
+        if SUMMARY_PATTERN.search(normalized) and SUMMARY_SUBJECT_PATTERN.search(normalized):
+            if WEEK_PATTERN.search(normalized):
+                return SUMMARY, "week"
+            if YESTERDAY_PATTERN.search(normalized):
+                return SUMMARY, "yesterday"
+            if TODAY_PATTERN.search(normalized) or EATEN_PATTERN.search(normalized):
+                return SUMMARY, "today"
+        if MEAL_PATTERN.search(normalized) and not normalized.startswith("ile "):
+            return MEAL, None
+        return LOOKUP, None
+
+    def summary(self, period: str = "today") -> dict:
+        """Calories eaten today, yesterday or this week - a rollup lookup"""
+        if period == "week":
+            totals = self.store.week_total()
+            label = "W tym tygodniu"
+        elif period == "yesterday":
+            totals = self.store.day_total(day_key(time.time() - 24 * 3600))
+            label = "Wczoraj"
+        else:
+            totals = self.store.day_total()
+            label = "Dzisiaj"
+
+        if totals["meals"] == 0:
+            answer = f"{label} nie zapisano żadnego posiłku."
+        elif totals["meals"] == 1:
+            answer = f"{label} {round(totals['calories'])} kcal w jednym posiłku."
+        else:
+            answer = f"{label} {round(totals['calories'])} kcal w {totals['meals']} posiłkach."
+        return {"answer": answer, "success": True, "cached": False, "action": SUMMARY, "totals": totals}
+
+    @staticmethod
+    def _parse_meals(content: str) -> List[Dict[str, Any]]:
+        match = re.search(r"\[.*\]", content, re.DOTALL)
+        if match is None:
+            return []
+        meals = []
+        for item in json.loads(match.group(0)):
+            try:
+                calories = float(item["calories"])
+                quantity = float(item["quantity"]) if item.get("quantity") is not None else None
+            except (KeyError, TypeError, ValueError):
+                continue
+            if item.get("product") and calories >= 0:
+                meals.append({"product": str(item["product"]), "quantity": quantity,
+                              "unit": item.get("unit"), "calories": calories})
+        return meals
+
+    async def alog_meal(self, text: str) -> dict:
+        """
+        Log what the user ate
+
+        Args:
+            text (str): Transcript, e.g. "zjadłem dwa jajka i kromkę chleba"
+
+        Returns:
+            dict: answer with what was saved and today's total, success flag and the saved meals
+        """
+        items = self.nutrition.parse_items(text)
+        if items is not None:
+            meals = [{"product": item["food"], "quantity": round(item["grams"]), "unit": "g", "calories": item["kcal"]}
+                     for item in items]
+        else:
+            try:
+                message = await self.llm.ainvoke([
+                    SystemMessage(content=MEAL_EXTRACTION_PROMPT),
+                    HumanMessage(content=text)
+                ])
+                meals = self._parse_meals(message.content)
+            except Exception as e:
+                return {"answer": f"Error during meal logging: {str(e)}", "success": False, "cached": False,
+                        "action": MEAL, "meals": []}
+        if not meals:
+            return {"answer": "Nie rozpoznałem, co zostało zjedzone.", "success": False, "cached": False,
+                    "action": MEAL, "meals": []}
+
+        saved = []
+        try:
+            for meal in meals:
+                saved.append(self.store.add(**meal))
+        except MealStoreFullError:
+            answer = "Nie udało się zapisać posiłku, spróbuj za chwilę."
+            if saved:
+                answer += " Zapisano tylko: " + ", ".join(meal["product"] for meal in saved) + "."
+            return {"answer": answer, "success": False, "cached": False, "action": MEAL, "meals": saved}
+        items = ", ".join(f"{meal['product']} ({round(meal['calories'])} kcal)" for meal in saved)
+        today = self.store.day_total()
+        return {
+            "answer": f"Zapisano: {items}. Dzisiaj razem {round(today['calories'])} kcal.",
+            "success": True,
+            "cached": False,
+            "action": MEAL,
+            "meals": saved
+        }
+
+    async def alookup(self, text: str) -> dict:
+        """Calories of one food: the local index, a web search for foods it does not know"""
+        found = None if NUTRIENT_PATTERN.search(normalize_question(text)) else self.nutrition.lookup(text)
+        if found is not None:
+            answer = (f"{found['food'].capitalize()}, {describe_portion(found)}: około {round(found['kcal'])} kcal "
+                      f"({found['kcal_100g']:g} kcal w 100 g).")
+            return {"answer": answer, "success": True, "cached": False, "action": LOOKUP, "nutrition": found}
+        result = await self.websearch_agent.asearch(CALORIES_PROMPT.format(text=text), cache_key=text)
+        return {**result, "action": LOOKUP}
+
+    async def arun(self, text: str) -> dict:
+        """
+        Handle one calorie-related transcript
+
+        Args:
+            text (str): Transcribed user request
+
+        Returns:
+            dict: answer, success flag, cached flag and the action taken (summary, meal or lookup)
+        """
+        action, period = self.classify(text)
+        if action == SUMMARY:
+            return self.summary(period)
+        if action == MEAL:
+            return await self.alog_meal(text)
+        return await self.alookup(text)
+
+    def close(self):
+        self.store.close()
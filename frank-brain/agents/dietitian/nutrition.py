@@ -0,0 +1,315 @@
+import bisect
+import csv
+import logging
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from agents.websearch.cache import normalize_question
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FOODS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "foods_pl.csv")
+
+# Noun and adjective case endings stripped from folded words, longest first; "chleba" -> "chleb"
+_SUFFIXES = ("iego", "iemu", "ego", "emu", "ich", "imi", "ych", "ymi", "ami", "ach", "owi", "ow", "om", "em",
+             "ej", "im", "ym", "ie", "y", "a", "e", "i", "o", "u")
+_MIN_STEM = 3
+_FLEETING_E = (("ek", "k"), ("ier", "r"))
+
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)?|[^\W\d_]+|,")
+
+NUMBER_WORDS = {
+    "jeden": 1, "jedna": 1, "jedno": 1, "jednego": 1, "jednej": 1,
+    "dwa": 2, "dwie": 2, "dwoch": 2, "dwoma": 2, "trzy": 3, "trzech": 3, "cztery": 4, "czterech": 4,
+    "piec": 5, "pieciu": 5, "szesc": 6, "szesciu": 6, "pol": 0.5, "poltora": 1.5, "poltorej": 1.5
+}
+# Grams (or ml, taken as grams) per unit, matched on the folded word
+MASS_UNITS = {
+    "g": 1, "gr": 1, "gram": 1, "gramy": 1, "gramow": 1, "dag": 10, "dkg": 10, "deko": 10,
+    "kg": 1000, "kilo": 1000, "kilogram": 1000, "kilogramy": 1000, "kilogramow": 1000
+}
+VOLUME_UNITS = {"ml": 1, "mililitr": 1, "mililitry": 1, "mililitrow": 1, "l": 1000, "litr": 1000, "litry": 1000,
+                "litra": 1000, "litrow": 1000}
+# Household measures by word prefix: (prefix, grams or ml, unit)
+MEASURE_PREFIXES = (("szklan", 250, "ml"), ("kub", 250, "ml"), ("puszk", 330, "ml"), ("butelk", 500, "ml"),
+                    ("kielisz", 100, "ml"), ("lyzecz", 5, "g"), ("lyz", 15, "g"))
+PIECE_PREFIXES = ("sztuk", "szt", "kromk", "plaster", "plastr", "porcj", "kawal")
+
+# Words that never name a food; the rest of the request is matched against the index
+STOP_WORDS = {
+    "ile", "ma", "maja", "jest", "sa", "w", "we", "na", "do", "dla", "mi", "ja", "to", "co", "ze", "i", "a",
+    "oraz", "plus", "okolo", "mniej", "wiecej", "podaj", "powiedz", "zapisz", "dodaj", "bylo", "byl", "byla",
+    "byly", "sniadanie", "obiad", "kolacje", "kolacja", "podwieczorek", "drugie", "dzis", "dzisiaj", "wczoraj",
+    "kcal", "mam", "zawiera", "rano", "wieczorem", "teraz", "wlasnie", "chyba", "jeszcze", "juz", "tez", "sobie",
+    "jakies", "jakis", "jakas", "troche"
+}
+STOP_PREFIXES = ("kalori", "kilokalori", "kaloryczn", "zjadl", "zjedli", "zjem", "wypil", "dziennik", "wartosc",
+                 "energetyczn", "odzywcz")
+ITEM_SEPARATORS = {",", "i", "oraz", "plus"}
+# "chleb z masłem": two foods eaten together, unless the name itself has the "z" ("kawa z mlekiem")
+WITH_WORDS = {"z", "ze"}
+# Stems of size words that may stand next to a food name without changing which food it is
+MODIFIER_STEMS = {"mal", "duz", "sredn", "cal", "swiez"}
+
+
+def stem(word: str) -> str:
+    """Folded word without its case ending, e.g. "kurczaka" -> "kurczak"; words that would get too short stay"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    # Fleeting e: "ogórek"/"ogórka", "cukier"/"cukru", "jajek"/"jajka" share a stem
+    for ending, collapsed in _FLEETING_E:
+        if word.endswith(ending) and len(word) - len(ending) + len(collapsed) >= _MIN_STEM + 1:
+            return word[:-len(ending)] + collapsed
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, diacritic-free words, numbers (decimal comma kept) and commas"""
+    return [token if token[0].isdigit() or token == "," else normalize_question(token)
+            for token in _TOKEN.findall(text.lower())]
+
+
+def food_key(name: str) -> str:
+    return " ".join(stem(word) for word in normalize_question(name).split())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Food(NamedTuple):
+    name: str
+    kcal_100g: float
+    piece_g: Optional[float]  # typical piece, slice or serving; None for foods only eaten by weight
+
+
+class NutritionIndex:
+    """
+    Calories of common Polish foods, looked up without the network.
+
+    Every food name and alias is folded (case, diacritics) and stemmed
+    (case endings), so "100g chleba", "kromka chleba" and "chlebem" all
+    reach "chleb". Lookups try exact keys first, then the shortest key
+    starting with the spoken word, then keys within edit distance 1-2
+    that share its first letter. Quantities ("100 g", "dwa", "pół litra",
+    "szklanka") are parsed before matching.
+    """
+
+    def __init__(self, foods: List[Food], aliases: Optional[Dict[str, int]] = None):
+        self.foods = foods
+        self._keys: Dict[str, int] = {}
+        for index, food in enumerate(foods):
+            self._keys.setdefault(food_key(food.name), index)
+        for alias, index in (aliases or {}).items():
+            self._keys.setdefault(food_key(alias), index)
+        self._sorted_keys = sorted(self._keys)
+        self._by_letter: Dict[str, List[str]] = {}
+        for key in self._sorted_keys:
+            self._by_letter.setdefault(key[0], []).append(key)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "NutritionIndex":
+        """
+        Read foods from a CSV with columns name, kcal_100g, piece_g, aliases ("|"-separated)
+
+        Args:
+            path (str, optional): CSV file, NUTRITION_DB_PATH or the bundled Polish table by default
+        """
+        path = path or os.getenv("NUTRITION_DB_PATH", DEFAULT_FOODS_PATH)
+        foods: List[Food] = []
+        aliases: Dict[str, int] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                foods.append(Food(row["name"], float(row["kcal_100g"]),
+                                  float(row["piece_g"]) if row.get("piece_g") else None))
+                for alias in filter(None, (row.get("aliases") or "").split("|")):
+                    aliases[alias] = len(foods) - 1
+        log.info("[NUTRITION] Loaded %d foods, %d aliases from %s", len(foods), len(aliases), path)
+        return cls(foods, aliases)
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def match(self, words: List[str]) -> Optional[Tuple[Food, str]]:
+        """
+        Best food for already tokenized, stop-word-free words; returns (food, "exact" | "prefix" | "fuzzy")
+
+        Any word left over besides the food name and size words makes it a
+        miss: "cola zero" is not cola and "masło orzechowe" is not butter.
+        """
+        stems = [stem(word) for word in words]
+        found = self._match_stems(stems)
+        if found is None:
+            return None
+        food, how, start, size = found
+        if any(word not in MODIFIER_STEMS for word in stems[:start] + stems[start + size:]):
+            return None
+        return food, how
+
+    def _match_stems(self, stems: List[str]) -> Optional[Tuple[Food, str, int, int]]:
+        """Food, match kind and the span of stems (start, size) naming it"""
+        for size in range(min(3, len(stems)), 0, -1):
+            for start in range(len(stems) - size + 1):
+                index = self._keys.get(" ".join(stems[start:start + size]))
+                if index is not None:
+                    return self.foods[index], "exact", start, size
+        for start, word in enumerate(stems):
+            if len(word) < 4:
+                continue
+            position = bisect.bisect_left(self._sorted_keys, word)
+            candidates = []
+            while position < len(self._sorted_keys) and self._sorted_keys[position].startswith(word):
+                candidates.append(self._sorted_keys[position])
+                position += 1
+            if candidates:
+                return self.foods[self._keys[min(candidates, key=len)]], "prefix", start, 1
+        for start, word in enumerate(stems):
+            if len(word) < 4:
+                continue
+            limit = 1 if len(word) <= 5 else 2
+            best, best_distance = None, limit + 1
+            for key in self._by_letter.get(word[0], ()):
+                distance = edit_distance(word, key, limit)
+                if distance < best_distance:
+                    best, best_distance = key, distance
+            if best is not None:
+                return self.foods[self._keys[best]], "fuzzy", start, 1
+        return None
+
+    @staticmethod
+    def _parse(tokens: List[str]) -> Tuple[Optional[float], Optional[str], List[str]]:
+        """Split tokens into (amount, unit kind, food words); unit kind is "g", "ml", "piece" or None"""
+        amount: Optional[float] = None
+        unit: Optional[str] = None
+        per_unit = 1.0
+        words = []
+        for token in tokens:
+            if token[0].isdigit() or token in NUMBER_WORDS:
+                value = float(token.replace(",", ".")) if token[0].isdigit() else NUMBER_WORDS[token]
+                amount = value if amount is None else amount * value
+            elif unit is None and token in MASS_UNITS:
+                unit, per_unit = "g", MASS_UNITS[token]
+            elif unit is None and token in VOLUME_UNITS:
+                unit, per_unit = "ml", VOLUME_UNITS[token]
+            elif unit is None and any(token.startswith(prefix) for prefix, _, _ in MEASURE_PREFIXES):
+                per_unit, unit = next((grams, kind) for prefix, grams, kind in MEASURE_PREFIXES
+                                      if token.startswith(prefix))
+            elif unit is None and token.startswith(PIECE_PREFIXES):
+                unit = "piece"
+            elif token not in STOP_WORDS and not token.startswith(STOP_PREFIXES):
+                words.append(token)
+        if unit in ("g", "ml"):
+            amount = (1.0 if amount is None else amount) * per_unit
+        return amount, unit, words
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Calories of the food mentioned in a request
+
+        Args:
+            text (str): e.g. "ile kalorii ma 100g chleba", "dwa jajka", "pół litra mleka"
+
+        Returns:
+            dict: food, grams, kcal, kcal_100g, amount, unit ("g", "ml" or "piece") and match kind;
+                None when no known food is mentioned
+        """
+        return self._lookup_tokens(tokenize(text))
+
+    def _lookup_tokens(self, tokens: List[str]) -> Optional[Dict[str, Any]]:
+        amount, unit, words = self._parse(tokens)
+        if not words:
+            return None
+        matched = self.match(words)
+        if matched is None:
+            return None
+        food, how = matched
+        if unit in ("g", "ml"):
+            grams = amount
+        elif food.piece_g is not None:
+            unit, amount = "piece", 1.0 if amount is None else amount
+            grams = amount * food.piece_g
+        else:
+            # Counted but no piece size ("dwa ryże") - a 100 g portion each
+            unit, amount = "g", 100.0 * (1.0 if amount is None else amount)
+            grams = amount
+        return {
+            "food": food.name,
+            "grams": grams,
+            "kcal": grams * food.kcal_100g / 100,
+            "kcal_100g": food.kcal_100g,
+            "amount": amount,
+            "unit": unit,
+            "match": how
+        }
+
+    def parse_items(self, text: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Every food in a meal description, split on commas, "i", "oraz" and "plus"
+
+        An item that does not match as a whole is split on "z" ("kromka
+        chleba z masłem" is bread and butter). A "z" part with its own
+        quantity ("jajecznica z trzech jaj") says what the dish is made of,
+        which the index cannot price, so it is a miss.
+
+        Returns:
+            list: one lookup() result per item; None if any item names no known food,
+                so the caller can fall back to something smarter
+        """
+        items: List[List[str]] = [[]]
+        for token in tokenize(text):
+            if token in ITEM_SEPARATORS:
+                items.append([])
+            else:
+                items[-1].append(token)
+        results = []
+        for tokens in items:
+            if not self._parse(tokens)[2]:
+                continue  # "na śniadanie", a stray number
+            result = self._lookup_tokens(tokens)
+            if result is not None:
+                results.append(result)
+                continue
+            parts = self._split_with(tokens)
+            if parts is None:
+                return None
+            for part in parts:
+                result = self._lookup_tokens(part)
+                if result is None:
+                    return None
+                results.append(result)
+        return results or None
+
+    def _split_with(self, tokens: List[str]) -> Optional[List[List[str]]]:
+        """Tokens of one item split into co-eaten foods on "z"; None if there is no such split"""
+        parts: List[List[str]] = [[]]
+        for token in tokens:
+            if token in WITH_WORDS:
+                parts.append([])
+            else:
+                parts[-1].append(token)
+        if len(parts) == 1 or not all(self._parse(part)[2] for part in parts):
+            return None
+        if any(self._parse(part)[0] is not None for part in parts[1:]):
+            return None
+        return parts
+
+
+def describe_portion(result: Dict[str, Any]) -> str:
+    """Portion in words, e.g. "100 g", "250 ml", "2 szt. (110 g)" """
+    if result["unit"] == "piece":
+        return f"{result['amount']:g} szt. ({round(result['grams'])} g)"
+    return f"{round(result['amount'])} {result['unit']}"
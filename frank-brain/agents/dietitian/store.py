@@ -0,0 +1,255 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from agents.websearch.cache import normalize_question
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "frank", "meals.sqlite3")
+
+
+def day_key(timestamp: Optional[float] = None) -> str:
+    """Local calendar day, e.g. 2024-07-21"""
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def week_key(timestamp: Optional[float] = None) -> str:
+    """ISO week, e.g. 2024-W29 - weeks start on Monday"""
+    return time.strftime("%G-W%V", time.localtime(timestamp))
+
+
+class MealStoreFullError(Exception):
+    """The writer is `max_pending` meals behind; the meal was not logged"""
+
+    def __init__(self, pending: int):
+        super().__init__(f"Meal store busy ({pending} meals waiting to be written)")
+        self.pending = pending
+
+
+class MealStore:
+    """
+    Meal log in SQLite (WAL mode) with daily and weekly calorie rollups.
+
+    add() only updates the in-memory rollups and enqueues the meal; a
+    background thread writes meals in batches, each batch together with
+    its rollup increments in a single transaction. Totals are read from
+    the in-memory rollups (loaded from the rollup tables on start), so
+    "how much did I eat today" is a dict lookup that also sees meals that
+    are still queued.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        max_pending: int = 1024
+    ):
+        self.path = path or os.getenv("MEAL_DB_PATH", DEFAULT_DB_PATH)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.rejected = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()         # guards the connection
+        self._rollup_lock = threading.Lock()  # guards the rollup dicts, never held across a write
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe, fsync per checkpoint only
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meals (
+                id INTEGER PRIMARY KEY,
+                eaten_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                product TEXT NOT NULL,
+                product_key TEXT NOT NULL,
+                quantity REAL,
+                unit TEXT,
+                calories REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_meals_day ON meals(day)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_meals_product ON meals(product_key, day)")
+        for period in ("day", "week"):
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {period}_totals (
+                    {period} TEXT PRIMARY KEY,
+                    calories REAL NOT NULL,
+                    meals INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+        self._conn.commit()
+
+        self._daily: Dict[str, List[float]] = {}   # day -> [calories, meals]
+        self._weekly: Dict[str, List[float]] = {}  # week -> [calories, meals]
+        for period, rollup in (("day", self._daily), ("week", self._weekly)):
+            for key, calories, meals in self._conn.execute(f"SELECT {period}, calories, meals FROM {period}_totals"):
+                rollup[key] = [calories, meals]
+
+        self._thread = threading.Thread(target=self._run, name="meal-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, product: str, calories: float, quantity: Optional[float] = None, unit: Optional[str] = None,
+            eaten_at: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Log one meal; returns before it is written
+
+        Args:
+            product (str): Product name as spoken, e.g. "jajko"
+            calories (float): kcal for the whole portion
+            quantity (float, optional): Portion size in `unit`
+            unit (str, optional): "g", "ml", "szt", ...
+            eaten_at (float, optional): Unix time, now by default
+
+        Returns:
+            dict: the meal as stored, with its day and week keys
+
+        Raises:
+            MealStoreFullError: the writer is `max_pending` meals behind (slow disk, locked database)
+        """
+        eaten_at = time.time() if eaten_at is None else eaten_at
+        meal = {
+            "eaten_at": eaten_at,
+            "day": day_key(eaten_at),
+            "week": week_key(eaten_at),
+            "product": product,
+            "product_key": normalize_question(product),
+            "quantity": quantity,
+            "unit": unit,
+            "calories": float(calories)
+        }
+        with self._rollup_lock:
+            self._apply(meal, 1)
+        try:
+            self.queue.put_nowait(meal)  # called from the event loop, so never wait on the writer
+        except queue.Full:
+            with self._rollup_lock:
+                self._apply(meal, -1)
+            self.rejected += 1
+            raise MealStoreFullError(self.queue.qsize())
+        return meal
+
+    def _apply(self, meal: Dict[str, Any], sign: int):
+        for rollup, key in ((self._daily, meal["day"]), (self._weekly, meal["week"])):
+            totals = rollup.setdefault(key, [0.0, 0])
+            totals[0] += sign * meal["calories"]
+            totals[1] += sign
+
+    def day_total(self, day: Optional[str] = None) -> Dict[str, Any]:
+        day = day or day_key()
+        calories, meals = self._daily.get(day, (0.0, 0))
+        return {"day": day, "calories": calories, "meals": meals}
+
+    def week_total(self, week: Optional[str] = None) -> Dict[str, Any]:
+        week = week or week_key()
+        calories, meals = self._weekly.get(week, (0.0, 0))
+        return {"week": week, "calories": calories, "meals": meals}
+
+    def meals_on(self, day: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Meals of one day, oldest first. Waits for queued meals to be written first."""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT eaten_at, product, quantity, unit, calories FROM meals WHERE day = ? ORDER BY eaten_at",
+                (day or day_key(),)
+            ).fetchall()
+        columns = ("eaten_at", "product", "quantity", "unit", "calories")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        day_totals: Dict[str, List[float]] = {}
+        week_totals: Dict[str, List[float]] = {}
+        for meal in batch:
+            for totals, key in ((day_totals, meal["day"]), (week_totals, meal["week"])):
+                entry = totals.setdefault(key, [0.0, 0])
+                entry[0] += meal["calories"]
+                entry[1] += 1
+        error = None
+        with self._lock:
+            try:
+                with self._conn:  # one transaction: meals and rollups land together or not at all
+                    self._conn.executemany(
+                        "INSERT INTO meals (eaten_at, day, product, product_key, quantity, unit, calories) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(m["eaten_at"], m["day"], m["product"], m["product_key"], m["quantity"], m["unit"],
+                          m["calories"]) for m in batch]
+                    )
+                    for period, totals in (("day", day_totals), ("week", week_totals)):
+                        self._conn.executemany(
+                            f"INSERT INTO {period}_totals ({period}, calories, meals) VALUES (?, ?, ?) "
+                            f"ON CONFLICT({period}) DO UPDATE SET "
+                            "calories = calories + excluded.calories, meals = meals + excluded.meals",
+                            [(key, calories, meals) for key, (calories, meals) in totals.items()]
+                        )
+            except sqlite3.Error as e:
+                error = e
+        if error is not None:
+            # Keep the in-memory totals in line with what is actually stored
+            with self._rollup_lock:
+                for meal in batch:
+                    self._apply(meal, -1)
+            self.errors += 1
+            log.error("[MEALS] Failed to write %d meals: %s", len(batch), error)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            batch = [item]
+            # Collect whatever else arrives within flush_interval into the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            for _ in range(len(batch) + stopping):
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued meal is written"""
+        self.queue.join()
+
+    def close(self, timeout: float = 5.0):
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout)
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "days": len(self._daily),
+            "today": self.day_total(),
+            "this_week": self.week_total()
+        }
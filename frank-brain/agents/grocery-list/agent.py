@@ -1,9 +1,8 @@
 from langchain.agents import initialize_agent, AgentType
-from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage
 from typing import Type, Optional, List
-import os
 from dotenv import load_dotenv
+from agents.llm.gateway import get_gateway
 from .tools import GroceryListTool
 
 load_dotenv()
@@ -11,11 +10,7 @@ load_dotenv()
 
 class GroceryListAgent:
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1, api_url: str = "http://100.77.2.1:8051/convert-text"):
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self.llm = get_gateway().chat("grocery-list", model=model_name, temperature=temperature)
         
         self.tools = [GroceryListTool(api_url=api_url)]
         
@@ -41,15 +36,43 @@ class GroceryListAgent:
         try:
             query = f"Convert this text to a grocery list: {text}"
             result = self.agent.invoke({"input": query})
+            return self._to_result(result)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def aconvert_text_to_grocery_list(self, text: str) -> dict:
+        """
+        Async version of convert_text_to_grocery_list() - runs the agent with ainvoke
+        
+        Args:
+            text (str): Text containing information about groceries, recipes, or shopping needs
             
-            return {
-                "grocery_list": result.get("output", ""),
-                "intermediate_steps": result.get("intermediate_steps", []),
-                "success": True
-            }
+        Returns:
+            dict: Results with grocery list and intermediate steps
+        """
+        try:
+            query = f"Convert this text to a grocery list: {text}"
+            result = await self.agent.ainvoke({"input": query})
+            return self._to_result(result)
         except Exception as e:
-            return {
-                "grocery_list": f"Error during conversion: {str(e)}",
-                "intermediate_steps": [],
-                "success": False
-            }
\ No newline at end of file
+            return self._error_result(e)
+    
+    def service_stats(self) -> dict:
+        """Latency, error and circuit-breaker state of the conversion service client"""
+        return self.tools[0]._client.stats()
+    
+    @staticmethod
+    def _to_result(result: dict) -> dict:
+        return {
+            "grocery_list": result.get("output", ""),
+            "intermediate_steps": result.get("intermediate_steps", []),
+            "success": True
+        }
+    
+    @staticmethod
+    def _error_result(error: Exception) -> dict:
+        return {
+            "grocery_list": f"Error during conversion: {str(error)}",
+            "intermediate_steps": [],
+            "success": False
+        }
\ No newline at end of file
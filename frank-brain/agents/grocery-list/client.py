@@ -0,0 +1,242 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying - anything else is the caller's problem
+RETRY_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without touching the network while the service is considered down"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures.
+    
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial request is let through (half-open),
+    and its outcome closes or re-opens the circuit.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def admit(self) -> Optional[str]:
+        """
+        "closed" for a normal request, "trial" for the one half-open probe, None to reject
+
+        Whoever is admitted as the trial must call release_trial() when done,
+        whatever the outcome, or no further trial is ever let through.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+    
+    def allow(self) -> bool:
+        return self.admit() is not None
+    
+    def release_trial(self):
+        """End the trial; its result, if any, was already recorded"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    def __init__(self, window: int = 200):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.count += 1
+            self.errors += 0 if ok else 1
+            self.total += seconds
+            self.last = seconds
+            self._recent.append(seconds)
+    
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            recent = sorted(self._recent)
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "avg_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "last_ms": 1000 * self.last,
+            "p50_ms": 1000 * pct(0.50),
+            "p95_ms": 1000 * pct(0.95)
+        }
+
+
+class GroceryServiceClient:
+    """
+    Keep-alive client for the grocery-list conversion service.
+    
+    One pooled requests.Session (sync) and one httpx.AsyncClient (async) per
+    service URL, short connect timeouts, bounded retries with full-jitter
+    exponential backoff and a circuit breaker shared by both paths.
+    """
+    
+    def __init__(
+        self,
+        api_url: str,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 15.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.api_url = api_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyStats()
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self._pool_size = pool_size
+        self._async_client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self._pool_size, max_keepalive_connections=self._pool_size)
+            )
+        return self._async_client
+    
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+    
+    def convert(self, text: str) -> Tuple[int, dict, str]:
+        """POST text to the service; returns (status_code, json_body, raw_text)"""
+        for attempt in range(self.retries + 1):
+            admitted = self.breaker.admit()
+            if admitted is None:
+                raise CircuitOpenError("Grocery list service circuit is open")
+            started = time.perf_counter()
+            try:
+                try:
+                    response = self.session.post(self.api_url, json={"text": text}, timeout=self.timeout)
+                except requests.RequestException:
+                    self.latency.record(time.perf_counter() - started, ok=False)
+                    self.breaker.record_failure()
+                    if attempt == self.retries:
+                        raise
+                else:
+                    ok = response.status_code not in RETRY_STATUSES
+                    self.latency.record(time.perf_counter() - started, ok=ok)
+                    if ok or attempt == self.retries:
+                        (self.breaker.record_success if ok else self.breaker.record_failure)()
+                        body = response.json() if response.status_code == 200 else {}
+                        return response.status_code, body, response.text
+                    self.breaker.record_failure()
+            finally:
+                if admitted == "trial":
+                    self.breaker.release_trial()
+            time.sleep(self._delay(attempt))
+    
+    async def aconvert(self, text: str) -> Tuple[int, dict, str]:
+        """Async version of convert() on the pooled httpx client"""
+        for attempt in range(self.retries + 1):
+            admitted = self.breaker.admit()
+            if admitted is None:
+                raise CircuitOpenError("Grocery list service circuit is open")
+            started = time.perf_counter()
+            try:
+                try:
+                    response = await self.async_client.post(self.api_url, json={"text": text})
+                except httpx.TransportError:
+                    self.latency.record(time.perf_counter() - started, ok=False)
+                    self.breaker.record_failure()
+                    if attempt == self.retries:
+                        raise
+                else:
+                    ok = response.status_code not in RETRY_STATUSES
+                    self.latency.record(time.perf_counter() - started, ok=ok)
+                    if ok or attempt == self.retries:
+                        (self.breaker.record_success if ok else self.breaker.record_failure)()
+                        body = response.json() if response.status_code == 200 else {}
+                        return response.status_code, body, response.text
+                    self.breaker.record_failure()
+            finally:
+                # Cancellation or an unexpected error must not leave the trial slot taken
+                if admitted == "trial":
+                    self.breaker.release_trial()
+            await asyncio.sleep(self._delay(attempt))
+    
+    def stats(self) -> dict:
+        return {"url": self.api_url, "circuit": self.breaker.state, **self.latency.snapshot()}
+    
+    def close(self):
+        self.session.close()
+    
+    async def aclose(self):
+        self.session.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_clients: Dict[str, GroceryServiceClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_url: str) -> GroceryServiceClient:
+    """Shared client per service URL, so every tool instance reuses the same connections"""
+    with _clients_lock:
+        if api_url not in _clients:
+            _clients[api_url] = GroceryServiceClient(api_url)
+        return _clients[api_url]
@@ -0,0 +1,92 @@
+"""
+Local stand-in for the grocery-list conversion service (POST /convert-text).
+
+Run it directly for manual testing:
+
+    python stub_server.py --port 8051 --delay 0.5 --fail-rate 0.2
+
+or start it in-process from a test with start_stub_server().
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubConfig:
+    def __init__(self, delay: float = 0.0, fail_rate: float = 0.0, fail_status: int = 503):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.requests = 0
+
+
+def extract_items(text: str) -> list:
+    """Naive item split on commas, newlines and Polish/English 'and'"""
+    parts = re.split(r",|;|\n|\bi\b|\boraz\b|\band\b", text)
+    return [part.strip(" .") for part in parts if part.strip(" .")]
+
+
+def make_handler(config: StubConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real service behind uvicorn
+
+        def do_POST(self):
+            config.requests += 1
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+
+            if config.delay:
+                time.sleep(config.delay)
+
+            if self.path != "/convert-text":
+                return self._reply(404, {"detail": "Not Found"})
+            if random.random() < config.fail_rate:
+                return self._reply(config.fail_status, {"detail": "stub failure"})
+            try:
+                text = json.loads(raw or b"{}").get("text", "")
+            except ValueError:
+                return self._reply(422, {"detail": "invalid JSON"})
+            self._reply(200, {"items": extract_items(text)})
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(port: int = 0, **config) -> Tuple[ThreadingHTTPServer, str, StubConfig]:
+    """Start the stub on a background thread; returns (server, convert_url, config)"""
+    stub_config = StubConfig(**config)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub_config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/convert-text"
+    return server, url, stub_config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub grocery-list conversion service")
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to sleep before answering")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server, url, _ = start_stub_server(args.port, delay=args.delay, fail_rate=args.fail_rate, fail_status=args.fail_status)
+    print(f"Stub grocery-list service listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,6 +1,7 @@
 from langchain.tools import BaseTool
 import requests
-import json
+import httpx
+from .client import CircuitOpenError, get_client
 
 
 class GroceryListTool(BaseTool):
@@ -10,26 +11,23 @@ class GroceryListTool(BaseTool):
     def __init__(self, api_url: str = "http://100.77.2.1:8051/convert-text"):
         super().__init__()
         self.api_url = api_url
+        # Shared per URL: pooled connections, retries and circuit breaker
+        self._client = get_client(api_url)
+    
+    @staticmethod
+    def _format_response(status_code: int, result: dict, text: str) -> str:
+        if status_code == 200:
+            items = result.get("items", [])
+            return f"Grocery list items extracted:\n" + "\n".join(f"- {item}" for item in items)
+        else:
+            return f"Error: API returned status {status_code}: {text}"
     
     def _run(self, text: str) -> str:
         try:
-            payload = {"text": text}
-            headers = {"Content-Type": "application/json"}
-            
-            response = requests.post(
-                self.api_url,
-                data=json.dumps(payload),
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                items = result.get("items", [])
-                return f"Grocery list items extracted:\n" + "\n".join(f"- {item}" for item in items)
-            else:
-                return f"Error: API returned status {response.status_code}: {response.text}"
-                
+            return self._format_response(*self._client.convert(text))
+        
+        except CircuitOpenError:
+            return "Error: The grocery list service is currently unavailable. Please try again later."
         except requests.exceptions.Timeout:
             return "Error: Request timed out. The grocery list service may be unavailable."
         except requests.exceptions.ConnectionError:
@@ -37,5 +35,15 @@ class GroceryListTool(BaseTool):
         except Exception as e:
             return f"Error during grocery list conversion: {str(e)}"
     
-    def _arun(self, text: str):
-        raise NotImplementedError("GroceryListTool does not support async")
\ No newline at end of file
+    async def _arun(self, text: str) -> str:
+        try:
+            return self._format_response(*await self._client.aconvert(text))
+        
+        except CircuitOpenError:
+            return "Error: The grocery list service is currently unavailable. Please try again later."
+        except httpx.TimeoutException:
+            return "Error: Request timed out. The grocery list service may be unavailable."
+        except httpx.ConnectError:
+            return "Error: Could not connect to grocery list service. Please ensure the service is running."
+        except Exception as e:
+            return f"Error during grocery list conversion: {str(e)}"
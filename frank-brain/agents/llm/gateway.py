@@ -0,0 +1,495 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+load_dotenv()
+
+OPENAI = "openai"  # ChatOpenAI over pooled connections
+STUB = "stub"      # canned offline answers, no network
+
+# USD per 1M tokens (prompt, completion); the longest matching prefix of the model name wins
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00)
+}
+
+STUB_ANSWER = "To jest odpowiedź testowa trybu offline."
+
+Usage = Tuple[int, int]  # prompt tokens, completion tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) for replies that came without usage"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _text(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+# langchain-core < 0.2 (what requirements.txt pins) has no tool_calls / tool_call_chunks fields: tool
+# calls only travel in additional_kwargs there. The cache paths below were tried on 0.1.10, 0.3 and 1.x.
+_CHUNK_FIELDS = getattr(AIMessageChunk, "model_fields", None) or getattr(AIMessageChunk, "__fields__", {})
+_TOOL_CALL_CHUNKS = "tool_call_chunks" in _CHUNK_FIELDS
+
+
+def _has_tool_calls(message: BaseMessage) -> bool:
+    return bool(getattr(message, "tool_calls", None) or getattr(message, "tool_call_chunks", None)
+                or message.additional_kwargs.get("tool_calls") or message.additional_kwargs.get("function_call"))
+
+
+def _as_chunk(message: BaseMessage) -> AIMessageChunk:
+    """A cached reply as one stream chunk, tool calls included"""
+    fields: Dict[str, Any] = {}
+    if _TOOL_CALL_CHUNKS:
+        fields["tool_call_chunks"] = [
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": index}
+            for index, call in enumerate(getattr(message, "tool_calls", None) or [])
+        ]
+    return AIMessageChunk(content=message.content, additional_kwargs=copy.deepcopy(message.additional_kwargs), **fields)
+
+
+def _message_key(message: BaseMessage) -> list:
+    """Everything in a message that can change the reply; earlier turns of a conversation are messages too"""
+    return [message.type, message.content, message.additional_kwargs, getattr(message, "name", None),
+            getattr(message, "tool_call_id", None), getattr(message, "tool_calls", None)]
+
+
+def stub_reply(messages: Sequence[BaseMessage]) -> str:
+    """
+    A canned answer shaped like what the caller's prompt asks for
+
+    ReAct prompts get a final answer straight away, prompts asking for
+    JSON an empty list, anything else STUB_ANSWER.
+    """
+    prompt = _text(messages)
+    if "Final Answer" in prompt:
+        return f"Thought: I now know the final answer\nFinal Answer: {STUB_ANSWER}"
+    if "JSON" in prompt:
+        return "[]"
+    return STUB_ANSWER
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI, for benchmarks and local runs.
+
+    Deterministic answers from stub_reply() after `latency` seconds,
+    streamed word by word, with estimated token usage.
+    """
+
+    model_name: str = "stub"
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        text = stub_reply(messages)
+        usage = {"prompt_tokens": estimate_tokens(_text(messages)), "completion_tokens": estimate_tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))],
+                          llm_output={"token_usage": usage, "model_name": self.model_name})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        words = stub_reply(messages).split(" ")
+        for i, word in enumerate(words):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+
+class _AgentStats:
+    def __init__(self, recent: int = 256):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.saved_usd = 0.0  # what the cache hits would have cost
+        self.latencies: Deque[float] = deque(maxlen=recent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000, 1) if ordered else None
+
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "saved_usd": round(self.saved_usd, 6),
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95)
+        }
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    One agent's handle on the LLMGateway.
+
+    Behaves like any LangChain chat model (invoke, ainvoke, astream, tool
+    binding, callbacks); every call goes through the gateway's response
+    cache and is counted under `agent`.
+    """
+
+    gateway: Any
+    upstream: Any  # pooled chat model shared by every agent using the same model settings
+    agent: str = "default"
+    model_name: str = "gpt-4o-mini"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-gateway"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature, "agent": self.agent}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return self.gateway.generate(self, messages, stop, kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        return await self.gateway.agenerate(self, messages, stop, kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self.gateway.astream(self, messages, stop, kwargs):
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+
+class LLMGateway:
+    """
+    The one place LLM calls leave the process.
+
+    Agents used to build their own ChatOpenAI each, so every agent had its
+    own connection pool and nothing knew what the calls added up to. The
+    gateway hands each agent a GatewayChatModel (chat()) and behind those:
+
+    - shares one underlying client per model settings, and one pair of
+      keep-alive httpx pools for all of them;
+    - answers exact repeats from an LRU cache with a TTL, keyed by a hash of
+      the model, its settings, the messages, stop words and bound tools.
+      Conversation history is sent as messages, so it is part of the key: the
+      same question after different turns is a different entry. Only
+      near-deterministic calls (temperature <= cache_max_temperature) are
+      cached; failures never are;
+    - counts calls, cache hits, errors, tokens, cost and latency per agent.
+      Replies without usage (streaming) have their tokens estimated.
+
+    With backend="stub" no network is used at all: StubChatModel answers.
+    """
+
+    def __init__(self, backend: str = OPENAI, cache_size: int = 512, cache_ttl: float = 3600.0,
+                 cache_max_temperature: float = 0.1, max_connections: int = 20, stub_latency: float = 0.0,
+                 prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        if backend not in (OPENAI, STUB):
+            raise ValueError(f"Unknown LLM backend '{backend}', expected one of {[OPENAI, STUB]}")
+        self.backend = backend
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_max_temperature = cache_max_temperature
+        self.max_connections = max_connections
+        self.stub_latency = stub_latency
+        self.prices = PRICES if prices is None else prices
+        self.evictions = 0
+        self._cache: "OrderedDict[str, Tuple[float, ChatResult, Usage]]" = OrderedDict()  # key -> (expires_at, result, usage)
+        self._upstreams: Dict[Tuple, BaseChatModel] = {}
+        self._http: Optional[Tuple[Any, Any]] = None
+        self._stats: Dict[str, _AgentStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        """LLM_BACKEND (openai or stub), LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_MAX_TEMPERATURE, LLM_MAX_CONNECTIONS, LLM_STUB_LATENCY"""
+        return cls(
+            backend=os.getenv("LLM_BACKEND", OPENAI),
+            cache_size=int(os.getenv("LLM_CACHE_SIZE", "512")),
+            cache_ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+            cache_max_temperature=float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.1")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            stub_latency=float(os.getenv("LLM_STUB_LATENCY", "0"))
+        )
+
+    def chat(self, agent: str, model: str = "gpt-4o-mini", temperature: float = 0.0,
+             callbacks: Optional[list] = None, **params: Any) -> GatewayChatModel:
+        """
+        A chat model for one agent
+
+        Args:
+            agent (str): Name the calls are counted under
+            model (str): OpenAI model name
+            temperature (float): Sampling temperature
+            callbacks (list, optional): LangChain callback handlers, e.g. langchain_callbacks()
+            **params: Further ChatOpenAI settings (max_tokens, ...)
+
+        Returns:
+            GatewayChatModel: Drop-in replacement for ChatOpenAI
+        """
+        return GatewayChatModel(gateway=self, upstream=self._upstream(model, temperature, params), agent=agent,
+                                model_name=model, temperature=temperature, callbacks=callbacks)
+
+    def _upstream(self, model: str, temperature: float, params: Dict[str, Any]) -> BaseChatModel:
+        key = (model, temperature, tuple(sorted(params.items())))
+        with self._lock:
+            if key not in self._upstreams:
+                if self.backend == STUB:
+                    self._upstreams[key] = StubChatModel(model_name=model, latency=self.stub_latency)
+                else:
+                    self._upstreams[key] = self._openai(model, temperature, params)
+            return self._upstreams[key]
+
+    def _openai(self, model: str, temperature: float, params: Dict[str, Any]) -> BaseChatModel:
+        """Call with the lock held"""
+        from langchain_openai import ChatOpenAI
+
+        options = dict(params)
+        if os.getenv("OPENAI_API_BASE"):
+            options["openai_api_base"] = os.getenv("OPENAI_API_BASE")
+        fields = getattr(ChatOpenAI, "model_fields", None) or getattr(ChatOpenAI, "__fields__", {})
+        # Older langchain-openai has a single http_client used for both sync and async calls; leave pooling to openai there
+        if "http_client" in fields and "http_async_client" in fields:
+            options["http_client"], options["http_async_client"] = self._http_clients()
+        return ChatOpenAI(model=model, temperature=temperature, openai_api_key=os.getenv("OPENAI_API_KEY"), **options)
+
+    def _http_clients(self) -> Tuple[Any, Any]:
+        if self._http is None:
+            import httpx
+
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections, keepalive_expiry=60.0)
+            timeout = httpx.Timeout(60.0, connect=5.0)
+            self._http = (httpx.Client(limits=limits, timeout=timeout),
+                          httpx.AsyncClient(limits=limits, timeout=timeout))
+        return self._http
+
+    def cache_key(self, model: GatewayChatModel, messages: Sequence[BaseMessage], stop: Optional[List[str]],
+                  kwargs: Dict[str, Any]) -> Optional[str]:
+        """Hash of everything that decides the reply, or None when the call should not be cached"""
+        if self.cache_size <= 0 or model.temperature > self.cache_max_temperature:
+            return None
+        payload = {
+            "backend": self.backend,
+            "model": model.model_name,
+            "temperature": model.temperature,
+            "upstream": model.upstream._identifying_params,
+            "messages": [_message_key(message) for message in messages],
+            "stop": stop,
+            "kwargs": kwargs
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: Optional[str]) -> Optional[Tuple[ChatResult, Usage]]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1], entry[2]
+
+    def _store(self, key: Optional[str], result: ChatResult, usage: Usage):
+        if key is None:
+            return
+        # A copy: LangChain goes on to set ids and response_metadata on the result the caller gets
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, result, usage)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def cost(self, model: str, usage: Usage) -> float:
+        if self.backend == STUB:
+            return 0.0
+        prefix = max((name for name in self.prices if model.startswith(name)), key=len, default=None)
+        if prefix is None:
+            return 0.0
+        prompt_price, completion_price = self.prices[prefix]
+        return (usage[0] * prompt_price + usage[1] * completion_price) / 1_000_000
+
+    @staticmethod
+    def _usage(result: ChatResult, messages: Sequence[BaseMessage]) -> Usage:
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") or usage.get("completion_tokens"):
+            return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        metadata = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+        if metadata:
+            return metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+        return estimate_tokens(_text(messages)), estimate_tokens("".join(g.text for g in result.generations))
+
+    def _record(self, model: GatewayChatModel, started: float, usage: Usage = (0, 0), hit: bool = False,
+                error: bool = False):
+        seconds = time.perf_counter() - started
+        with self._lock:
+            stats = self._stats.setdefault(model.agent, _AgentStats())
+            stats.calls += 1
+            stats.latencies.append(seconds)
+            if error:
+                stats.errors += 1
+            elif hit:
+                stats.cache_hits += 1
+                stats.saved_usd += self.cost(model.model_name, usage)
+            else:
+                stats.prompt_tokens += usage[0]
+                stats.completion_tokens += usage[1]
+                stats.cost_usd += self.cost(model.model_name, usage)
+
+    @staticmethod
+    def _from_cache(model: GatewayChatModel, result: ChatResult) -> ChatResult:
+        # Copies: callers (LangGraph, callbacks) may set ids on the messages they get back
+        return ChatResult(generations=copy.deepcopy(result.generations),
+                          llm_output={"token_usage": {}, "model_name": model.model_name, "cached": True})
+
+    def generate(self, model: GatewayChatModel, messages: List[BaseMessage], stop: Optional[List[str]],
+                 kwargs: Dict[str, Any]) -> ChatResult:
+        started = time.perf_counter()
+        key = self.cache_key(model, messages, stop, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            self._record(model, started, cached[1], hit=True)
+            return self._from_cache(model, cached[0])
+        try:
+            result = model.upstream._generate(messages, stop=stop, **kwargs)
+        except Exception:
+            self._record(model, started, error=True)
+            raise
+        usage = self._usage(result, messages)
+        self._store(key, result, usage)
+        self._record(model, started, usage)
+        return result
+
+    async def agenerate(self, model: GatewayChatModel, messages: List[BaseMessage], stop: Optional[List[str]],
+                        kwargs: Dict[str, Any]) -> ChatResult:
+        started = time.perf_counter()
+        key = self.cache_key(model, messages, stop, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            self._record(model, started, cached[1], hit=True)
+            return self._from_cache(model, cached[0])
+        try:
+            result = await model.upstream._agenerate(messages, stop=stop, **kwargs)
+        except Exception:
+            self._record(model, started, error=True)
+            raise
+        usage = self._usage(result, messages)
+        self._store(key, result, usage)
+        self._record(model, started, usage)
+        return result
+
+    async def astream(self, model: GatewayChatModel, messages: List[BaseMessage], stop: Optional[List[str]],
+                      kwargs: Dict[str, Any]) -> AsyncIterator[ChatGenerationChunk]:
+        """Streams from the upstream; a cached reply comes back as a single chunk"""
+        started = time.perf_counter()
+        key = self.cache_key(model, messages, stop, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            self._record(model, started, cached[1], hit=True)
+            yield ChatGenerationChunk(message=_as_chunk(cached[0].generations[0].message))
+            return
+        parts: List[str] = []
+        tool_calls = False
+        try:
+            async for chunk in model.upstream._astream(messages, stop=stop, **kwargs):
+                parts.append(chunk.text)
+                tool_calls = tool_calls or _has_tool_calls(chunk.message)
+                yield chunk
+        except Exception:
+            self._record(model, started, error=True)
+            raise
+        result = ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(parts)))])
+        usage = self._usage(result, messages)
+        # Only a stream read to the end is cached (a caller breaking off leaves this generator
+        # unfinished), and only plain text: tool-call chunks would be lost from the text
+        if not tool_calls:
+            self._store(key, result, usage)
+        self._record(model, started, usage)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            agents = {agent: stats.to_dict() for agent, stats in self._stats.items()}
+            entries = len(self._cache)
+            upstreams = len(self._upstreams)
+        calls = sum(stats["calls"] for stats in agents.values())
+        hits = sum(stats["cache_hits"] for stats in agents.values())
+        return {
+            "backend": self.backend,
+            "clients": upstreams,
+            "cache": {
+                "entries": entries,
+                "max_entries": self.cache_size,
+                "ttl": self.cache_ttl,
+                "max_temperature": self.cache_max_temperature,
+                "evictions": self.evictions,
+                "hit_rate": hits / calls if calls else 0.0
+            },
+            "calls": calls,
+            "cost_usd": round(sum(stats["cost_usd"] for stats in agents.values()), 6),
+            "saved_usd": round(sum(stats["saved_usd"] for stats in agents.values()), 6),
+            "agents": agents
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway, built from the environment on first use"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway.from_env()
+        return _gateway
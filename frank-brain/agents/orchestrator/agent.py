@@ -0,0 +1,189 @@
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from langgraph.graph import StateGraph, END
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, TypedDict
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from agents.llm.gateway import get_gateway
+from agents.websearch.agent import WebSearchAgent, is_usable_answer
+from agents.dietitian.agent import DietitianAgent
+from .router import IntentRouter, SEARCH, CALORIES, KNOWLEDGE
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+SEARCH_PROMPT = "Przeszukaj internet i odpowiedz na pytanie: {text}. Odpowiedz krótko."
+KNOWLEDGE_SYSTEM_PROMPT = (
+    "Jesteś Frank, przyjazny asystent głosowy w kształcie gęsi. "
+    "Odpowiadaj po polsku, krótko - jednym lub dwoma zdaniami, bez formatowania."
+)
+
+
+class OrchestratorState(TypedDict, total=False):
+    text: str
+    history: List[Tuple[str, str]]
+    intent: str
+    confidence: float
+    route_method: str
+    route_ms: float
+    answer: str
+    success: bool
+    cached: bool
+
+
+class Orchestrator:
+    """
+    Routes each transcript to the right agent with a LangGraph graph.
+
+    The first node is the local IntentRouter (no LLM call). Questions it
+    confidently recognises as general knowledge are answered with a single
+    LLM call and never reach the search agent. Calorie requests go to the
+    DietitianAgent, which keeps the meal log.
+    """
+
+    def __init__(self, websearch_agent: WebSearchAgent, router: Optional[IntentRouter] = None,
+                 dietitian: Optional[DietitianAgent] = None, model_name: str = "gpt-4o-mini",
+                 temperature: float = 0.1, callbacks: Optional[list] = None):
+        self.websearch_agent = websearch_agent
+        self.dietitian = dietitian or DietitianAgent(websearch_agent, callbacks=callbacks)
+        self.router = router or IntentRouter(threshold=float(os.getenv("ROUTER_CONFIDENCE", "0.6")))
+        self.llm = get_gateway().chat("orchestrator", model=model_name, temperature=temperature, callbacks=callbacks)
+        self.graph = self._build_graph()
+
+    def _build_graph(self):
+        graph = StateGraph(OrchestratorState)
+        graph.add_node("route", self._route)
+        graph.add_node(SEARCH, self._search)
+        graph.add_node(CALORIES, self._calories)
+        graph.add_node(KNOWLEDGE, self._knowledge)
+
+        graph.set_entry_point("route")
+        graph.add_conditional_edges(
+            "route",
+            lambda state: state["intent"],
+            {SEARCH: SEARCH, CALORIES: CALORIES, KNOWLEDGE: KNOWLEDGE}
+        )
+        for node in (SEARCH, CALORIES, KNOWLEDGE):
+            graph.add_edge(node, END)
+        return graph.compile()
+
+    async def _route(self, state: OrchestratorState) -> OrchestratorState:
+        started = time.perf_counter()
+        decision = self.router.route(state["text"])
+        return {
+            "intent": decision["intent"],
+            "confidence": decision["confidence"],
+            "route_method": decision["method"],
+            "route_ms": (time.perf_counter() - started) * 1000
+        }
+
+    @staticmethod
+    def _agent_state(result: dict) -> OrchestratorState:
+        answer = result.get("answer", "")
+        return {
+            "answer": answer,
+            # An agent that hit its iteration/time limit "succeeds" with a useless answer
+            "success": result.get("success", False) and is_usable_answer(answer),
+            "cached": result.get("cached", False)
+        }
+
+    async def _search(self, state: OrchestratorState) -> OrchestratorState:
+        result = await self.websearch_agent.asearch(SEARCH_PROMPT.format(text=state["text"]), cache_key=state["text"])
+        return self._agent_state(result)
+
+    async def _calories(self, state: OrchestratorState) -> OrchestratorState:
+        result = await self.dietitian.arun(state["text"])
+        return self._agent_state(result)
+
+    @staticmethod
+    def _knowledge_messages(text: str, history: Sequence[Tuple[str, str]] = ()) -> list:
+        messages = [SystemMessage(content=KNOWLEDGE_SYSTEM_PROMPT)]
+        for question, answer in history:
+            messages += [HumanMessage(content=question), AIMessage(content=answer)]
+        return messages + [HumanMessage(content=text)]
+
+    async def _knowledge(self, state: OrchestratorState) -> OrchestratorState:
+        try:
+            message = await self.llm.ainvoke(self._knowledge_messages(state["text"], state.get("history", ())))
+            return {"answer": message.content, "success": True, "cached": False}
+        except Exception as e:
+            return {"answer": f"Error during answer: {str(e)}", "success": False, "cached": False}
+
+    async def arun(self, text: str, history: Optional[List[Tuple[str, str]]] = None) -> dict:
+        """
+        Answer one transcript
+
+        Args:
+            text (str): Transcribed user request
+            history (list): Earlier (question, answer) turns of the same device, oldest first;
+                only general knowledge answers use them, searches stay self-contained
+
+        Returns:
+            dict: answer, success flag and the routing decision (intent, confidence, method, route_ms)
+        """
+        state = await self.graph.ainvoke({"text": text, "history": history or []})
+        return {
+            "answer": state.get("answer", ""),
+            "success": state.get("success", False),
+            "cached": state.get("cached", False),
+            "intent": state.get("intent"),
+            "confidence": state.get("confidence"),
+            "route_method": state.get("route_method"),
+            "route_ms": state.get("route_ms")
+        }
+
+    async def astream(self, text: str, history: Optional[List[Tuple[str, str]]] = None) -> AsyncIterator[dict]:
+        """
+        Answer one transcript as a stream of events
+
+        Yields {"type": "route", ...} with the routing decision, then
+        {"type": "token", "text": ...} pieces of the answer as the LLM produces
+        them, and finally {"type": "end", "success": ..., "cached": ...}.
+        Web searches stream the synthesis call; agents that cannot stream
+        (the dietitian, the ReAct search loop) send their whole answer as a
+        single token. Failed answers produce no tokens, only an end event
+        with success False.
+
+        Args:
+            text (str): Transcribed user request
+            history (list): Earlier (question, answer) turns, as in arun()
+        """
+        state: OrchestratorState = {"text": text, "history": history or []}
+        state.update(await self._route(state))
+        yield {
+            "type": "route",
+            "intent": state["intent"],
+            "confidence": state["confidence"],
+            "route_method": state["route_method"],
+            "route_ms": state["route_ms"]
+        }
+
+        if state["intent"] == KNOWLEDGE:
+            try:
+                async for chunk in self.llm.astream(self._knowledge_messages(text, state["history"])):
+                    if chunk.content:
+                        yield {"type": "token", "text": chunk.content}
+                yield {"type": "end", "success": True, "cached": False}
+            except Exception as e:
+                log.exception("[ORCHESTRATOR] Streaming answer failed: %s", e)
+                yield {"type": "end", "success": False, "cached": False}
+            return
+
+        if state["intent"] == SEARCH:
+            pieces = []
+            try:
+                async for piece in self.websearch_agent.astream(SEARCH_PROMPT.format(text=text), cache_key=text):
+                    pieces.append(piece)
+                    yield {"type": "token", "text": piece}
+            except Exception as e:
+                # Whatever was streamed before the failure stands; is_usable_answer() judges it
+                log.warning("[ORCHESTRATOR] Streaming search failed after %d pieces: %s", len(pieces), e)
+            yield {"type": "end", "success": is_usable_answer("".join(pieces)), "cached": False}
+            return
+
+        result = await self._calories(state)
+        if result["success"]:
+            yield {"type": "token", "text": result["answer"]}
+        yield {"type": "end", "success": result["success"], "cached": result["cached"]}
@@ -0,0 +1,169 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agents.websearch.cache import normalize_question
+
+SEARCH = "search"          # browser check - current facts from the internet
+CALORIES = "calories"      # count calories / dietitian
+KNOWLEDGE = "knowledge"    # answer from the model's own knowledge
+INTENTS = (SEARCH, CALORIES, KNOWLEDGE)
+
+# High-precision patterns on normalized text (lowercase, no diacritics, no punctuation)
+KEYWORD_RULES: List[Tuple[str, "re.Pattern"]] = [
+    (CALORIES, re.compile(r"\b(kalori\w*|kcal|kilokalori\w*|zjadl\w*|zjadlem|zjadlam|wartosc\w* odzywcz\w*|bialk\w+ (ma|zawiera)|ile (tluszczu|weglowodanow)|na (sniadanie|obiad|kolacje|podwieczorek))\b")),
+    (SEARCH, re.compile(r"\b(cen[aeyi]|kurs\w*|pogod\w*|notowani\w*|wynik\w* meczu|kto wygral|najnowsz\w*|aktualn\w*|wiadomosc\w*|dzis\w*|teraz|jutro|godzin\w* otwarcia|bitcoin\w*|co nowego)\b")),
+    (KNOWLEDGE, re.compile(r"\b(co to (jest|znaczy)|wyjasnij|wytlumacz|zdefiniuj|przetlumacz|opowiedz (mi )?(zart|dowcip)|ile to jest|policz|oblicz|jak sie mowi|kim (byl|byla|byli)|kto (napisal|wynalazl|odkryl|namalowal|skomponowal)|napisz)\b")),
+]
+
+# Seed examples for the n-gram model; rules above catch the obvious cases first
+TRAINING_EXAMPLES: Dict[str, List[str]] = {
+    SEARCH: [
+        "jaka jest aktualna cena bitcoina",
+        "kto wygrał wczoraj mecz legii",
+        "jaka będzie pogoda w krakowie",
+        "ile kosztuje euro w złotówkach",
+        "kiedy jest następny koncert dawida podsiadło",
+        "co słychać w wiadomościach",
+        "o której otwierają biedronkę w niedzielę",
+        "kto jest obecnym premierem polski",
+        "jakie filmy grają w kinie",
+        "kiedy wychodzi nowy iphone",
+        "jaki jest kurs dolara",
+        "ile kosztuje bilet na pociąg do warszawy",
+        "czy jutro będzie padać",
+        "jakie są wyniki wyborów",
+        "gdzie jest najbliższa apteka całodobowa",
+        "jaka jest temperatura w gdańsku",
+        "ile kosztuje litr benzyny",
+        "kto gra dziś w lidze mistrzów",
+    ],
+    CALORIES: [
+        "ile kalorii ma banan",
+        "zjadłem dwa jajka na śniadanie",
+        "ile kcal ma kromka chleba",
+        "zjadłam 100 gram ryżu",
+        "ile białka jest w piersi z kurczaka",
+        "ile kalorii ma pizza margherita",
+        "na obiad było schabowe z ziemniakami",
+        "wypiłem puszkę coli",
+        "ile kalorii dziś zjadłem",
+        "zapisz że zjadłem jabłko",
+        "ile tłuszczu ma awokado",
+        "czy jogurt grecki jest kaloryczny",
+        "ile węglowodanów ma makaron",
+        "dodaj do dziennika owsiankę z mlekiem",
+        "ile kalorii spaliłem zjadając sałatkę",
+        "zjadłem batonika snickers",
+        "na kolację był kebab",
+        "ile ma kalorii omlet",
+    ],
+    KNOWLEDGE: [
+        "co to jest fotosynteza",
+        "wyjaśnij jak działa silnik elektryczny",
+        "dlaczego niebo jest niebieskie",
+        "ile to jest dwa razy dwa",
+        "przetłumacz dzień dobry na angielski",
+        "opowiedz mi żart",
+        "kim był mikołaj kopernik",
+        "jak się mówi dziękuję po niemiecku",
+        "co oznacza słowo empatia",
+        "jak działa tęcza",
+        "napisz krótki wierszyk o gęsi",
+        "jaka jest stolica francji",
+        "ile nóg ma pająk",
+        "jak ugotować jajko na miękko",
+        "czym się różni wirus od bakterii",
+        "podaj synonim słowa szybki",
+        "ile wynosi pierwiastek z szesnastu",
+        "jak się nazywasz",
+        "ile kontynentów ma ziemia",
+        "kto namalował monę lizę",
+        "jak zrobić ciasto drożdżowe",
+        "w którym roku była bitwa pod grunwaldem",
+    ],
+}
+
+
+def char_ngrams(text: str, sizes: Iterable[int] = (2, 3, 4)) -> List[str]:
+    """Character n-grams of each word, padded so prefixes and suffixes stand out"""
+    grams = []
+    for word in text.split():
+        padded = f" {word} "
+        for n in sizes:
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class NGramClassifier:
+    """Multinomial naive Bayes over character n-grams - tiny, no dependencies, microseconds per query"""
+
+    def __init__(self, alpha: float = 0.5, sharpness: float = 8.0):
+        self.alpha = alpha
+        # Naive Bayes is wildly overconfident on overlapping n-grams; scoring the
+        # mean per-gram log-likelihood times `sharpness` gives usable confidences
+        self.sharpness = sharpness
+        self.log_priors: Dict[str, float] = {}
+        self.log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self.log_unseen: Dict[str, float] = {}
+
+    def fit(self, examples: Dict[str, List[str]]) -> "NGramClassifier":
+        counts = {label: Counter() for label in examples}
+        for label, texts in examples.items():
+            for text in texts:
+                counts[label].update(char_ngrams(normalize_question(text)))
+        vocabulary = set().union(*counts.values())
+        total_examples = sum(len(texts) for texts in examples.values())
+
+        for label, counter in counts.items():
+            denominator = sum(counter.values()) + self.alpha * len(vocabulary)
+            self.log_priors[label] = math.log(len(examples[label]) / total_examples)
+            self.log_likelihoods[label] = {
+                gram: math.log((count + self.alpha) / denominator) for gram, count in counter.items()
+            }
+            self.log_unseen[label] = math.log(self.alpha / denominator)
+        return self
+
+    def predict(self, normalized_text: str) -> Tuple[str, float]:
+        """Returns (label, posterior probability)"""
+        grams = char_ngrams(normalized_text)
+        scores = {}
+        for label, prior in self.log_priors.items():
+            likelihoods = self.log_likelihoods[label]
+            unseen = self.log_unseen[label]
+            mean_log_likelihood = sum(likelihoods.get(gram, unseen) for gram in grams) / max(1, len(grams))
+            scores[label] = self.sharpness * mean_log_likelihood + prior
+
+        best = max(scores, key=scores.get)
+        # Softmax over log scores, shifted by the max for numerical stability
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+
+class IntentRouter:
+    """
+    Picks the agent for a transcript without an LLM round-trip.
+
+    Keyword rules decide the obvious cases; otherwise the n-gram model votes.
+    Predictions below `threshold` fall back to `default_intent`, which is the
+    web search agent - the behaviour before routing existed.
+    """
+
+    def __init__(self, threshold: float = 0.6, default_intent: str = SEARCH,
+                 examples: Optional[Dict[str, List[str]]] = None):
+        self.threshold = threshold
+        self.default_intent = default_intent
+        self.classifier = NGramClassifier().fit(examples or TRAINING_EXAMPLES)
+
+    def route(self, text: str) -> Dict[str, object]:
+        normalized = normalize_question(text)
+
+        for intent, pattern in KEYWORD_RULES:
+            if pattern.search(normalized):
+                return {"intent": intent, "confidence": 1.0, "method": "rule"}
+
+        intent, confidence = self.classifier.predict(normalized)
+        if confidence < self.threshold:
+            return {"intent": self.default_intent, "confidence": confidence, "method": "fallback"}
+        return {"intent": intent, "confidence": confidence, "method": "ngram"}
@@ -1,56 +1,175 @@
 from langchain.agents import initialize_agent, AgentType
-from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage
-from typing import Type, Optional, List
+from typing import AsyncIterator, Type, Optional, List
 import os
 from dotenv import load_dotenv
+from agents.llm.gateway import get_gateway
 from .tools import WebSearchTool
+from .cache import AnswerCache
+from .multiquery import MultiQuerySearch
+from .search_layer import SearchLayer
 
 load_dotenv()
 
 
+def is_usable_answer(answer: str) -> bool:
+    """False for empty answers and the agent giving up on its iteration/time limit"""
+    lowered = answer.lower()
+    return bool(answer.strip()) and not (
+        "iteration limit" in lowered or
+        "time limit" in lowered or
+        "agent stopped" in lowered
+    )
+
+
 class WebSearchAgent:
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1):
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
+    """
+    Answers questions from the web.
+    
+    Two modes for the async path: "multi" (default) searches several
+    reformulations of the question concurrently and answers with a single
+    LLM call (see MultiQuerySearch); "react" is the original ReAct loop,
+    an LLM call plus a search per iteration. WEBSEARCH_MODE picks one.
+    The synchronous search() always uses the ReAct loop.
+    
+    Answers are cached in `cache`; raw search results below that in
+    `search_layer`, which also merges identical concurrent queries.
+    """
+    
+    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1, cache: Optional[AnswerCache] = None,
+                 callbacks: Optional[list] = None, mode: Optional[str] = None,
+                 search_layer: Optional[SearchLayer] = None):
+        self.cache = cache
+        self.search_layer = search_layer or SearchLayer.from_env()
+        self.mode = mode or os.getenv("WEBSEARCH_MODE", "multi")
+        self.llm = get_gateway().chat("websearch", model=model_name, temperature=temperature, callbacks=callbacks)
         
-        self.tools = [WebSearchTool()]
+        self.tools = [WebSearchTool(layer=self.search_layer, callbacks=callbacks)]
         
         self.agent = initialize_agent(
             tools=self.tools,
             llm=self.llm,
             agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
+            verbose=os.getenv("LOG_LEVEL", "INFO").upper() == "DEBUG",  # ReAct trace on stdout only when debugging
             handle_parsing_errors=True,
             return_intermediate_steps=True,
             max_iterations=3,  # Limit iterations to prevent timeout
             max_execution_time=30  # 30 second timeout
         )
+        
+        self.multi = MultiQuerySearch(
+            self.llm,
+            self.tools[0].aresults,
+            search_timeout=float(os.getenv("SEARCH_TIMEOUT", "4")),
+            deadline=float(os.getenv("SEARCH_DEADLINE", "15"))
+        )
     
-    def search(self, query: str) -> dict:
+    def search(self, query: str, cache_key: Optional[str] = None) -> dict:
         """
         Search for information based on user query
         
         Args:
             query (str): User's search query
+            cache_key (str, optional): Text to cache the answer under, e.g. the raw
+                transcript when the query wraps it in a prompt. Defaults to query.
             
         Returns:
             dict: Search results with answer and intermediate steps
         """
+        cache_key = cache_key or query
+        cached = self._from_cache(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             result = self.agent.invoke({"input": query})
+            return self._to_result(result, cache_key)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def asearch(self, query: str, cache_key: Optional[str] = None) -> dict:
+        """
+        Async version of search() - runs the agent with ainvoke on the caller's event loop
+        
+        Args:
+            query (str): User's search query
+            cache_key (str, optional): Text to cache the answer under. Defaults to query.
             
-            return {
-                "answer": result.get("output", ""),
-                "intermediate_steps": result.get("intermediate_steps", []),
-                "success": True
-            }
+        Returns:
+            dict: Search results with answer and intermediate steps
+        """
+        cache_key = cache_key or query
+        cached = self._from_cache(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            if self.mode == "multi":
+                # Queries are built from the bare question, the prompt only steers the answer
+                result = await self.multi.arun(query, question=cache_key)
+            else:
+                result = await self.agent.ainvoke({"input": query})
+            return self._to_result(result, cache_key)
         except Exception as e:
-            return {
-                "answer": f"Error during search: {str(e)}",
-                "intermediate_steps": [],
-                "success": False
-            }
\ No newline at end of file
+            return self._error_result(e)
+    
+    async def astream(self, query: str, cache_key: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Like asearch(), but yields the answer in pieces as the LLM writes it
+        
+        Only the multi-query mode really streams; a cached answer or the
+        ReAct loop's answer comes as one piece. Nothing is yielded when the
+        search fails.
+        
+        Args:
+            query (str): User's search query
+            cache_key (str, optional): Text to cache the answer under. Defaults to query.
+        """
+        cache_key = cache_key or query
+        if self.mode != "multi" or self._from_cache(cache_key) is not None:
+            result = await self.asearch(query, cache_key)
+            if result["success"] and is_usable_answer(result["answer"]):
+                yield result["answer"]
+            return
+        
+        pieces = []
+        async for piece in self.multi.astream(query, question=cache_key):
+            pieces.append(piece)
+            yield piece
+        answer = "".join(pieces)
+        if self.cache is not None and is_usable_answer(answer):
+            self.cache.set(cache_key, answer)
+    
+    def _from_cache(self, cache_key: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        return {
+            "answer": cached,
+            "intermediate_steps": [],
+            "success": True,
+            "cached": True
+        }
+    
+    def _to_result(self, result: dict, cache_key: str) -> dict:
+        answer = result.get("output", "")
+        
+        if self.cache is not None and is_usable_answer(answer):
+            self.cache.set(cache_key, answer)
+        
+        return {
+            "answer": answer,
+            "intermediate_steps": result.get("intermediate_steps", []),
+            "success": True,
+            "cached": False
+        }
+    
+    @staticmethod
+    def _error_result(error: Exception) -> dict:
+        return {
+            "answer": f"Error during search: {str(error)}",
+            "intermediate_steps": [],
+            "success": False
+        }
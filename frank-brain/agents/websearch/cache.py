@@ -0,0 +1,264 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "frank", "answer_cache.sqlite3")
+
+# Questions with words starting like these go stale quickly (prices, weather, "today")
+VOLATILE_WORDS = (
+    "cena", "cene", "ceny", "kurs", "pogoda", "pogode", "dzis", "dzisiaj", "teraz",
+    "aktualn", "wynik", "notowan", "bitcoin", "price", "weather", "today"
+)
+
+# Letters NFKD does not decompose into base letter + combining mark
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "l", "ß": "ss"})
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """
+    Cache key for a spoken question.
+
+    Ignores case, punctuation, extra whitespace and Polish diacritics, so
+    "Jaka jest aktualna cena Bitcoina?" and "jaka jest aktualna cena bitcoina"
+    hit the same entry even when Whisper varies the spelling.
+    """
+    text = text.translate(_EXTRA_FOLDS).lower()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text).replace("_", " ")
+    return _SPACES.sub(" ", text).strip()
+
+
+class AnswerCache:
+    """
+    SQLite-backed cache of agent answers with per-entry TTL and LRU eviction.
+
+    The database survives restarts; hit/miss counters are per process.
+
+    get() and set() run on the event loop, so neither touches the disk:
+    live entries are kept in an in-memory LRU (loaded from the database on
+    start, most recently used first), and a background thread writes new
+    answers, the batched access-time / hit-count bumps and the eviction of
+    expired and overflowing rows, a batch per transaction. Under WAL,
+    synchronous=NORMAL makes a commit a WAL append with no fsync (a power
+    cut may lose the last few entries, never corrupt).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 1000,
+        default_ttl: float = 24 * 3600,
+        volatile_ttl: float = 5 * 60,
+        flush_every: int = 64,
+        flush_interval: float = 0.5,
+        max_pending: int = 1024
+    ):
+        self.path = path or os.getenv("ANSWER_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.volatile_ttl = volatile_ttl
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dropped = 0
+        self.errors = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()  # guards the in-memory LRU, never held across a write
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, answer), LRU first
+        self._touched: Dict[str, Tuple[float, int]] = {}  # key -> (last access, hits) not yet written
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers(last_access)")
+        self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT key, expires_at, answer FROM answers WHERE expires_at >= ? ORDER BY last_access DESC LIMIT ?",
+            (time.time(), max_entries)
+        ).fetchall()
+        for key, expires_at, answer in reversed(rows):
+            self._entries[key] = (expires_at, answer)
+
+        self._thread = threading.Thread(target=self._run, name="answer-cache-writer", daemon=True)
+        self._thread.start()
+
+    def ttl_for(self, question: str) -> float:
+        words = normalize_question(question).split()
+        if any(word.startswith(VOLATILE_WORDS) for word in words):
+            return self.volatile_ttl
+        return self.default_ttl
+
+    def get(self, question: str) -> Optional[str]:
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]  # the row goes with the writer's next expiry sweep
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._touched[key] = (now, self._touched.get(key, (now, 0))[1] + 1)
+            if len(self._touched) >= self.flush_every:
+                self._enqueue(("touch", self._take_touched()))
+            self.hits += 1
+            return entry[1]
+
+    def set(self, question: str, answer: str, ttl: Optional[float] = None):
+        key = normalize_question(question)
+        if not key:
+            return
+        ttl = self.ttl_for(question) if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now + ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            # Bumps go first: the eviction after the insert orders by last_access
+            self._enqueue(("set", self._take_touched(), (key, question, answer, now, now + ttl, now)))
+
+    def _take_touched(self) -> Dict[str, Tuple[float, int]]:
+        """Hand the batched access bumps to the writer; call with the lock held"""
+        touched, self._touched = self._touched, {}
+        return touched
+
+    def _enqueue(self, item: tuple):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Only persistence is lost; the in-memory LRU already has the change
+            self.dropped += 1
+
+    def _write_batch(self, batch: List[tuple]):
+        now = time.time()
+        try:
+            with self._conn:  # one transaction per batch
+                for item in batch:
+                    if item[0] == "clear":
+                        self._conn.execute("DELETE FROM answers")
+                        continue
+                    touched = item[1]
+                    if touched:
+                        self._conn.executemany(
+                            "UPDATE answers SET last_access = ?, hits = hits + ? WHERE key = ?",
+                            [(last_access, hits, key) for key, (last_access, hits) in touched.items()]
+                        )
+                    if item[0] == "set":
+                        self._conn.execute(
+                            """
+                            INSERT INTO answers (key, question, answer, created_at, expires_at, last_access, hits)
+                            VALUES (?, ?, ?, ?, ?, ?, 0)
+                            ON CONFLICT(key) DO UPDATE SET
+                                answer = excluded.answer,
+                                created_at = excluded.created_at,
+                                expires_at = excluded.expires_at,
+                                last_access = excluded.last_access
+                            """,
+                            item[2]
+                        )
+                self._evict(now)
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.error("[CACHE] Failed to write %d answer cache updates: %s", len(batch), e)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM answers WHERE expires_at < ?", (now,))
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            batch = [item]
+            # Collect whatever else arrives within flush_interval into the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            for _ in range(len(batch) + stopping):
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued update is written, access bumps included"""
+        with self._lock:
+            touched = self._take_touched()
+        if touched:
+            self.queue.put(("touch", touched))
+        self.queue.join()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+        self.queue.put(("clear",))
+
+    def close(self, timeout: float = 5.0):
+        if self._thread.is_alive():
+            self.flush()
+            self.queue.put(None)
+            self._thread.join(timeout)
+        self._conn.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "pending_writes": self.queue.qsize(),
+            "dropped_writes": self.dropped,
+            "write_errors": self.errors
+        }
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import HumanMessage, SystemMessage
+
+from .cache import VOLATILE_WORDS, normalize_question
+
+log = logging.getLogger(__name__)
+
+SYNTHESIS_SYSTEM_PROMPT = (
+    "Odpowiadasz na pytanie wyłącznie na podstawie ponumerowanych wyników wyszukiwania. "
+    "Odpowiadaj po polsku, krótko - jednym lub dwoma zdaniami, bez formatowania i bez numerów źródeł. "
+    "Jeśli wyniki nie zawierają odpowiedzi, powiedz krótko, że nie udało się jej znaleźć."
+)
+
+# Question words that only add noise to a keyword query
+QUERY_STOP_WORDS = {
+    "jaka", "jaki", "jakie", "jest", "sa", "czy", "co", "kto", "kiedy", "gdzie", "ile", "jak", "na", "w",
+    "we", "z", "do", "o", "sie", "mi", "nam", "powiedz", "podaj", "sprawdz", "prosze", "moze", "by", "bedzie",
+    "ten", "ta", "to", "tym", "tego", "a", "i"
+}
+_WORD = re.compile(r"[^\W_]+")
+RRF_K = 60  # reciprocal rank fusion constant; dampens the head of each result list
+
+SearchFn = Callable[[str, int], Awaitable[List[Dict[str, str]]]]
+
+
+def reformulate(question: str, count: int = 3) -> List[str]:
+    """
+    Query variants for one question, built locally so they cost no LLM round-trip
+
+    The question as spoken, its keywords, and the keywords with today's
+    date for time-sensitive questions (prices, weather) or "wikipedia"
+    for the rest.
+    """
+    words = _WORD.findall(question)
+    keywords = " ".join(word for word in words if normalize_question(word) not in QUERY_STOP_WORDS)
+    folded = normalize_question(question).split()
+    if any(word.startswith(VOLATILE_WORDS) for word in folded):
+        hint = time.strftime("%d.%m.%Y")
+    else:
+        hint = "wikipedia"
+    variants = [question.strip(), keywords, f"{keywords} {hint}" if keywords else ""]
+    unique: List[str] = []
+    for variant in variants:
+        if variant and normalize_question(variant) not in (normalize_question(v) for v in unique):
+            unique.append(variant)
+    return unique[:count]
+
+
+def merge_results(result_lists: List[List[Dict[str, str]]], question: str, limit: int = 6) -> List[Dict[str, str]]:
+    """
+    Dedupe and rank snippets from several queries
+
+    Results are deduplicated by URL and by snippet text and scored with
+    reciprocal rank fusion (a snippet several queries agree on wins),
+    plus a small bonus for sharing words with the question.
+
+    Returns:
+        list: best `limit` results (title, href, body), best first
+    """
+    keywords = {word for word in normalize_question(question).split() if word not in QUERY_STOP_WORDS}
+    scores: Dict[str, float] = {}
+    entries: Dict[str, Dict[str, str]] = {}
+    body_keys: Dict[str, str] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            body = (result.get("body") or "").strip()
+            if not body:
+                continue
+            body_key = normalize_question(body)[:160]
+            key = body_keys.get(body_key) or result.get("href") or body_key
+            body_keys.setdefault(body_key, key)
+            if key not in entries:
+                entries[key] = result
+                words = set(normalize_question(body).split())
+                scores[key] = 0.02 * len(keywords & words) / max(len(keywords), 1)
+            scores[key] += 1.0 / (RRF_K + rank + 1)
+    ranked = sorted(entries, key=scores.__getitem__, reverse=True)
+    return [entries[key] for key in ranked[:limit]]
+
+
+class MultiQuerySearch:
+    """
+    Search mode for WebSearchAgent: several queries at once, one LLM call.
+
+    Instead of a ReAct loop (an LLM call and a DuckDuckGo call per
+    iteration, back to back), the question is reformulated locally, all
+    variants are searched concurrently, the merged and ranked snippets go
+    into a single answer-synthesis call. Searching stops at
+    `search_timeout` with whatever has arrived; the whole answer is bound
+    by `deadline` seconds.
+    """
+
+    def __init__(self, llm, search: SearchFn, queries: int = 3, results_per_query: int = 5, max_snippets: int = 6,
+                 search_timeout: float = 4.0, deadline: float = 15.0):
+        self.llm = llm
+        self.search = search
+        self.queries = queries
+        self.results_per_query = results_per_query
+        self.max_snippets = max_snippets
+        self.search_timeout = search_timeout
+        self.deadline = deadline
+
+    async def gather(self, question: str) -> Tuple[List[str], List[Dict[str, str]]]:
+        """Run every reformulation concurrently; returns (queries, merged snippets)"""
+        queries = reformulate(question, self.queries)
+        tasks = [asyncio.ensure_future(self.search(query, self.results_per_query)) for query in queries]
+        done, pending = await asyncio.wait(tasks, timeout=self.search_timeout)
+        for task in pending:
+            task.cancel()
+        result_lists = []
+        for query, task in zip(queries, tasks):
+            if task not in done:
+                log.info("[SEARCH] '%s' missed the %.1fs search timeout", query, self.search_timeout)
+            elif task.exception() is not None:
+                log.warning("[SEARCH] '%s' failed: %s", query, task.exception())
+            else:
+                result_lists.append(task.result())
+        return queries, merge_results(result_lists, question, self.max_snippets)
+
+    @staticmethod
+    def messages(instruction: str, snippets: List[Dict[str, str]]) -> list:
+        sources = "\n".join(
+            f"[{number}] {snippet.get('title', '')}: {snippet['body']}" for number, snippet in enumerate(snippets, 1)
+        )
+        return [
+            SystemMessage(content=SYNTHESIS_SYSTEM_PROMPT),
+            HumanMessage(content=f"Dzisiaj jest {time.strftime('%d.%m.%Y')}.\n\n{instruction}\n\n"
+                                 f"Wyniki wyszukiwania:\n{sources}")
+        ]
+
+    async def arun(self, instruction: str, question: Optional[str] = None) -> dict:
+        """
+        Search and answer
+
+        Args:
+            instruction (str): What to answer, e.g. the search prompt wrapping the question
+            question (str, optional): Bare question to build the queries from. Defaults to instruction.
+
+        Returns:
+            dict: "output" (empty when nothing was found or the deadline passed) and
+                "intermediate_steps" as (query list, source URLs)
+        """
+        started = time.monotonic()
+        queries, snippets = await self.gather(question or instruction)
+        steps = [(queries, [snippet.get("href") for snippet in snippets])]
+        if not snippets:
+            return {"output": "", "intermediate_steps": steps}
+        remaining = self.deadline - (time.monotonic() - started)
+        try:
+            message = await asyncio.wait_for(self.llm.ainvoke(self.messages(instruction, snippets)), max(remaining, 0.1))
+        except asyncio.TimeoutError:
+            log.warning("[SEARCH] Answer synthesis missed the %.0fs deadline", self.deadline)
+            return {"output": "", "intermediate_steps": steps}
+        return {"output": message.content, "intermediate_steps": steps}
+
+    async def astream(self, instruction: str, question: Optional[str] = None) -> AsyncIterator[str]:
+        """Like arun(), but yields the answer piece by piece as the LLM writes it; stops at the deadline"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        _, snippets = await self.gather(question or instruction)
+        if not snippets:
+            return
+        stream = self.llm.astream(self.messages(instruction, snippets))
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    log.warning("[SEARCH] Answer synthesis cut off at the %.0fs deadline", self.deadline)
+                    break
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    log.warning("[SEARCH] Answer synthesis cut off at the %.0fs deadline", self.deadline)
+                    break
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            await stream.aclose()
@@ -0,0 +1,273 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .cache import normalize_question
+
+Results = List[Dict[str, str]]  # DuckDuckGo shape: title, href, body
+CacheKey = Tuple[str, int]
+
+CACHE = "cache"      # answered from the result cache
+SHARED = "shared"    # joined an identical query already in flight
+NETWORK = "network"  # fetched from the backend
+ERROR = "error"      # the fetch failed
+
+
+class DuckDuckGoBackend:
+    """Raw DuckDuckGo text results; raises on network errors and rate limits"""
+
+    name = "duckduckgo"
+
+    def search(self, query: str, max_results: int) -> Results:
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+    async def asearch(self, query: str, max_results: int) -> Results:
+        from duckduckgo_search import AsyncDDGS
+        async with AsyncDDGS() as ddgs:
+            return [r async for r in ddgs.text(query, max_results=max_results)]
+
+
+class FakeSearchBackend:
+    """
+    Offline stand-in for DuckDuckGo, for benchmarks and local runs.
+
+    Answers from `results` (normalized query -> results) or with made-up
+    snippets echoing the query, after `latency` seconds. Every `fail_every`-th
+    call raises, to exercise error paths. `calls` counts real fetches, which
+    is what coalescing and caching should keep low.
+    """
+
+    name = "fake"
+
+    def __init__(self, results: Optional[Dict[str, Results]] = None, latency: float = 0.05, fail_every: int = 0):
+        self.results = {normalize_question(query): hits for query, hits in (results or {}).items()}
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def _answer(self, query: str, max_results: int) -> Results:
+        self.calls += 1
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError(f"fake search failure #{self.calls}")
+        key = normalize_question(query)
+        if key in self.results:
+            return self.results[key][:max_results]
+        slug = key.replace(" ", "-")
+        return [{"title": f"{query} ({rank})", "href": f"https://example.invalid/{slug}/{rank}",
+                 "body": f"Wynik {rank} dla zapytania: {query}."} for rank in range(1, max_results + 1)]
+
+    def search(self, query: str, max_results: int) -> Results:
+        time.sleep(self.latency)
+        return self._answer(query, max_results)
+
+    async def asearch(self, query: str, max_results: int) -> Results:
+        await asyncio.sleep(self.latency)
+        return self._answer(query, max_results)
+
+
+class _Flight:
+    """A synchronous fetch other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results: Results = []
+        self.error: Optional[BaseException] = None
+
+
+class SearchLayer:
+    """
+    Search results below WebSearchTool: a short-TTL cache plus single-flight.
+
+    A ReAct loop often repeats a query, and devices asking the same trending
+    question at once would each hit DuckDuckGo. Queries are keyed by their
+    normalized text and result count. A fresh cached result is returned
+    straight away; an identical query already being fetched is joined
+    instead of fetched again; only the first caller goes to the network.
+    The async fetch runs as its own task, so a caller giving up (the
+    multi-query search timeout) neither cancels it for the others nor
+    stops it from filling the cache. Failures and empty result lists are
+    not cached.
+
+    Every query is timed and counted by source (cache, shared, network,
+    error); `observer(source, seconds)` gets each one, e.g. for /metrics.
+    """
+
+    def __init__(self, backend=None, ttl: float = 120.0, max_entries: int = 256, max_results: int = 5,
+                 observer: Optional[Callable[[str, float], None]] = None, recent: int = 50):
+        self.backend = backend or DuckDuckGoBackend()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_results = max_results
+        self.observer = observer
+        self.counts = {CACHE: 0, SHARED: 0, NETWORK: 0, ERROR: 0}
+        self.evictions = 0
+        self._cache: "OrderedDict[CacheKey, Tuple[float, Results]]" = OrderedDict()  # key -> (expires_at, results)
+        self._tasks: Dict[CacheKey, "asyncio.Task[Results]"] = {}
+        self._flights: Dict[CacheKey, _Flight] = {}
+        self._fetch_seconds: Deque[float] = deque(maxlen=512)
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, observer: Optional[Callable[[str, float], None]] = None) -> "SearchLayer":
+        """SEARCH_BACKEND (duckduckgo or fake), SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_FAKE_LATENCY"""
+        if os.getenv("SEARCH_BACKEND", "duckduckgo") == "fake":
+            backend = FakeSearchBackend(latency=float(os.getenv("SEARCH_FAKE_LATENCY", "0.05")))
+        else:
+            backend = DuckDuckGoBackend()
+        return cls(
+            backend,
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "120")),
+            max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "256")),
+            observer=observer
+        )
+
+    def _key(self, query: str, max_results: Optional[int]) -> CacheKey:
+        return normalize_question(query), max_results or self.max_results
+
+    def _cached(self, key: CacheKey) -> Optional[Results]:
+        """Fresh cached results; call with the lock held"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: CacheKey, results: Results, seconds: float):
+        with self._lock:
+            self._fetch_seconds.append(seconds)
+            if not results:
+                return
+            self._cache[key] = (time.monotonic() + self.ttl, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _record(self, query: str, source: str, started: float):
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.counts[source] += 1
+            self._recent.append({"query": query, "source": source, "ms": round(seconds * 1000, 1)})
+        if self.observer is not None:
+            self.observer(source, seconds)
+
+    def search(self, query: str, max_results: Optional[int] = None) -> Results:
+        """
+        Results for a query from a blocking caller (the ReAct agent's tool thread)
+
+        Args:
+            query (str): Search query
+            max_results (int, optional): Defaults to max_results of the layer
+
+        Returns:
+            list: title, href and body of each result; raises when the fetch fails
+        """
+        started = time.perf_counter()
+        key = self._key(query, max_results)
+        with self._lock:
+            results = self._cached(key)
+            flight = self._flights.get(key) if results is None else None
+            leader = results is None and flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if results is not None:
+            self._record(query, CACHE, started)
+            return results
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                self._record(query, ERROR, started)
+                raise flight.error
+            self._record(query, SHARED, started)
+            return flight.results
+
+        try:
+            flight.results = self.backend.search(query, key[1])
+            self._store(key, flight.results, time.perf_counter() - started)
+        except Exception as e:
+            flight.error = e
+            self._record(query, ERROR, started)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        self._record(query, NETWORK, started)
+        return flight.results
+
+    async def asearch(self, query: str, max_results: Optional[int] = None) -> Results:
+        """Async version of search(); identical queries on the same event loop share one fetch"""
+        started = time.perf_counter()
+        key = self._key(query, max_results)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            results = self._cached(key)
+            task = self._tasks.get(key) if results is None else None
+            if task is not None and task.get_loop() is not loop:
+                task = None  # left over from another event loop
+            leader = results is None and task is None
+            if leader:
+                task = self._tasks[key] = loop.create_task(self._fetch(key, query))
+                # Retrieved here too, in case every caller gave up before a failure
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if results is not None:
+            self._record(query, CACHE, started)
+            return results
+        try:
+            # shield: a caller that times out must not cancel the fetch the others wait for
+            results = await asyncio.shield(task)
+        except Exception:
+            self._record(query, ERROR, started)
+            raise
+        self._record(query, NETWORK if leader else SHARED, started)
+        return results
+
+    async def _fetch(self, key: CacheKey, query: str) -> Results:
+        started = time.perf_counter()
+        try:
+            results = await self.backend.asearch(query, key[1])
+            self._store(key, results, time.perf_counter() - started)
+            return results
+        finally:
+            with self._lock:
+                if self._tasks.get(key) is asyncio.current_task():
+                    del self._tasks[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            fetches = sorted(self._fetch_seconds)
+            recent = list(self._recent)
+            counts = dict(self.counts)
+            entries = len(self._cache)
+        queries = sum(counts.values())
+
+        def percentile(p: float) -> float:
+            return fetches[min(int(p * len(fetches)), len(fetches) - 1)] * 1000 if fetches else 0.0
+
+        return {
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "queries": queries,
+            **counts,
+            "evictions": self.evictions,
+            "in_flight": len(self._tasks) + len(self._flights),
+            "hit_rate": (counts[CACHE] + counts[SHARED]) / queries if queries else 0.0,
+            "fetch_p50_ms": percentile(0.5),
+            "fetch_p95_ms": percentile(0.95),
+            "recent": recent
+        }
@@ -1,21 +1,37 @@
 from langchain.tools import BaseTool
-from langchain_community.tools import DuckDuckGoSearchRun
+from typing import Dict, List, Optional
+from .search_layer import SearchLayer
 
 
 class WebSearchTool(BaseTool):
     name: str = "web_search"
     description: str = "Useful for searching information on the internet when you need current information or facts about any topic"
     
-    def __init__(self):
-        super().__init__()
-        self._search = DuckDuckGoSearchRun()
+    max_results: int = 5
+    
+    def __init__(self, layer: Optional[SearchLayer] = None, **kwargs):
+        super().__init__(**kwargs)
+        # Cached, single-flight DuckDuckGo; shared by the ReAct loop and the multi-query search
+        self._layer = layer or SearchLayer(max_results=self.max_results)
+    
+    @staticmethod
+    def _join(results: List[Dict[str, str]]) -> str:
+        # Same shape as DuckDuckGoSearchRun: snippets joined into one string
+        snippets = [r["body"] for r in results]
+        return " ".join(snippets) if snippets else "No good DuckDuckGo Search Result was found"
     
     def _run(self, query: str) -> str:
         try:
-            results = self._search.run(query)
-            return results
+            return self._join(self._layer.search(query, self.max_results))
         except Exception as e:
             return f"Error during search: {str(e)}"
     
-    def _arun(self, query: str):
-        raise NotImplementedError("WebSearchTool does not support async")
\ No newline at end of file
+    async def aresults(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+        """Raw DuckDuckGo results (title, href, body); raises on network errors"""
+        return await self._layer.asearch(query, max_results or self.max_results)
+    
+    async def _arun(self, query: str) -> str:
+        try:
+            return self._join(await self.aresults(query))
+        except Exception as e:
+            return f"Error during search: {str(e)}"
@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+AudioInput = Union[str, np.ndarray]
+
+log = logging.getLogger(__name__)
+
+
+class ASRConfig:
+    """Per-deployment decode settings, read from ASR_* environment variables"""
+
+    def __init__(
+        self,
+        backend: str = "faster-whisper",
+        model_size: str = "base",
+        language: Optional[str] = "pl",
+        beam_size: int = 1,
+        temperatures: Tuple[float, ...] = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        threads: int = 0,
+        compute_type: str = "int8",
+        workers: int = 1,
+        processes: int = 1
+    ):
+        self.backend = backend
+        self.model_size = model_size
+        self.language = language or None  # None = auto-detect on every call
+        self.beam_size = beam_size
+        self.temperatures = temperatures
+        self.threads = threads or (os.cpu_count() or 1)
+        self.compute_type = compute_type
+        self.workers = workers
+        self.processes = processes  # > 1 shards decodes over that many model processes (see asr_pool)
+
+    @classmethod
+    def from_env(cls) -> "ASRConfig":
+        temperatures = os.getenv("ASR_TEMPERATURES", "0.0,0.2,0.4,0.6,0.8,1.0")
+        return cls(
+            backend=os.getenv("ASR_BACKEND", "faster-whisper"),
+            model_size=os.getenv("ASR_MODEL", "base"),
+            language=os.getenv("ASR_LANGUAGE", "pl"),
+            beam_size=int(os.getenv("ASR_BEAM_SIZE", "1")),
+            temperatures=tuple(float(t) for t in temperatures.split(",") if t.strip()),
+            threads=int(os.getenv("ASR_THREADS", "0")),
+            compute_type=os.getenv("ASR_COMPUTE_TYPE", "int8"),
+            workers=int(os.getenv("ASR_WORKERS", "1")),
+            processes=int(os.getenv("ASR_PROCESSES", "1"))
+        )
+
+
+class ASRBackend:
+    """
+    Common interface for speech recognition engines.
+
+    transcribe() takes a file path or a 16kHz mono float32 array and returns
+    a dict with "text", "language" and "segments" like openai-whisper does.
+    """
+
+    name = "base"
+
+    def __init__(self, config: ASRConfig):
+        self.config = config
+
+    def transcribe(self, audio: AudioInput, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def warmup(self):
+        """Run one dummy decode so the first real request does not pay for lazy initialisation"""
+        self.transcribe(np.zeros(16000, dtype=np.float32))
+
+
+class WhisperBackend(ASRBackend):
+    """Reference openai-whisper engine (PyTorch, fp32 on CPU)"""
+
+    name = "whisper"
+
+    def __init__(self, config: ASRConfig):
+        super().__init__(config)
+        import torch
+        import whisper
+
+        torch.set_num_threads(config.threads)
+        self.model = whisper.load_model(config.model_size)
+        # The PyTorch model is not safe to call from several threads at once
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio: AudioInput, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        options = {
+            "language": self.config.language,
+            "temperature": self.config.temperatures,
+            "initial_prompt": initial_prompt or None,
+            "fp16": False
+        }
+        if self.config.beam_size > 1:
+            options["beam_size"] = self.config.beam_size
+        with self._lock:
+            result = self.model.transcribe(audio, **options)
+        return {
+            "text": result["text"],
+            "language": result.get("language", self.config.language),
+            "segments": [
+                {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+                for seg in result.get("segments", [])
+            ]
+        }
+
+
+class FasterWhisperBackend(ASRBackend):
+    """CTranslate2 engine via faster-whisper, int8-quantized for CPU-only hosts"""
+
+    name = "faster-whisper"
+
+    def __init__(self, config: ASRConfig):
+        super().__init__(config)
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            config.model_size,
+            device="cpu",
+            compute_type=config.compute_type,
+            cpu_threads=config.threads,
+            num_workers=config.workers
+        )
+
+    def transcribe(self, audio: AudioInput, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        segments, info = self.model.transcribe(
+            audio,
+            language=self.config.language,
+            beam_size=self.config.beam_size,
+            temperature=list(self.config.temperatures),
+            initial_prompt=initial_prompt or None,
+            condition_on_previous_text=False
+        )
+        # segments is a lazy generator - decoding happens while we iterate
+        parts: List[Dict[str, Any]] = [
+            {"start": seg.start, "end": seg.end, "text": seg.text} for seg in segments
+        ]
+        return {
+            "text": "".join(seg["text"] for seg in parts),
+            "language": info.language,
+            "segments": parts
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend
+}
+
+
+def load_backend(config: Optional[ASRConfig] = None) -> ASRBackend:
+    """
+    Build the configured ASR backend, falling back to openai-whisper if faster-whisper is missing
+
+    With ASR_PROCESSES > 1 the backend is loaded once per worker process
+    behind a ProcessPoolBackend instead.
+    """
+    config = config or ASRConfig.from_env()
+    if config.backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{config.backend}', expected one of {sorted(BACKENDS)}")
+    if config.processes > 1:
+        from api.asr_pool import ProcessPoolBackend
+        return ProcessPoolBackend.from_env(config)
+
+    try:
+        backend = BACKENDS[config.backend](config)
+    except ImportError as e:
+        if config.backend == WhisperBackend.name:
+            raise
+        log.warning("[ASR] %s unavailable (%s), falling back to openai-whisper", config.backend, e)
+        backend = WhisperBackend(config)
+
+    log.info("[ASR] Loaded %s backend: model=%s, language=%s, beam=%d, threads=%d",
+             backend.name, config.model_size, config.language or "auto", config.beam_size, config.threads)
+    return backend
@@ -0,0 +1,413 @@
+import copy
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from api.asr import ASRBackend, ASRConfig, AudioInput
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Python 3.13+ can attach to a segment without the resource tracker claiming it
+_ATTACH = {"track": False} if sys.version_info >= (3, 13) else {}
+
+
+def split_cores(processes: int, cores: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    Give each worker its own contiguous block of CPU cores
+
+    With more workers than cores, workers share cores round-robin.
+    """
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if processes >= len(cores):
+        return [[cores[index % len(cores)]] for index in range(processes)]
+    size, extra = divmod(len(cores), processes)
+    blocks, start = [], 0
+    for index in range(processes):
+        end = start + size + (index < extra)
+        blocks.append(cores[start:end])
+        start = end
+    return blocks
+
+
+def _worker_main(index: int, config: ASRConfig, cores: List[int], slot_names: List[str], tasks, results):
+    """Worker process: pin to its cores, load one model, decode audio from the shared slots until told to stop"""
+    from api.asr import load_backend
+    from api.metrics import configure_logging
+
+    configure_logging()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    os.environ["OMP_NUM_THREADS"] = str(config.threads)  # before torch / CTranslate2 spin up their thread pools
+    slots = [SharedMemory(name=name, **_ATTACH) for name in slot_names]
+    views = [np.ndarray((slot.size // 4,), dtype=np.float32, buffer=slot.buf) for slot in slots]
+    backend = load_backend(config)
+    backend.warmup()
+    results.send(("ready", index, os.getpid(), None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot, samples, audio, initial_prompt = task
+        if slot is not None:
+            audio = views[slot][:samples]  # zero-copy: the parent holds the slot until we answer
+        # The stuck-worker timeout runs from here, not from when the request was queued behind others
+        results.send(("started", index, request_id, None))
+        try:
+            results.send(("done", index, request_id, backend.transcribe(audio, initial_prompt=initial_prompt)))
+        except Exception as e:
+            results.send(("error", index, request_id, f"{type(e).__name__}: {e}"))
+        audio = None
+
+    del views
+    for slot in slots:
+        slot.close()
+    results.close()
+
+
+class _Request:
+    def __init__(self, request_id: int, slot: Optional[int], samples: int, audio: Optional[AudioInput],
+                 initial_prompt: Optional[str]):
+        self.id = request_id
+        self.slot = slot
+        self.samples = samples
+        self.audio = audio  # file path or oversized array; None when the audio sits in a slot
+        self.initial_prompt = initial_prompt
+        self.future: Future = Future()
+        self.worker: Optional[int] = None
+        self.attempts = 0
+        self.dispatched_at = 0.0
+        self.started_at: Optional[float] = None  # when the worker began decoding it
+
+    def task(self) -> tuple:
+        return self.id, self.slot, self.samples, self.audio, self.initial_prompt
+
+
+class _Worker:
+    def __init__(self, index: int, cores: List[int]):
+        self.index = index
+        self.cores = cores
+        self.process: Optional[mp.process.BaseProcess] = None
+        self.tasks = None
+        self.results = None  # read end of the worker's own result pipe
+        self.ready = False
+        self.pid: Optional[int] = None
+        self.inflight: Dict[int, _Request] = {}
+        self.served = 0
+        self.failed = 0
+        self.restarts = 0
+        self.crashes = 0  # deaths in a row before becoming ready
+        self.next_start = 0.0
+        self.started_at = 0.0
+        self.decode_ms = 0.0  # moving average
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "cores": self.cores,
+            "alive": self.process is not None and self.process.is_alive(),
+            "ready": self.ready,
+            "inflight": len(self.inflight),
+            "served": self.served,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "decode_ms": round(self.decode_ms, 1)
+        }
+
+
+class ProcessPoolBackend(ASRBackend):
+    """
+    ASR sharded over worker processes, one model per process.
+
+    Whisper decodes do not scale across threads of one Python process (the
+    GIL, one model lock), so ASR_PROCESSES workers each load their own
+    model (ASR_BACKEND) pinned to a block of cores, with the block size as
+    its thread count. Audio reaches them through shared-memory slots of
+    ASR_POOL_MAX_SECONDS each, ASR_POOL_SLOTS per worker: the caller copies
+    the samples into a free slot and only the slot number travels over the
+    worker's queue. File paths and longer clips are sent as they are.
+
+    Requests go to the worker with the fewest in flight, ready workers
+    first. Each worker answers over its own pipe, so killing one cannot
+    corrupt a channel the others share. A collector thread resolves results
+    and watches the workers: a worker that dies, or spends longer than
+    ASR_POOL_TIMEOUT decoding one clip, is stopped (SIGTERM, then SIGKILL),
+    restarted, and its requests are retried once on another worker. When no
+    slot frees up within ASR_POOL_SLOT_WAIT seconds, the clip goes through
+    the queue instead. transcribe() blocks like the in-process backends, so job workers can
+    call it unchanged.
+    """
+
+    name = "process-pool"
+
+    def __init__(self, config: ASRConfig, processes: int, slots_per_worker: int = 2, max_seconds: float = 60.0,
+                 request_timeout: float = 120.0, start_timeout: float = 600.0, slot_wait: float = 1.0):
+        super().__init__(config)
+        self.request_timeout = request_timeout
+        self.start_timeout = start_timeout
+        self.slot_wait = slot_wait
+        self._context = mp.get_context("spawn")  # fork would copy the API's threads and sockets
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closing = False
+
+        slot_bytes = int(max_seconds * SAMPLE_RATE) * 4
+        self._slots = [SharedMemory(create=True, size=slot_bytes) for _ in range(processes * slots_per_worker)]
+        self._slot_views = [np.ndarray((slot_bytes // 4,), dtype=np.float32, buffer=slot.buf) for slot in self._slots]
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(len(self._slots)):
+            self._free_slots.put(slot)
+
+        self.workers = [_Worker(index, cores) for index, cores in enumerate(split_cores(processes))]
+        for worker in self.workers:
+            self._start(worker)
+        self._collector = threading.Thread(target=self._collect, name="asr-pool-collector", daemon=True)
+        self._collector.start()
+        log.info("[ASR] Process pool: %d workers of %s, cores %s, %d shared slots of %.0fs",
+                 processes, config.backend, [w.cores for w in self.workers], len(self._slots), max_seconds)
+
+    @classmethod
+    def from_env(cls, config: ASRConfig) -> "ProcessPoolBackend":
+        return cls(
+            config,
+            processes=config.processes,
+            slots_per_worker=int(os.getenv("ASR_POOL_SLOTS", "2")),
+            max_seconds=float(os.getenv("ASR_POOL_MAX_SECONDS", "60")),
+            request_timeout=float(os.getenv("ASR_POOL_TIMEOUT", "120")),
+            slot_wait=float(os.getenv("ASR_POOL_SLOT_WAIT", "1"))
+        )
+
+    def _start(self, worker: _Worker):
+        worker_config = copy.copy(self.config)
+        worker_config.processes = 1
+        worker_config.threads = len(worker.cores)
+        worker.tasks = self._context.Queue()
+        worker.results, results = self._context.Pipe(duplex=False)
+        worker.ready = False
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.index, worker_config, worker.cores, [slot.name for slot in self._slots], worker.tasks,
+                  results),
+            name=f"asr-worker-{worker.index}",
+            daemon=True
+        )
+        worker.process.start()
+        results.close()  # the worker holds the only write end, so its exit shows up as EOF
+        worker.pid = worker.process.pid
+        worker.started_at = time.monotonic()
+        for request in worker.inflight.values():
+            worker.tasks.put(request.task())  # sent while every worker was down
+
+    def _dispatch(self, request: _Request, exclude: Optional[int] = None):
+        """Send a request to the least-loaded worker, ready ones first; call with the lock held"""
+        candidates = [w for w in self.workers if w.index != exclude] or self.workers
+        alive = [w for w in candidates if w.process is not None and w.process.is_alive()] or candidates
+        worker = min(alive, key=lambda w: (not w.ready, len(w.inflight), w.decode_ms))
+        request.worker = worker.index
+        request.attempts += 1
+        request.dispatched_at = time.monotonic()
+        request.started_at = None
+        worker.inflight[request.id] = request
+        if worker.process is not None:
+            worker.tasks.put(request.task())  # otherwise _start() sends it
+
+    def transcribe(self, audio: AudioInput, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        if self._closing:
+            raise RuntimeError("ASR process pool is shut down")
+        slot = None
+        samples = 0
+        if isinstance(audio, np.ndarray) and audio.size <= self._slot_views[0].size:
+            try:
+                slot = self._free_slots.get(timeout=self.slot_wait)
+            except queue.Empty:
+                log.debug("[ASR] No shared slot free after %.1fs, sending the clip through the queue", self.slot_wait)
+            else:
+                samples = audio.size
+                self._slot_views[slot][:samples] = audio.ravel()
+                audio = None
+        elif isinstance(audio, np.ndarray):
+            log.debug("[ASR] %.1fs clip exceeds the shared slot, sending it through the queue", audio.size / SAMPLE_RATE)
+        if audio is not None and isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+        request = _Request(next(self._ids), slot, samples, audio, initial_prompt)
+        try:
+            with self._lock:
+                self._dispatch(request)
+        except Exception:
+            self._release(request)
+            raise
+        # Generous ceiling: the collector restarts stuck workers well before this. On a timeout
+        # the slot stays held (a worker may still be reading it) until the collector settles the request
+        return request.future.result(timeout=self.request_timeout * 2 + self.start_timeout)
+
+    def _release(self, request: _Request):
+        """Return the request's shared slot once no worker will read it again"""
+        if request.slot is not None:
+            self._free_slots.put(request.slot)
+            request.slot = None
+
+    def _collect(self):
+        while not self._closing:
+            pipes = {worker.results: worker for worker in self.workers if worker.results is not None}
+            if pipes:
+                ready = wait(list(pipes), timeout=0.5)
+            else:
+                time.sleep(0.5)
+                ready = []
+            for pipe in ready:
+                try:
+                    message = pipe.recv()
+                except (EOFError, OSError):
+                    # The worker exited; _check_workers() restarts it with a new pipe
+                    self._close_pipe(pipes[pipe])
+                    continue
+                self._handle(*message)
+            self._check_workers()
+
+    def _close_pipe(self, worker: _Worker):
+        """Handle whatever the worker managed to send, then drop its pipe"""
+        if worker.results is None:
+            return
+        try:
+            while worker.results.poll():
+                self._handle(*worker.results.recv())
+        except (EOFError, OSError):
+            pass  # a message cut short by the kill
+        worker.results.close()
+        worker.results = None
+
+    @staticmethod
+    def _close_tasks(worker: _Worker):
+        """Drop a stopped worker's task queue without waiting to flush it into a pipe nobody reads"""
+        if worker.tasks is not None:
+            worker.tasks.cancel_join_thread()
+            worker.tasks.close()
+            worker.tasks = None
+
+    def _handle(self, kind: str, index: int, request_id: Any, payload: Any):
+        worker = self.workers[index]
+        if kind == "ready":
+            if request_id == worker.pid:
+                worker.ready = True
+                log.info("[ASR] Worker %d ready (pid %d) after %.1fs", index, worker.pid,
+                         time.monotonic() - worker.started_at)
+            return
+        with self._lock:
+            if kind == "started":
+                request = worker.inflight.get(request_id)
+                if request is not None:
+                    request.started_at = time.monotonic()
+                return
+            request = worker.inflight.pop(request_id, None)
+            if request is None:
+                return  # answered after a timeout and retried elsewhere
+            if kind == "done":
+                worker.served += 1
+                elapsed = (time.monotonic() - (request.started_at or request.dispatched_at)) * 1000
+                worker.decode_ms = elapsed if worker.decode_ms == 0 else 0.8 * worker.decode_ms + 0.2 * elapsed
+            else:
+                worker.failed += 1
+        self._release(request)
+        if kind == "done":
+            request.future.set_result(payload)
+        else:
+            request.future.set_exception(RuntimeError(f"ASR worker {index} failed: {payload}"))
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.process is None:
+                if now >= worker.next_start and not self._closing:
+                    with self._lock:
+                        worker.restarts += 1
+                        self._start(worker)
+                continue
+            alive = worker.process.is_alive()
+            with self._lock:
+                # Only a decode that has started can be stuck; requests queued behind it are just waiting
+                stuck = worker.ready and any(r.started_at is not None and now - r.started_at > self.request_timeout
+                                             for r in worker.inflight.values())
+            if alive and not stuck:
+                continue
+            if alive:
+                log.error("[ASR] Worker %d stuck for more than %.0fs, restarting it", worker.index, self.request_timeout)
+                worker.process.terminate()
+                worker.process.join(5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    worker.process.join(5)
+            else:
+                log.error("[ASR] Worker %d (pid %s) exited with code %s", worker.index, worker.pid,
+                          worker.process.exitcode)
+            # A worker that dies before it is ready (bad model, missing library) is retried with backoff
+            worker.crashes = 1 if worker.ready else worker.crashes + 1
+            worker.next_start = now + min(30.0, 0.5 * 2 ** (worker.crashes - 1))
+            self._close_pipe(worker)  # anything half-written by the dead worker goes with it
+            with self._lock:
+                self._close_tasks(worker)
+                worker.process = None
+                worker.ready = False
+                orphans = list(worker.inflight.values())
+                worker.inflight.clear()
+                for request in orphans:
+                    if request.attempts < 2 and not self._closing:
+                        self._dispatch(request, exclude=worker.index)
+                    else:
+                        worker.failed += 1
+                        self._release(request)
+                        request.future.set_exception(RuntimeError(f"ASR worker {worker.index} died decoding this clip"))
+
+    def warmup(self):
+        """Wait until every worker has loaded and warmed up its model (each warms itself on start)"""
+        deadline = time.monotonic() + self.start_timeout
+        while not all(worker.ready for worker in self.workers):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"ASR workers not ready after {self.start_timeout:.0f}s")
+            time.sleep(0.1)
+
+    def close(self, timeout: float = 5.0):
+        self._closing = True
+        self._collector.join(timeout)
+        running = [worker.process for worker in self.workers if worker.process is not None]
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.tasks.put(None)
+        for process in running:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        for worker in self.workers:
+            self._close_pipe(worker)
+            self._close_tasks(worker)
+        with self._lock:
+            for worker in self.workers:
+                for request in worker.inflight.values():
+                    request.future.set_exception(RuntimeError("ASR process pool is shut down"))
+                worker.inflight.clear()
+        self._slot_views = []
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.config.backend,
+            "workers": [worker.to_dict() for worker in self.workers],
+            "free_slots": self._free_slots.qsize(),
+            "slots": len(self._slots)
+        }
@@ -0,0 +1,95 @@
+import io
+import wave
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+WHISPER_SAMPLE_RATE = 16000
+SILENCE_DB = -120.0  # floor for digital silence, keeps levels JSON-serializable
+
+
+def pcm16_view(data) -> np.ndarray:
+    """View little-endian PCM16 bytes as int16 samples without copying them"""
+    usable = len(data) - (len(data) % 2)
+    return np.frombuffer(data, dtype="<i2", count=usable // 2)
+
+
+def pcm16_to_float32(data) -> np.ndarray:
+    """Convert PCM16 bytes to float32 in [-1, 1) - the only copy made is the float array itself"""
+    samples = pcm16_view(data)
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Linear-interpolation resampler, good enough for speech going into Whisper"""
+    if src_rate == dst_rate or len(audio) == 0:
+        return audio
+    duration = len(audio) / src_rate
+    dst_len = int(round(duration * dst_rate))
+    src_positions = np.arange(dst_len, dtype=np.float64) * (src_rate / dst_rate)
+    return np.interp(src_positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def audio_levels(audio: np.ndarray) -> Dict[str, float]:
+    """RMS/peak levels in the same terms as ffmpeg volumedetect (dBFS)"""
+    if len(audio) == 0:
+        return {"rms": 0.0, "peak": 0.0, "mean_volume_db": SILENCE_DB, "max_volume_db": SILENCE_DB}
+    rms = float(np.sqrt(np.dot(audio, audio) / len(audio)))
+    peak = float(np.max(np.abs(audio)))
+    return {
+        "rms": rms,
+        "peak": peak,
+        "mean_volume_db": max(float(20 * np.log10(rms)), SILENCE_DB) if rms > 0 else SILENCE_DB,
+        "max_volume_db": max(float(20 * np.log10(peak)), SILENCE_DB) if peak > 0 else SILENCE_DB
+    }
+
+
+def prepare_pcm16(data, sample_rate: int = WHISPER_SAMPLE_RATE) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Turn a raw PCM16 request body into Whisper input.
+
+    Returns the 16kHz float32 array and its levels; nothing touches the disk.
+    """
+    return prepare_samples(pcm16_view(data), sample_rate)
+
+
+def prepare_samples(samples: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> Tuple[np.ndarray, Dict[str, float]]:
+    """prepare_pcm16() for int16 samples that are already decoded, e.g. from a compressed upload"""
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    levels = audio_levels(audio)
+    return resample(audio, sample_rate), levels
+
+
+def int16_to_whisper(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Convert int16 samples recorded at any rate to 16kHz float32"""
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return resample(audio, sample_rate)
+
+
+def decode_wav_bytes(data: bytes) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+    """
+    Decode an in-memory 16-bit PCM WAV file into 16kHz mono float32.
+
+    Returns None when the data is not a WAV file this decoder understands,
+    so callers can fall back to Whisper's ffmpeg-based loader.
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if sample_width != 2:
+        return None
+
+    audio = pcm16_to_float32(frames)
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    info = {"sample_rate": sample_rate, "channels": channels}
+    return resample(audio, sample_rate), info
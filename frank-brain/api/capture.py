@@ -0,0 +1,275 @@
+import io
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.tts import wav_bytes
+
+try:
+    import soundfile
+except ImportError:  # FLAC is optional, zipped WAV works everywhere
+    soundfile = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "frank", "captures")
+
+
+class CaptureWriter:
+    """
+    Keeps copies of incoming audio for debugging without touching disk in the request path.
+
+    capture() only samples, copies and enqueues; a single background thread
+    encodes (FLAC through soundfile when installed, otherwise WAV in a
+    deflated zip), writes, records the file in a SQLite index and enforces
+    retention by total size and age. When the queue is full the artifact
+    is dropped and counted.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        capture_fraction: float = 1.0,
+        max_bytes: int = 200 * 1024 * 1024,
+        max_age: float = 3 * 24 * 3600,
+        max_pending: int = 32,
+        use_flac: bool = True
+    ):
+        self.directory = directory or os.getenv("CAPTURE_DIR", DEFAULT_DIR)
+        self.capture_fraction = capture_fraction  # fraction of requests captured, 0 disables
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.use_flac = use_flac and soundfile is not None
+        self.queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.dropped = 0
+        self.deleted = 0
+        self.errors = 0
+        self.disabled_reason: Optional[str] = None  # set when the writer could not start
+        self._thread: Optional[threading.Thread] = None
+        self._db: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls) -> "CaptureWriter":
+        return cls(
+            # CAPTURE_SAMPLE_RATE is the old name of CAPTURE_FRACTION
+            capture_fraction=float(os.getenv("CAPTURE_FRACTION", os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))),
+            max_bytes=int(float(os.getenv("CAPTURE_MAX_MB", "200")) * 1024 * 1024),
+            max_age=float(os.getenv("CAPTURE_MAX_AGE_HOURS", "72")) * 3600,
+            use_flac=os.getenv("CAPTURE_FORMAT", "flac") == "flac"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.capture_fraction > 0
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is queued, then stop the writer thread"""
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def capture(self, kind: str, pcm16, sample_rate: int, session_id: Optional[str] = None,
+                meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Queue one clip for writing
+
+        Args:
+            kind (str): Source of the audio, e.g. "stream", "chunked", "recording"
+            pcm16: int16 samples or PCM16 bytes; copied, so the caller may reuse its buffer
+            sample_rate (int): Sample rate of pcm16
+            session_id (str): Lookup key for /captures, a random ID when not given
+            meta (dict): Extra JSON-serialisable details stored in the index
+
+        Returns:
+            str: capture ID, or None when not sampled or dropped
+        """
+        if not self.enabled or random.random() >= self.capture_fraction or self._thread is None:
+            return None
+        data = pcm16.tobytes() if isinstance(pcm16, np.ndarray) else bytes(pcm16)
+        data = data[:len(data) - len(data) % 2]
+        capture_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        item = {
+            "id": capture_id,
+            "kind": kind,
+            "session_id": session_id or capture_id,
+            "data": data,
+            "sample_rate": sample_rate,
+            "meta": meta or {},
+            "created_at": time.time()
+        }
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return capture_id
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                sample_rate INTEGER NOT NULL,
+                duration REAL NOT NULL,
+                created_at REAL NOT NULL,
+                meta TEXT NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS captures_session ON captures (session_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS captures_created ON captures (created_at)")
+        db.commit()
+        return db
+
+    def _encode(self, item: Dict[str, Any]) -> Tuple[str, bytes]:
+        samples = np.frombuffer(item["data"], dtype="<i2")
+        if self.use_flac:
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, item["sample_rate"], format="FLAC", subtype="PCM_16")
+            return ".flac", buffer.getvalue()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(f"{item['id']}.wav", wav_bytes(item["data"], item["sample_rate"]))
+        return ".wav.zip", buffer.getvalue()
+
+    def _write(self, item: Dict[str, Any]):
+        suffix, payload = self._encode(item)
+        path = os.path.join(self.directory, f"{item['kind']}_{item['id']}{suffix}")
+        with open(path, "wb") as f:
+            f.write(payload)
+        self._db.execute(
+            "INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (item["id"], item["session_id"], item["kind"], path, len(payload), item["sample_rate"],
+             len(item["data"]) / 2 / item["sample_rate"], item["created_at"], json.dumps(item["meta"]))
+        )
+        self._db.commit()
+        self.written += 1
+
+    def _enforce_retention(self):
+        expired = self._db.execute(
+            "SELECT id, path FROM captures WHERE created_at < ?", (time.time() - self.max_age,)
+        ).fetchall()
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM captures").fetchone()[0]
+        if total > self.max_bytes:
+            # Oldest first until the total fits
+            running = 0
+            for capture_id, path, size in self._db.execute(
+                "SELECT id, path, bytes FROM captures ORDER BY created_at ASC"
+            ):
+                if total - running <= self.max_bytes:
+                    break
+                running += size
+                expired.append((capture_id, path))
+        for capture_id, path in set(expired):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM captures WHERE id = ?", (capture_id,))
+            self.deleted += 1
+        if expired:
+            self._db.commit()
+
+    def _disable(self, reason: str):
+        """Stop sampling and drop whatever is queued; the writer cannot write anything"""
+        self.disabled_reason = reason
+        self.capture_fraction = 0.0
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.dropped += 1
+
+    def _retain(self):
+        try:
+            self._enforce_retention()
+        except Exception as e:
+            self.errors += 1
+            log.error("[CAPTURE] Retention failed: %s", e)
+
+    def _run(self):
+        try:
+            self._db = self._connect()
+        except Exception as e:
+            log.exception("[CAPTURE] Cannot open %s, audio capture disabled", self.directory)
+            self._disable(f"{type(e).__name__}: {e}")
+            return
+        self._retain()
+        while True:
+            try:
+                item = self.queue.get(timeout=60)
+            except queue.Empty:
+                self._retain()  # age-based expiry also runs while idle
+                continue
+            if item is None:
+                break
+            try:
+                self._write(item)
+            except Exception as e:
+                self.errors += 1
+                log.error("[CAPTURE] Failed to write %s: %s", item["id"], e)
+                continue
+            self._retain()
+        self._db.close()
+        self._db = None
+
+    def find(self, session_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest captures, optionally for one session. Opens its own connection - call off the event loop."""
+        path = os.path.join(self.directory, "index.sqlite3")
+        if not os.path.exists(path):
+            return []
+        db = sqlite3.connect(path)
+        try:
+            query = "SELECT id, session_id, kind, path, bytes, sample_rate, duration, created_at, meta FROM captures"
+            params: tuple = ()
+            if session_id:
+                query += " WHERE session_id = ?"
+                params = (session_id,)
+            rows = db.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        finally:
+            db.close()
+        columns = ("id", "session_id", "kind", "path", "bytes", "sample_rate", "duration", "created_at", "meta")
+        return [{**dict(zip(columns, row)), "meta": json.loads(row[-1])} for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "format": "flac" if self.use_flac else "wav.zip",
+            "capture_fraction": self.capture_fraction,
+            "disabled_reason": self.disabled_reason,
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "deleted": self.deleted,
+            "errors": self.errors
+        }
@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import mmap
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class InvalidChunkError(ValueError):
+    """Chunk that does not fit its session (bad id, size or total)"""
+
+
+class SessionTooLargeError(Exception):
+    """Session would need more than the per-session cap"""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Session needs {size} bytes, limit is {limit}")
+        self.size = size
+        self.limit = limit
+
+
+class ChunkStoreFullError(Exception):
+    """No memory or spill space left for a new session"""
+
+    def __init__(self, used: int, capacity: int):
+        super().__init__(f"Chunk store full ({used}/{capacity} bytes)")
+        self.used = used
+        self.capacity = capacity
+
+
+class ChunkSession:
+    """
+    One chunked upload written straight into a preallocated buffer.
+
+    The buffer holds `total_chunks * stride` bytes, where the stride is the
+    size of the first non-final chunk; chunk N lands at offset N * stride.
+    Only the final chunk may be shorter. A chunk that arrives twice simply
+    overwrites itself, so retransmissions are harmless.
+    """
+
+    def __init__(self, session_id: str, total_chunks: int):
+        self.session_id = session_id
+        self.total_chunks = total_chunks
+        self.stride = 0
+        self.buffer = None                      # bytearray or mmap, allocated by ChunkStore
+        self.spilled = False
+        self.received = bytearray(total_chunks)  # 1 per chunk id seen
+        self.received_chunks = 0
+        self.duplicates = 0
+        self.next_chunk = 0                     # first chunk id not yet part of the contiguous prefix
+        self.last_chunk_size: Optional[int] = None
+        self.pending_last: Optional[bytes] = None  # final chunk that arrived before the stride was known
+        self.transcriber = None
+        self.completing = False                 # /complete is finalizing the transcription
+        self.created_at = time.monotonic()
+        self.last_activity = self.created_at
+        self._file = None
+
+    @property
+    def capacity(self) -> int:
+        return self.stride * self.total_chunks
+
+    @property
+    def complete(self) -> bool:
+        return self.received_chunks == self.total_chunks
+
+    @property
+    def size(self) -> int:
+        """Bytes of audio in the session once complete"""
+        if self.last_chunk_size is None:
+            return self.received_chunks * self.stride
+        return (self.total_chunks - 1) * self.stride + self.last_chunk_size
+
+    @property
+    def contiguous_bytes(self) -> int:
+        """Length of the gap-free prefix starting at chunk 0"""
+        if self.next_chunk == self.total_chunks:
+            return self.size
+        return self.next_chunk * self.stride
+
+    def missing(self, limit: int = 20) -> List[int]:
+        return [i for i in range(self.total_chunks) if not self.received[i]][:limit]
+
+    def data(self) -> memoryview:
+        """Zero-copy view of the assembled audio"""
+        return memoryview(self.buffer)[:self.size]
+
+    def _allocate(self, stride: int, spill: bool):
+        self.stride = stride
+        if spill:
+            self._file = tempfile.TemporaryFile(prefix="frank-chunks-")
+            self._file.truncate(self.capacity)
+            self.buffer = mmap.mmap(self._file.fileno(), self.capacity)
+            self.spilled = True
+        else:
+            self.buffer = bytearray(self.capacity)
+
+    def _write(self, chunk_id: int, data: bytes):
+        offset = chunk_id * self.stride
+        self.buffer[offset:offset + len(data)] = data
+        if chunk_id == self.total_chunks - 1:
+            self.last_chunk_size = len(data)
+        if not self.received[chunk_id]:
+            self.received[chunk_id] = 1
+            self.received_chunks += 1
+        else:
+            self.duplicates += 1
+        while self.next_chunk < self.total_chunks and self.received[self.next_chunk]:
+            self.next_chunk += 1
+
+    def release(self) -> bool:
+        """
+        Drop the buffer
+
+        Returns:
+            bool: False while a decode thread still holds a view of the buffer; call again later
+        """
+        if self.transcriber is not None:
+            self.transcriber.cancel()
+        if self.buffer is not None:
+            try:
+                if self.spilled:
+                    self.buffer.close()
+                else:
+                    del self.buffer[:]  # frees the allocation now, not when the last reference goes
+            except BufferError:
+                return False
+        if self._file is not None:
+            self._file.close()
+        self.buffer = None
+        self._file = None
+        return True
+
+
+class ChunkStore:
+    """
+    Bounded store for chunked uploads.
+
+    Sessions up to `spill_bytes` live in RAM under a shared `max_memory_bytes`
+    budget; larger ones (or any session once RAM is used up) go to a
+    memory-mapped temp file under `max_spill_bytes`. Sessions idle for
+    longer than `ttl` seconds are evicted by a background sweep.
+    """
+
+    def __init__(
+        self,
+        max_session_bytes: int = 32 * 1024 * 1024,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        spill_bytes: int = 4 * 1024 * 1024,
+        max_spill_bytes: int = 256 * 1024 * 1024,
+        max_chunks: int = 4096,
+        ttl: float = 120.0,
+        sweep_interval: float = 15.0,
+        on_session_ready: Optional[Callable[[ChunkSession], None]] = None
+    ):
+        self.max_session_bytes = max_session_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_bytes = spill_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.max_chunks = max_chunks
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.on_session_ready = on_session_ready
+        self.sessions: Dict[str, ChunkSession] = {}
+        self.memory_bytes = 0
+        self.spill_bytes_used = 0
+        self.evicted = 0
+        self.rejected = 0
+        self._lingering: List[ChunkSession] = []  # released, but a decode thread still reads the buffer
+        self._lock = threading.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def get(self, session_id: str) -> Optional[ChunkSession]:
+        return self.sessions.get(session_id)
+
+    def _reserve(self, session: ChunkSession, stride: int):
+        self._reap()
+        size = stride * session.total_chunks
+        if size > self.max_session_bytes:
+            self.rejected += 1
+            raise SessionTooLargeError(size, self.max_session_bytes)
+        spill = size > self.spill_bytes or self.memory_bytes + size > self.max_memory_bytes
+        if spill and self.spill_bytes_used + size > self.max_spill_bytes:
+            self.rejected += 1
+            raise ChunkStoreFullError(self.memory_bytes + self.spill_bytes_used,
+                                      self.max_memory_bytes + self.max_spill_bytes)
+        session._allocate(stride, spill)
+        if spill:
+            self.spill_bytes_used += size
+        else:
+            self.memory_bytes += size
+        if self.on_session_ready is not None:
+            self.on_session_ready(session)
+
+    def put(self, session_id: str, chunk_id: int, total_chunks: int, data: bytes) -> ChunkSession:
+        """
+        Store one chunk at its offset
+
+        Args:
+            session_id (str): Upload session
+            chunk_id (int): 0-based chunk index
+            total_chunks (int): Number of chunks in the upload, must not change within a session
+            data (bytes): Chunk payload
+
+        Returns:
+            ChunkSession: the session, with `next_chunk` advanced over any newly contiguous chunks
+        """
+        if not 0 < total_chunks <= self.max_chunks:
+            raise InvalidChunkError(f"Total chunks must be between 1 and {self.max_chunks}")
+        if not 0 <= chunk_id < total_chunks:
+            raise InvalidChunkError(f"Chunk {chunk_id} out of range 0..{total_chunks - 1}")
+        if not data:
+            raise InvalidChunkError(f"Chunk {chunk_id} is empty")
+
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = ChunkSession(session_id, total_chunks)
+            elif session.total_chunks != total_chunks:
+                raise InvalidChunkError(f"Session {session_id} has {session.total_chunks} chunks, got {total_chunks}")
+            session.last_activity = time.monotonic()
+
+            is_last = chunk_id == total_chunks - 1
+            if session.buffer is None:
+                if is_last and total_chunks > 1:
+                    # Stride unknown until a full-size chunk arrives; the held copy counts against RAM
+                    self._hold_pending(session, data)
+                    return session
+                self._reserve(session, len(data))
+                if session.pending_last is not None:
+                    pending = self._drop_pending(session)
+                    self._check_size(session, total_chunks - 1, pending)
+                    session._write(total_chunks - 1, pending)
+
+            self._check_size(session, chunk_id, data)
+            session._write(chunk_id, data)
+            return session
+
+    def _hold_pending(self, session: ChunkSession, data: bytes):
+        held = len(session.pending_last) if session.pending_last is not None else 0
+        if len(data) > self.max_session_bytes:
+            self.rejected += 1
+            raise SessionTooLargeError(len(data), self.max_session_bytes)
+        if self.memory_bytes - held + len(data) > self.max_memory_bytes:
+            self.rejected += 1
+            raise ChunkStoreFullError(self.memory_bytes + self.spill_bytes_used,
+                                      self.max_memory_bytes + self.max_spill_bytes)
+        session.pending_last = bytes(data)
+        self.memory_bytes += len(data) - held
+
+    def _drop_pending(self, session: ChunkSession) -> Optional[bytes]:
+        pending, session.pending_last = session.pending_last, None
+        if pending is not None:
+            self.memory_bytes -= len(pending)
+        return pending
+
+    @staticmethod
+    def _check_size(session: ChunkSession, chunk_id: int, data: bytes):
+        is_last = chunk_id == session.total_chunks - 1
+        if len(data) > session.stride or (not is_last and len(data) != session.stride):
+            raise InvalidChunkError(
+                f"Chunk {chunk_id} is {len(data)} bytes, expected {session.stride}"
+                f"{' or less' if is_last else ''}"
+            )
+
+    def pop(self, session_id: str) -> Optional[ChunkSession]:
+        """
+        Remove a session from the store
+
+        Its buffer stays allocated and counted against the memory and spill
+        caps until release(), so audio still being read by /complete is bounded too.
+        """
+        with self._lock:
+            return self.sessions.pop(session_id, None)
+
+    def release(self, session: ChunkSession):
+        """
+        Free a popped session's buffer and return its bytes to the caps
+
+        A buffer a decode thread still has a view of cannot be closed yet; it
+        stays counted and is retried by later reservations and the idle sweep.
+        """
+        with self._lock:
+            self._drop_pending(session)
+            if session.buffer is None:
+                session.release()
+                return
+            if session not in self._lingering:
+                self._lingering.append(session)
+            self._reap()
+
+    def _reap(self):
+        """Close released buffers nobody reads any more; call with the lock held"""
+        for session in list(self._lingering):
+            if not session.release():
+                continue
+            self._lingering.remove(session)
+            if session.spilled:
+                self.spill_bytes_used -= session.capacity
+            else:
+                self.memory_bytes -= session.capacity
+
+    def discard(self, session_id: str):
+        session = self.pop(session_id)
+        if session is not None:
+            self.release(session)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        if self._lingering:
+            with self._lock:
+                self._reap()
+        expired = [sid for sid, s in list(self.sessions.items())
+                   if now - s.last_activity > self.ttl and not s.completing]
+        for session_id in expired:
+            log.info("[CHUNK] Session %s: evicted after %.0fs idle", session_id, self.ttl)
+            self.discard(session_id)
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_idle()
+
+    def start(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        for session_id in list(self.sessions):
+            self.discard(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "spilled_sessions": sum(1 for s in self.sessions.values() if s.spilled),
+            "lingering_sessions": len(self._lingering),
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "spill_bytes": self.spill_bytes_used,
+            "max_spill_bytes": self.max_spill_bytes,
+            "evicted": self.evicted,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,281 @@
+import importlib.util
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+PCM16 = "pcm16"
+IMA_ADPCM = "ima-adpcm"
+MULAW = "mulaw"
+OPUS = "opus"
+
+ALIASES = {
+    "identity": PCM16, "pcm": PCM16, "l16": PCM16, "pcm_s16le": PCM16,
+    "adpcm": IMA_ADPCM, "ima_adpcm": IMA_ADPCM, "ima": IMA_ADPCM,
+    "ulaw": MULAW, "mu-law": MULAW, "pcmu": MULAW, "g711u": MULAW
+}
+
+ADPCM_BLOCK_BYTES = 256  # WAV IMA-ADPCM block_align for 16 kHz mono: 4-byte header + 252 data bytes = 505 samples
+OPUS_MAX_FRAME_MS = 120
+
+_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55, 60, 66, 73, 80, 88, 97,
+    107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796,
+    876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871,
+    5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623,
+    27086, 29794, 32767
+], dtype=np.int32)
+_INDEX_ADJUST = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int32)
+
+
+def _adpcm_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """(step index, nibble) -> signed predictor delta and next step index, as the reference decoder computes them"""
+    step = _STEPS[:, None]
+    nibble = np.arange(16, dtype=np.int32)[None, :]
+    delta = step >> 3
+    delta = delta + np.where(nibble & 4, step, 0) + np.where(nibble & 2, step >> 1, 0) + np.where(nibble & 1, step >> 2, 0)
+    delta = np.where(nibble & 8, -delta, delta).astype(np.int32)
+    next_index = np.clip(np.arange(len(_STEPS))[:, None] + _INDEX_ADJUST[None, :], 0, len(_STEPS) - 1)
+    return delta, next_index.astype(np.intp)
+
+
+_ADPCM_DELTA, _ADPCM_NEXT = _adpcm_tables()
+
+
+class UnsupportedCodecError(ValueError):
+    def __init__(self, codec: str):
+        super().__init__(f"Unsupported audio codec '{codec}', expected one of {sorted(available_codecs())}")
+        self.codec = codec
+
+
+class CodecError(ValueError):
+    """The upload is not valid data for the codec it claims"""
+
+
+def available_codecs() -> Dict[str, Dict[str, Any]]:
+    """Codecs this server decodes, with their compression ratio against PCM16 and parameters; for GET /codecs"""
+    codecs = {
+        PCM16: {"ratio": 1, "params": {}},
+        IMA_ADPCM: {"ratio": 4, "params": {"block": ADPCM_BLOCK_BYTES}},
+        MULAW: {"ratio": 2, "params": {}}
+    }
+    if importlib.util.find_spec("opuslib") is not None:
+        codecs[OPUS] = {"ratio": None, "params": {"framing": "u16le length prefix"}}
+    return codecs
+
+
+def parse_codec(value: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Codec name and parameters from a header value
+
+    "ima-adpcm; block=512" -> ("ima-adpcm", {"block": "512"}); empty means PCM16.
+    Raises UnsupportedCodecError for codecs this server cannot decode.
+    """
+    name, *raw_params = [part.strip() for part in (value or "").split(";")]
+    name = name.lower() or PCM16
+    name = ALIASES.get(name, name)
+    if name not in available_codecs():
+        raise UnsupportedCodecError(name)
+    params = {}
+    for param in raw_params:
+        key, _, val = param.partition("=")
+        if key.strip():
+            params[key.strip().lower()] = val.strip()
+    return name, params
+
+
+def codec_from_headers(headers: Mapping[str, str]) -> Tuple[str, Dict[str, str]]:
+    """X-Audio-Codec, or Content-Encoding when it names an audio codec; PCM16 when neither does"""
+    value = headers.get("X-Audio-Codec")
+    if value is None:
+        encoding = (headers.get("Content-Encoding") or "").split(";")[0].strip().lower()
+        if encoding in ALIASES or encoding in (IMA_ADPCM, MULAW, OPUS, PCM16):
+            value = headers.get("Content-Encoding")
+    return parse_codec(value)
+
+
+def adpcm_block_bytes(params: Optional[Dict[str, str]] = None) -> int:
+    try:
+        block = int((params or {}).get("block", ADPCM_BLOCK_BYTES))
+    except ValueError:
+        raise CodecError("ADPCM block size must be an integer")
+    if block < 5 or block > 65536:
+        raise CodecError(f"ADPCM block size {block} out of range")
+    return block
+
+
+def decode_ima_adpcm(data, block_bytes: int = ADPCM_BLOCK_BYTES) -> np.ndarray:
+    """
+    Decode mono IMA-ADPCM in the WAV block layout into int16 samples
+
+    Each block starts with the first sample (int16 LE), the step index and
+    a reserved byte, followed by 4-bit codes, low nibble first. Blocks are
+    independent, so all of them are decoded side by side: the step index
+    chain is walked once per code position across every block at once,
+    and the predictor is a cumulative sum of table lookups. The last
+    block may be short.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.int16)
+    full, tail = divmod(raw.size, block_bytes)
+    if 0 < tail < 4:
+        raise CodecError(f"Truncated ADPCM block: {tail} bytes")
+    count = full + (1 if tail else 0)
+    if tail:
+        padded = np.zeros(count * block_bytes, dtype=np.uint8)
+        padded[:raw.size] = raw
+        raw = padded
+    blocks = raw.reshape(count, block_bytes)
+
+    first = blocks[:, 0].astype(np.int32) | (blocks[:, 1].astype(np.int32) << 8)
+    first = np.where(first >= 32768, first - 65536, first)
+    index = blocks[:, 2].astype(np.intp)
+    if np.any(index >= len(_STEPS)):
+        raise CodecError("ADPCM step index out of range - wrong block size or not ADPCM data")
+    codes = np.empty((2 * (block_bytes - 4), count), dtype=np.intp)  # code position-major, contiguous per step
+    body = blocks[:, 4:].T
+    codes[0::2] = body & 0x0F
+    codes[1::2] = body >> 4
+
+    # The step index only depends on the codes, never on the samples
+    indexes = np.empty_like(codes)
+    for position in range(len(codes)):
+        indexes[position] = index
+        index = _ADPCM_NEXT[index, codes[position]]
+    deltas = _ADPCM_DELTA[indexes, codes]
+    predicted = first[None, :] + np.cumsum(deltas, axis=0)
+
+    # Clipping is rare (full-scale audio) but makes the running sum path-dependent; redo those blocks exactly
+    clipped = np.flatnonzero((predicted.max(axis=0) > 32767) | (predicted.min(axis=0) < -32768))
+    if clipped.size:
+        value = first[clipped]
+        for position in range(len(codes)):
+            value = np.clip(value + deltas[position, clipped], -32768, 32767)
+            predicted[position, clipped] = value
+
+    samples = np.empty((count, len(codes) + 1), dtype=np.int16)
+    samples[:, 0] = first
+    samples[:, 1:] = predicted.T
+    samples = samples.ravel()
+    if tail:
+        samples = samples[:full * (len(codes) + 1) + 1 + 2 * (tail - 4)]
+    return samples
+
+
+def encode_ima_adpcm(samples: np.ndarray, block_bytes: int = ADPCM_BLOCK_BYTES) -> bytes:
+    """
+    Encode int16 samples as mono IMA-ADPCM blocks (what the device sends)
+
+    Blocks are encoded side by side like decode_ima_adpcm(); each starts
+    from a step index guessed from its first samples instead of the
+    previous block's, which costs nothing in quality for speech.
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+    if samples.size == 0:
+        return b""
+    per_block = 2 * (block_bytes - 4) + 1
+    count = -(-samples.size // per_block)
+    padded = np.empty(count * per_block, dtype=np.int32)
+    padded[:samples.size] = samples
+    padded[samples.size:] = samples[-1]
+    blocks = padded.reshape(count, per_block)
+
+    predictor = blocks[:, 0].copy()
+    swing = np.abs(np.diff(blocks[:, :9], axis=1)).max(axis=1)
+    index = np.clip(np.searchsorted(_STEPS, swing) - 2, 0, len(_STEPS) - 1).astype(np.intp)
+    header = np.zeros((count, 4), dtype=np.uint8)
+    header[:, 0] = predictor & 0xFF
+    header[:, 1] = (predictor >> 8) & 0xFF
+    header[:, 2] = index
+
+    codes = np.empty((per_block - 1, count), dtype=np.intp)
+    for position in range(1, per_block):
+        step = _STEPS[index]
+        diff = blocks[:, position] - predictor
+        code = np.minimum((np.abs(diff) << 2) // step, 7) | np.where(diff < 0, 8, 0)
+        predictor = np.clip(predictor + _ADPCM_DELTA[index, code], -32768, 32767)
+        index = _ADPCM_NEXT[index, code]
+        codes[position - 1] = code
+
+    body = (codes[0::2] | (codes[1::2] << 4)).T.astype(np.uint8)
+    encoded = np.concatenate([header, body], axis=1).ravel().tobytes()
+    last = samples.size - (count - 1) * per_block  # samples in the final block
+    return encoded[:(count - 1) * block_bytes + 4 + last // 2]
+
+
+def _mulaw_table() -> np.ndarray:
+    code = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (code >> 4) & 0x07
+    magnitude = (((code & 0x0F) << 3) + 0x84 << exponent) - 0x84
+    return np.where(code & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+_MULAW_DECODE = _mulaw_table()
+
+
+def decode_mulaw(data) -> np.ndarray:
+    """G.711 μ-law bytes to int16 samples - one table lookup per byte"""
+    return _MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def encode_mulaw(samples: np.ndarray) -> bytes:
+    samples = np.asarray(samples, dtype=np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def decode_opus(data, sample_rate: int = 16000) -> np.ndarray:
+    """
+    Opus packets, each prefixed with its length as uint16 LE, to int16 samples
+
+    Needs the optional opuslib package (and libopus).
+    """
+    try:
+        import opuslib
+    except ImportError:
+        raise UnsupportedCodecError(OPUS)
+    decoder = opuslib.Decoder(sample_rate, 1)
+    max_frame = sample_rate * OPUS_MAX_FRAME_MS // 1000
+    view = memoryview(data)
+    frames, position = [], 0
+    while position < len(view):
+        if position + 2 > len(view):
+            raise CodecError("Truncated Opus length prefix")
+        length = int.from_bytes(view[position:position + 2], "little")
+        packet = bytes(view[position + 2:position + 2 + length])
+        if len(packet) != length:
+            raise CodecError("Truncated Opus packet")
+        try:
+            frames.append(np.frombuffer(decoder.decode(packet, max_frame), dtype="<i2"))
+        except opuslib.OpusError as e:
+            raise CodecError(f"Bad Opus packet: {e}")
+        position += 2 + length
+    return np.concatenate(frames) if frames else np.zeros(0, dtype=np.int16)
+
+
+def decode(codec: str, data, params: Optional[Dict[str, str]] = None, sample_rate: int = 16000) -> np.ndarray:
+    """
+    Decode an upload into int16 samples
+
+    Args:
+        codec (str): Canonical codec name from parse_codec()
+        data: Encoded request body
+        params (dict, optional): Codec parameters from the header, e.g. {"block": "256"}
+        sample_rate (int): Sample rate of the audio (Opus needs it to size its frames)
+
+    Returns:
+        np.ndarray: int16 samples; raises CodecError for malformed data
+    """
+    if codec == PCM16:
+        usable = len(data) - len(data) % 2
+        return np.frombuffer(data, dtype="<i2", count=usable // 2)
+    if codec == IMA_ADPCM:
+        return decode_ima_adpcm(data, adpcm_block_bytes(params))
+    if codec == MULAW:
+        return decode_mulaw(data)
+    if codec == OPUS:
+        return decode_opus(data, sample_rate)
+    raise UnsupportedCodecError(codec)
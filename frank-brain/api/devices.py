@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from api.recorder import RingBuffer
+
+DEFAULT_DEVICE = "default"  # requests without X-Device-ID share this slot, like before devices existed
+
+
+class DeviceState:
+    """Everything one walkie-talkie owns: button debounce, recording take, last answer and recent turns"""
+
+    def __init__(self, device_id: str, history_turns: int):
+        self.device_id = device_id
+        self.recording = False
+        self.last_button_press = 0.0
+        self.latest_text = ""
+        self.buffer: Optional[RingBuffer] = None  # allocated on first recording
+        self.sample_rate = 16000
+        self.history: Deque[Tuple[str, str]] = deque(maxlen=history_turns)  # (user text, answer)
+        self.turns = 0
+        self.created_at = time.time()
+        self.last_seen = time.monotonic()
+
+    def press(self, debounce: float) -> bool:
+        """Register a button press; False when it comes too soon after the previous one"""
+        now = time.time()
+        if now - self.last_button_press < debounce:
+            return False
+        self.last_button_press = now
+        return True
+
+    def remember(self, user_text: str, answer: str, success: bool = True):
+        """Store the answer for /latest-text; only good answers become context for the next turn"""
+        self.latest_text = answer
+        self.turns += 1
+        if success:
+            self.history.append((user_text, answer))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "device_id": self.device_id,
+            "recording": self.recording,
+            "latest_text": self.latest_text,
+            "turns": self.turns,
+            "history": len(self.history),
+            "idle_seconds": time.monotonic() - self.last_seen,
+            "buffer_seconds": self.buffer.capacity / self.sample_rate if self.buffer is not None else 0.0
+        }
+
+
+class DeviceRegistry:
+    """
+    Per-device state keyed by the X-Device-ID header.
+
+    Devices live in LRU order; every lookup drops devices idle for longer
+    than `idle_ttl` from the cold end, and the least recently seen device
+    is dropped once there are `max_devices`. A device that is recording is
+    never evicted. `recording` is an immutable tuple swapped on start/stop,
+    so the audio callback thread can iterate it without a lock.
+    """
+
+    def __init__(self, max_devices: int = 64, idle_ttl: float = 3600.0, history_turns: int = 4,
+                 buffer_seconds: float = 30.0):
+        self.max_devices = max_devices
+        self.idle_ttl = idle_ttl
+        self.history_turns = history_turns
+        self.buffer_seconds = buffer_seconds
+        self._devices: "OrderedDict[str, DeviceState]" = OrderedDict()
+        self.recording: Tuple[DeviceState, ...] = ()
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def get(self, device_id: Optional[str]) -> DeviceState:
+        device_id = (device_id or DEFAULT_DEVICE).strip()[:64] or DEFAULT_DEVICE
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                device = self._devices[device_id] = DeviceState(device_id, self.history_turns)
+            else:
+                self._devices.move_to_end(device_id)
+            device.last_seen = time.monotonic()
+            self._evict(keep=device)
+            return device
+
+    def _evict(self, keep: DeviceState):
+        now = time.monotonic()
+        for device_id, device in list(self._devices.items()):
+            too_many = len(self._devices) > self.max_devices
+            if not too_many and now - device.last_seen <= self.idle_ttl:
+                break  # LRU order: everything after this was seen more recently
+            if device is keep or device.recording:
+                continue
+            del self._devices[device_id]
+            self.evicted += 1
+
+    def start_recording(self, device: DeviceState, sample_rate: int):
+        capacity = int(self.buffer_seconds * sample_rate)
+        if device.buffer is None:
+            device.buffer = RingBuffer(capacity)
+        elif device.buffer.capacity != capacity:
+            device.buffer.resize(capacity)
+        else:
+            device.buffer.clear()
+        device.sample_rate = sample_rate
+        device.recording = True
+        with self._lock:
+            self.recording = tuple(d for d in self._devices.values() if d.recording)
+
+    def stop_recording(self, device: DeviceState):
+        device.recording = False
+        with self._lock:
+            self.recording = tuple(d for d in self.recording if d is not device)
+
+    def stop_all(self):
+        for device in self.recording:
+            device.recording = False
+        self.recording = ()
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [device.to_dict() for device in reversed(self._devices.values())]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "devices": len(self._devices),
+            "recording": len(self.recording),
+            "max_devices": self.max_devices,
+            "evicted": self.evicted
+        }
@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from api.metrics import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+    def __init__(self, depth: int, capacity: int):
+        super().__init__(f"Job queue full ({depth}/{capacity})")
+        self.depth = depth
+        self.capacity = capacity
+
+
+class Job:
+    def __init__(self, name: str, fn: Callable, args: tuple, kwargs: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Runs in the submitter's context, so spans land in the request's trace
+        self.context = contextvars.copy_context()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Polled jobs may never be awaited; mark their errors as retrieved
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == "done":
+            info["result"] = self.result
+        elif self.status == "failed":
+            info["error"] = self.error
+        return info
+
+
+class JobQueue:
+    """
+    Bounded job queue served by a fixed pool of workers.
+
+    Synchronous callables (Whisper decodes, blocking agent runs) execute on a
+    thread pool of the same size as the worker pool, coroutine functions are
+    awaited directly on the event loop. Submitting to a full queue raises
+    QueueFullError so endpoints can push back instead of piling up work.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, keep_finished: int = 256):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="frank-worker")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, fn: Callable, *args, name: Optional[str] = None, **kwargs) -> Job:
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        job = Job(name or getattr(fn, "__name__", "job"), fn, args, kwargs)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.depth, self.max_queue)
+        self._remember(job)
+        return job
+
+    async def run(self, fn: Callable, *args, name: Optional[str] = None, **kwargs) -> Any:
+        """Submit a job and wait for its result"""
+        job = self.submit(fn, *args, name=name, **kwargs)
+        return await self.wait(job)
+
+    async def hold(self, name: Optional[str] = None) -> Callable[[], None]:
+        """
+        Take a worker for work that runs outside the queue, e.g. a streamed response
+
+        Waits until a worker picks the slot up, so the work counts against the
+        concurrency limit and shows up in stats. Raises QueueFullError like submit().
+
+        Returns:
+            callable: gives the worker back; safe to call more than once
+        """
+        started = asyncio.get_running_loop().create_future()
+        released = asyncio.Event()
+
+        async def held():
+            started.set_result(None)
+            await released.wait()
+
+        job = self.submit(held, name=name or "hold")
+        try:
+            await asyncio.wait({started, job.future}, return_when=asyncio.FIRST_COMPLETED)
+            if not started.done():
+                job.future.result()
+        except BaseException:
+            released.set()
+            raise
+        return released.set
+
+    async def wait(self, job: Job, timeout: Optional[float] = None) -> Any:
+        # shield: a client that disconnects must not cancel the job for pollers
+        return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+    def _remember(self, job: Job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep_finished:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break
+            del self._jobs[oldest_id]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            metrics.observe("queue_wait_seconds", job.started_at - job.created_at, job=job.name)
+            self.running += 1
+            try:
+                if asyncio.iscoroutinefunction(job.fn):
+                    result = await job.context.run(asyncio.ensure_future, job.fn(*job.args, **job.kwargs))
+                else:
+                    result = await loop.run_in_executor(
+                        self._executor, lambda: job.context.run(job.fn, *job.args, **job.kwargs)
+                    )
+                job.result = result
+                job.status = "done"
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "cancelled"
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                job.finished_at = time.time()
+                self.running -= 1
+                self._queue.task_done()
@@ -1,37 +1,195 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
-from fastapi.responses import JSONResponse, StreamingResponse
-import openai
-import whisper
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 import tempfile
 import os
 import io
-from typing import Dict, Any, Optional
+import json
+import base64
+import asyncio
+import threading
+import logging
+from typing import Callable, Dict, Any, Optional, Tuple
 import sys
-sys.path.append('/home/spacholski/Sources/frank-the-assistant/frank-brain')
-from agents.websearch.agent import WebSearchAgent
+import numpy as np
+# Make the frank-brain root importable no matter where the server is started from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.streaming_asr import StreamingTranscriber
+from api.chunk_store import ChunkStore, InvalidChunkError, SessionTooLargeError, ChunkStoreFullError
+from api.jobs import JobQueue, QueueFullError
+from api.audio import prepare_samples, decode_wav_bytes, int16_to_whisper
+from api.codecs import (PCM16, IMA_ADPCM, CodecError, UnsupportedCodecError, adpcm_block_bytes, available_codecs,
+                        codec_from_headers, decode as decode_audio)
+from api.asr import load_backend
+from api.registry import LazyRegistry
+from api.tts import SentenceSplitter, load_tts
+from api.vad import VoiceActivityDetector, to_original_time
+from api.capture import CaptureWriter
+from api.devices import DeviceRegistry, DeviceState
+from api.metrics import metrics, start_trace, configure_logging, langchain_callbacks
+
+configure_logging()
+log = logging.getLogger("api.main")
 
 app = FastAPI(title="Frank Brain API", version="1.0.0")
 
-model = whisper.load_model("base")
-websearch_agent = WebSearchAgent()
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Give every request a trace ID (the device's X-Trace-ID if it sent one) and
+    return it with the per-stage timings as Server-Timing.
+    """
+    trace = start_trace(request.headers.get("X-Trace-ID"))
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")  # template, so session IDs don't explode the label set
+        metrics.observe("request_seconds", time.perf_counter() - started, path=path)
+        metrics.inc("requests_total", path=path, status=str(status))
+    response.headers["X-Trace-ID"] = trace.id
+    if trace.spans:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+def build_websearch_agent():
+    # Imported here: langchain and the OpenAI client are slow to import
+    from agents.websearch.agent import WebSearchAgent
+    from agents.websearch.cache import AnswerCache
+    from agents.websearch.search_layer import SearchLayer
+    cache = AnswerCache(max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000")))
+    search_layer = SearchLayer.from_env(
+        observer=lambda source, seconds: metrics.observe("search_seconds", seconds, source=source)
+    )
+    return WebSearchAgent(cache=cache, search_layer=search_layer, callbacks=langchain_callbacks())
+
+def build_dietitian():
+    from agents.dietitian.agent import DietitianAgent
+    from agents.dietitian.store import MealStore
+    return DietitianAgent(registry.get("websearch"), store=MealStore(), callbacks=langchain_callbacks())
+
+def build_orchestrator():
+    from agents.orchestrator.agent import Orchestrator
+    return Orchestrator(websearch_agent=registry.get("websearch"), dietitian=registry.get("dietitian"),
+                        callbacks=langchain_callbacks())
+
+# Models and agents are built on first use or by the background warm-up, never at import
+registry = LazyRegistry()
+registry.register("asr", load_backend, warmup=lambda backend: backend.warmup())
+registry.register("websearch", build_websearch_agent)
+registry.register("dietitian", build_dietitian)
+registry.register("orchestrator", build_orchestrator)
+registry.register("tts", load_tts)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+# Debug copies of incoming audio, written by a background thread with retention
+captures = CaptureWriter.from_env()
+
+# ASR work runs on a bounded worker pool instead of the event loop; with an ASR
+# process pool, one job thread per model process keeps every process busy
+job_queue = JobQueue(
+    workers=int(os.getenv("WORKERS", str(max(2, int(os.getenv("ASR_PROCESSES", "1")))))),
+    max_queue=int(os.getenv("JOB_QUEUE_SIZE", "16"))
+)
+
+# Agent runs are coroutines (ainvoke), so many can share the event loop without holding threads
+agent_queue = JobQueue(
+    workers=int(os.getenv("AGENT_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("AGENT_QUEUE_SIZE", "64"))
+)
+
+def run_asr(audio, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+    """Transcribe a file path or 16kHz float32 array with the configured ASR backend"""
+    backend = registry.get("asr")
+    with metrics.span("asr"):
+        return backend.transcribe(audio, initial_prompt=initial_prompt)
+
+# Silence trimming / no-speech rejection in front of every in-memory ASR call
+vad = VoiceActivityDetector.from_env() if os.getenv("VAD_ENABLED", "1") == "1" else None
+
+def transcribe_speech(audio: np.ndarray, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Transcribe only the speech in a 16kHz float32 clip.
+    
+    Clips without speech return an empty text without running Whisper; long
+    recordings are decoded in chunks cut at pauses, each prompted with the
+    text so far. Runs on a job worker.
+    """
+    if vad is None:
+        return run_asr(audio, initial_prompt=initial_prompt)
+    
+    with metrics.span("vad"):
+        segments, info = vad.analyze(audio)
+    log.debug("[VAD] %.1fs of speech in %.1fs (%d segments)", info["speech_seconds"], info["total_seconds"], info["segments"])
+    if not segments:
+        return {"text": "", "language": None, "segments": [], "vad": info}
+    
+    texts, language, timed = [], None, []
+    prompt = initial_prompt
+    for chunk, pieces in vad.chunks(audio, segments):
+        result = run_asr(chunk, initial_prompt=prompt)
+        language = language or result.get("language")
+        texts.append(result["text"].strip())
+        for segment in result.get("segments", []):
+            timed.append({
+                **segment,
+                "start": to_original_time(segment["start"], pieces),
+                "end": to_original_time(segment["end"], pieces)
+            })
+        prompt = " ".join(t for t in ((initial_prompt or ""), *texts) if t)[-200:]
+    
+    return {"text": " ".join(t for t in texts if t), "language": language, "segments": timed, "vad": info}
+
+async def run_turn(text: str, device: Optional[DeviceState] = None) -> Dict[str, Any]:
+    """Route a transcript to the right agent and answer it, with the device's recent turns as context"""
+    if registry.is_loaded("orchestrator"):
+        orchestrator = registry.get("orchestrator")
+    else:
+        # Building the agents imports langchain - keep that off the event loop
+        orchestrator = await asyncio.get_running_loop().run_in_executor(None, registry.get, "orchestrator")
+    with metrics.span("agent"):
+        result = await orchestrator.arun(text, history=list(device.history) if device is not None else None)
+    if result.get("route_ms") is not None:
+        metrics.record_span("route", result["route_ms"] / 1000)
+    metrics.inc("turns_total", intent=str(result.get("intent")), method=str(result.get("route_method")))
+    return result
+
+def queue_full(error: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"message": "Server busy, job queue is full", "queue_depth": error.depth, "max_queue": error.capacity},
+        headers={"Retry-After": "1"}
+    )
 
 @app.post("/transcribe/")
 async def transcribe_audio(
+    request: Request,
     file: UploadFile = File(...)
 ) -> Dict[str, Any]:
     if not file.content_type.startswith('audio/'):
         raise HTTPException(status_code=400, detail="File must be an audio file")
     
     try:
-        contents = await file.read()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            temp_file.write(contents)
-            temp_file_path = temp_file.name
-        
-        result = model.transcribe(temp_file_path)
+        with metrics.span("receive_body"):
+            contents = await file.read()
         
-        os.unlink(temp_file_path)
+        # WAV uploads are decoded in memory, anything else goes through Whisper's ffmpeg loader
+        with metrics.span("resample"):
+            decoded = decode_wav_bytes(contents)
+        if decoded is not None:
+            audio, _ = decoded
+            result = await job_queue.run(transcribe_speech, audio, name="transcribe")
+        else:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+                temp_file.write(contents)
+                temp_file_path = temp_file.name
+            
+            result = await job_queue.run(run_asr, temp_file_path, name="transcribe")
+            
+            os.unlink(temp_file_path)
         
         response = {
             "text": result["text"],
@@ -39,11 +197,20 @@ async def transcribe_audio(
             "segments": result["segments"]
         }
         
-        query = f"Przeszukaj internet i odpowiedz na pytanie: {result['text']}. Odpowiedz krótko."
-        search_result = websearch_agent.search(query)
+        # Nothing was said (VAD rejected the clip or Whisper heard nothing) - don't spend an agent run on it
+        if not result["text"].strip():
+            return {"answer": "", "status": "no_speech"}
+        
+        device = devices.get(request.headers.get("X-Device-ID"))
+        search_result = await agent_queue.run(run_turn, result["text"], device, name="orchestrator")
+        answer = settle_answer(device, result["text"], search_result)
 
-        return {"answer": search_result.get("answer", "No answer available")}
+        return {"answer": answer}
     
+    except QueueFullError as e:
+        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        raise queue_full(e)
     except Exception as e:
         if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
@@ -53,363 +220,411 @@ import time
 import wave
 import struct
 import datetime
-import sounddevice as sd
-import numpy as np
-import requests
-import threading
 from collections import deque
 
-processing_lock = False
-recording = False
-latest_text = ""
-audio_buffer = deque(maxlen=160000)  # 10 seconds at 16kHz
-last_button_press = 0
+RECORDER_MAX_SECONDS = float(os.getenv("RECORDER_MAX_SECONDS", "30"))
+# Recording state, debounce, last answer and recent turns per walkie-talkie (X-Device-ID)
+devices = DeviceRegistry(
+    max_devices=int(os.getenv("MAX_DEVICES", "64")),
+    idle_ttl=float(os.getenv("DEVICE_IDLE_TTL", "3600")),
+    history_turns=int(os.getenv("DEVICE_HISTORY_TURNS", "4")),
+    buffer_seconds=RECORDER_MAX_SECONDS
+)
 DEBOUNCE_TIME = 0.5  # 500ms debounce
 AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://localhost:8001")
 
-# Chunked streaming storage
-chunk_sessions = {}  # session_id -> {chunks: {chunk_id: data}, total_chunks: int, received_chunks: int}
+STREAM_ASR_WINDOW = float(os.getenv("STREAM_ASR_WINDOW", "5.0"))  # seconds of audio per partial decode
+
+def transcribe_window(audio: np.ndarray, prompt: str) -> str:
+    """Decode one window of 16kHz float32 audio, using the text so far as context"""
+    return transcribe_speech(audio, initial_prompt=prompt)["text"]
+
+def attach_transcriber(session):
+    """Decode partials straight from the session buffer as chunks arrive"""
+    session.transcriber = StreamingTranscriber(
+        transcribe_window,
+        window_seconds=STREAM_ASR_WINDOW,
+        buffer=session.buffer,
+        # Through the ASR job queue like every other decode: bounded, measured and traced
+        run=lambda fn, *args: job_queue.run(fn, *args, name="transcribe_window")
+    )
+
+# Chunked streaming storage - preallocated per session, bounded, idle sessions expire
+MB = 1024 * 1024
+chunk_store = ChunkStore(
+    max_session_bytes=int(float(os.getenv("CHUNK_SESSION_MAX_MB", "32")) * MB),
+    max_memory_bytes=int(float(os.getenv("CHUNK_MEMORY_MAX_MB", "64")) * MB),
+    spill_bytes=int(float(os.getenv("CHUNK_SPILL_MB", "4")) * MB),
+    max_spill_bytes=int(float(os.getenv("CHUNK_SPILL_MAX_MB", "256")) * MB),
+    ttl=float(os.getenv("CHUNK_SESSION_TTL", "120")),
+    on_session_ready=attach_transcriber
+)
+
+def request_codec(request: Request) -> Tuple[str, Dict[str, str]]:
+    """Upload codec from X-Audio-Codec / Content-Encoding; 415 with the supported list for anything else"""
+    try:
+        return codec_from_headers(request.headers)
+    except UnsupportedCodecError as e:
+        raise HTTPException(status_code=415, detail=str(e), headers={"X-Audio-Codecs": ", ".join(available_codecs())})
+
+def process_stream_body(body: bytes, sample_rate: int = 16000, codec: str = PCM16,
+                        params: Optional[Dict[str, str]] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Decode, convert and transcribe one /stream upload in memory. Runs on a job worker."""
+    try:
+        with metrics.span("decode"):
+            samples = decode_audio(codec, body, params, sample_rate)
+        captures.capture("stream", samples, sample_rate, session_id=session_id, meta={"codec": codec, "bytes": len(body)})
+        with metrics.span("resample"):
+            audio, levels = prepare_samples(samples, sample_rate)
+        log.debug("[STREAM] Audio levels: mean %.1f dB, max %.1f dB", levels["mean_volume_db"], levels["max_volume_db"])
+        
+        result = transcribe_speech(audio)
+        log.debug("[STREAM] Transcription result: '%s'", result["text"])
+        
+        # Rejected by VAD before Whisper ran
+        if "vad" in result and not result["vad"]["speech"]:
+            return {
+                "debug": f"Received {len(body)} bytes, no speech detected - check audio level",
+                "levels": levels,
+                "vad": result["vad"]
+            }
+        
+        if not result['text'].strip():
+            return {
+                "debug": f"Received {len(body)} bytes, transcription EMPTY - check audio level",
+                "levels": levels
+            }
+        else:
+            return {
+                "debug": f"Received {len(body)} bytes, transcribed: '{result['text']}'",
+                "transcription": result['text'],
+                "levels": levels
+            }
+    except Exception as whisper_error:
+        log.warning("[STREAM] Whisper/conversion error: %s", whisper_error)
+        return {"debug": f"Received {len(body)} bytes, processing failed: {str(whisper_error)}"}
 
 @app.post("/stream/")
-async def stream_audio(request: Request) -> Dict[str, Any]:
-    global processing_lock
-    
-    if processing_lock:
-        print("[DEBUG] BUSY - Another request is being processed")
-        raise HTTPException(status_code=429, detail="Server busy processing another request")
-    
-    processing_lock = True
-    print(f"[DEBUG] Request started at {time.time()}")
-    
+async def stream_audio(request: Request, wait: bool = True) -> Dict[str, Any]:
     try:
-        body = await request.body()
-        print(f"[DEBUG] Received body size: {len(body)} bytes")
-        print(f"[DEBUG] Content-Type: {request.headers.get('content-type', 'None')}")
-        print(f"[DEBUG] Content-Length header: {request.headers.get('content-length', 'None')}")
-        print(f"[DEBUG] All headers: {dict(request.headers)}")
+        with metrics.span("receive_body"):
+            body = await request.body()
+        log.debug("[STREAM] Received %d bytes, Content-Type %s", len(body), request.headers.get("content-type"))
         
         if not body:
-            print("[DEBUG] Body is empty!")
+            log.info("[STREAM] Body is empty")
             raise HTTPException(status_code=400, detail="No audio data received")
         
-        # Debug: sprawdź pierwsze bajty
-        if len(body) > 0:
-            first_bytes = body[:20] if len(body) >= 20 else body
-            print(f"[DEBUG] First {len(first_bytes)} bytes: {first_bytes}")
-            print(f"[DEBUG] First bytes as hex: {first_bytes.hex()}")
-        
-        # Zapisz surowe audio jako plik debug
-        debug_file_path = f"/tmp/debug_audio_{len(body)}_bytes.raw"
-        with open(debug_file_path, "wb") as debug_file:
-            debug_file.write(body)
-        print(f"[DEBUG] Saved received raw data to: {debug_file_path}")
+        # Debug: sprawdź pierwsze bajty (tylko przy LOG_LEVEL=DEBUG)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("[STREAM] Headers: %s", dict(request.headers))
+            log.debug("[STREAM] First bytes as hex: %s", body[:20].hex())
         
-        # Konwertuj raw audio na WAV do łatwego odtwarzania
-        wav_file_path = f"/tmp/audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
+        codec, params = request_codec(request)
+        metrics.inc("upload_bytes_total", len(body), route="stream", codec=codec)
         try:
-            # Konwertuj raw 16-bit audio na WAV
-            with wave.open(wav_file_path, 'wb') as wav_file:
-                wav_file.setnchannels(1)  # mono
-                wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-                wav_file.setframerate(16000)  # 16kHz
-                wav_file.writeframes(body)
-            print(f"[DEBUG] Saved as WAV file: {wav_file_path}")
-        except Exception as wav_error:
-            print(f"[DEBUG] WAV conversion failed: {str(wav_error)}")
+            sample_rate = int(request.headers.get("X-Sample-Rate", "16000"))
+            job = job_queue.submit(process_stream_body, body, sample_rate, codec, params,
+                                   request.headers.get("X-Session-ID"), name="stream")
+        except QueueFullError as e:
+            log.warning("[STREAM] Busy - job queue full (%d/%d)", e.depth, e.capacity)
+            raise queue_full(e)
         
-        # Konwertuj sample rate jeśli potrzebne
-        try:
-            import subprocess
-            converted_path = f"/tmp/converted_{len(body)}_bytes.wav"
-            subprocess.run([
-                "ffmpeg", "-i", debug_file_path, "-ar", "16000", 
-                converted_path, "-y", "-loglevel", "quiet"
-            ], check=True)
-            print(f"[DEBUG] Converted to 16kHz: {converted_path}")
-            
-            # Sprawdź poziom audio
-            volume_check = subprocess.run([
-                "ffmpeg", "-i", converted_path, "-af", "volumedetect", 
-                "-f", "null", "-", "-loglevel", "info"
-            ], capture_output=True, text=True)
-            print(f"[DEBUG] Audio analysis: {volume_check.stderr}")
-            
-            print(f"[DEBUG] Testing Whisper transcription...")
-            result = model.transcribe(converted_path)
-            print(f"[DEBUG] Transcription result: '{result['text']}'")
-            print(f"[DEBUG] Full result keys: {list(result.keys())}")
-            
-            # Nie usuwaj plików dla debugowania
-            # os.unlink(converted_path)
-            
-            if not result['text'].strip():
-                return {
-                    "debug": f"Received {len(body)} bytes, transcription EMPTY - check audio level",
-                    "wav_file": wav_file_path,
-                    "raw_file": debug_file_path
-                }
-            else:
-                return {
-                    "debug": f"Received {len(body)} bytes, transcribed: '{result['text']}'",
-                    "transcription": result['text'],
-                    "wav_file": wav_file_path,
-                    "raw_file": debug_file_path
-                }
-        except Exception as whisper_error:
-            print(f"[DEBUG] Whisper/conversion error: {str(whisper_error)}")
-            return {"debug": f"Received {len(body)} bytes, processing failed: {str(whisper_error)}"}
+        # Poll mode: hand back the job ID, the device fetches the result from /jobs/{job_id}
+        if not wait:
+            return JSONResponse(status_code=202, content={**job.to_dict(), "queue_depth": job_queue.depth})
         
+        return await job_queue.wait(job)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[DEBUG] Exception occurred: {str(e)}")
+        log.exception("[STREAM] Request failed")
         raise HTTPException(status_code=500, detail=f"Stream transcription failed: {str(e)}")
-    finally:
-        processing_lock = False
-        print(f"[DEBUG] Request finished at {time.time()}")
-        
-        # Zakomentowany oryginalny kod:
-        # with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-        #     temp_file.write(body)
-        #     temp_file_path = temp_file.name
-        # 
-        # result = model.transcribe(temp_file_path)
-        # 
-        # os.unlink(temp_file_path)
-        # 
-        # response = {
-        #     "text": result["text"],
-        #     "language": result["language"],
-        #     "segments": result["segments"]
-        # }
-        # 
-        # query = f"Przeszukaj internet i odpowiedz na pytanie: {result['text']}. Odpowiedz krótko."
-        # search_result = websearch_agent.search(query)
-        #
-        # return {"answer": search_result.get("answer", "No answer available")}
+
+@app.get("/codecs")
+async def get_codecs() -> Dict[str, Any]:
+    """Upload codecs for /stream and /chunk; pick one with the X-Audio-Codec header (or Content-Encoding)"""
+    return {"header": "X-Audio-Codec", "default": PCM16, "codecs": available_codecs()}
+
+@app.get("/jobs")
+async def get_jobs() -> Dict[str, Any]:
+    jobs = {"asr": job_queue.stats(), "agent": agent_queue.stats()}
+    if registry.is_loaded("asr") and hasattr(registry.get("asr"), "stats"):
+        jobs["asr_workers"] = registry.get("asr").stats()
+    return jobs
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0) -> Dict[str, Any]:
+    queue = job_queue if job_queue.get(job_id) is not None else agent_queue
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+    
+    # Optional long-poll: wait up to `wait` seconds for the job to finish
+    if wait > 0 and not job.future.done():
+        try:
+            await queue.wait(job, timeout=wait)
+        except Exception:
+            pass
+    
+    return {**job.to_dict(), "queue_depth": queue.depth}
 
 @app.post("/chunk")
 async def receive_chunk(request: Request) -> Dict[str, Any]:
     session_id = request.headers.get("X-Session-ID")
-    chunk_id = int(request.headers.get("X-Chunk-ID"))
-    total_chunks = int(request.headers.get("X-Total-Chunks"))
-    
     if not session_id:
         raise HTTPException(status_code=400, detail="Missing session ID")
+    try:
+        chunk_id = int(request.headers.get("X-Chunk-ID"))
+        total_chunks = int(request.headers.get("X-Total-Chunks"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="X-Chunk-ID and X-Total-Chunks must be integers")
     
-    body = await request.body()
-    print(f"[CHUNK] Session {session_id}: Received chunk {chunk_id}/{total_chunks-1} ({len(body)} bytes)")
+    codec, params = request_codec(request)
+    with metrics.span("receive_body"):
+        body = await request.body()
+    log.debug("[CHUNK] Session %s: Received chunk %d/%d (%d bytes, %s)", session_id, chunk_id, total_chunks - 1, len(body), codec)
+    metrics.inc("upload_bytes_total", len(body), route="chunk", codec=codec)
     
-    # Initialize session if new
-    if session_id not in chunk_sessions:
-        chunk_sessions[session_id] = {
-            "chunks": {},
-            "total_chunks": total_chunks,
-            "received_chunks": 0
-        }
+    # Compressed chunks are decoded on arrival, so the session buffer and the partial decodes only ever see PCM16
+    if codec != PCM16:
+        try:
+            if codec == IMA_ADPCM and chunk_id < total_chunks - 1 and len(body) % adpcm_block_bytes(params):
+                raise CodecError(f"ADPCM chunks must hold whole {adpcm_block_bytes(params)}-byte blocks")
+            with metrics.span("decode"):
+                body = decode_audio(codec, body, params, int(request.headers.get("X-Sample-Rate", "16000"))).tobytes()
+        except ValueError as e:  # CodecError, or a bad X-Sample-Rate
+            raise HTTPException(status_code=400, detail=str(e))
     
-    # Store chunk
-    chunk_sessions[session_id]["chunks"][chunk_id] = body
-    chunk_sessions[session_id]["received_chunks"] += 1
+    # Write the chunk at its offset; retransmissions overwrite themselves
+    try:
+        with metrics.span("chunk_store"):
+            session = chunk_store.put(session_id, chunk_id, total_chunks, body)
+    except InvalidChunkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SessionTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ChunkStoreFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    # Decode any completed windows of the contiguous prefix in the background
+    if session.transcriber is not None:
+        session.transcriber.advance(session.contiguous_bytes)
+        session.transcriber.schedule()
     
-    return {"status": "chunk_received", "chunk_id": chunk_id}
+    return {"status": "chunk_received", "chunk_id": chunk_id, "received_chunks": session.received_chunks}
 
 @app.post("/complete")
 async def complete_session(request: Request) -> Dict[str, Any]:
     data = await request.json()
     session_id = data.get("session_id")
     
-    if not session_id or session_id not in chunk_sessions:
+    session = chunk_store.get(session_id) if session_id else None
+    if session is None:
         raise HTTPException(status_code=400, detail="Invalid session ID")
     
-    session = chunk_sessions[session_id]
-    print(f"[COMPLETE] Session {session_id}: {session['received_chunks']}/{session['total_chunks']} chunks received")
+    log.debug("[COMPLETE] Session %s: %d/%d chunks received", session_id, session.received_chunks, session.total_chunks)
     
     # Check if all chunks received
-    if session["received_chunks"] != session["total_chunks"]:
-        return {"error": f"Missing chunks: {session['received_chunks']}/{session['total_chunks']}"}
-    
-    # Combine chunks in order
-    audio_data = b""
-    for chunk_id in range(session["total_chunks"]):
-        if chunk_id in session["chunks"]:
-            audio_data += session["chunks"][chunk_id]
-        else:
-            return {"error": f"Missing chunk {chunk_id}"}
-    
-    print(f"[COMPLETE] Combined audio: {len(audio_data)} bytes")
+    if not session.complete:
+        return {
+            "error": f"Missing chunks: {session.received_chunks}/{session.total_chunks}",
+            "missing": session.missing()
+        }
     
-    # Save combined audio files for testing
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    debug_file_path = f"/tmp/mic_test_{timestamp}_{session_id}.raw"  
-    wav_file_path = f"/tmp/mic_test_{timestamp}_{session_id}.wav"
+    if session.completing:
+        raise HTTPException(status_code=409, detail="Session is already being completed")
     
-    # Save raw audio
-    with open(debug_file_path, "wb") as debug_file:
-        debug_file.write(audio_data)
-    print(f"[SAVED] Raw audio: {debug_file_path}")
+    # Only the tail after the last decoded window is left to transcribe. The session stays
+    # in the store meanwhile, so a full job queue can be answered with 429 and retried
+    transcriber = session.transcriber
+    session.completing = True
+    try:
+        with metrics.span("asr_tail"):
+            transcription = await transcriber.finalize()
+    except QueueFullError as e:
+        session.completing = False
+        raise queue_full(e)
+    except Exception as e:
+        log.error("[COMPLETE] Streaming transcription failed: %s", e)
+        transcription = ""
     
-    # Convert to WAV for easy playback testing
+    # Chunks were written in place, so the audio is already assembled
+    chunk_store.pop(session_id)
+    total_bytes = session.size
+    log.debug("[COMPLETE] Combined audio: %d bytes (%d duplicate chunks, spilled: %s)", total_bytes, session.duplicates, session.spilled)
     try:
-        with wave.open(wav_file_path, 'wb') as wav_file:
-            wav_file.setnchannels(1)  # mono
-            wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-            wav_file.setframerate(16000)  # 16kHz
-            wav_file.writeframes(audio_data)
-        print(f"[SAVED] WAV audio: {wav_file_path}")
-        
-        # Clean up session
-        del chunk_sessions[session_id]
-        
-        return {
-            "status": "success",
-            "message": f"Audio saved for testing - {len(audio_data)} bytes",
-            "files": {
-                "raw": debug_file_path,
-                "wav": wav_file_path
-            },
-            "info": {
-                "chunks_received": session["total_chunks"],
-                "total_bytes": len(audio_data),
-                "duration_estimate": f"{len(audio_data) / (16000 * 2):.1f} seconds"
-            }
+        captures.capture("chunked", session.data(), 16000, session_id=session_id,
+                         meta={"chunks": session.total_chunks, "duplicates": session.duplicates})
+    finally:
+        chunk_store.release(session)
+    log.info("[COMPLETE] Transcription (%d windows decoded while uploading): '%s'", transcriber.windows_decoded, transcription)
+    
+    return {
+        "status": "success",
+        "message": f"Audio received - {total_bytes} bytes",
+        "transcription": transcription,
+        "info": {
+            "chunks_received": session.total_chunks,
+            "total_bytes": total_bytes,
+            "duration_estimate": f"{total_bytes / (16000 * 2):.1f} seconds"
         }
-            
-    except Exception as e:
-        print(f"[ERROR] File save failed: {str(e)}")
-        # Clean up session
-        if session_id in chunk_sessions:
-            del chunk_sessions[session_id]
-        return {"error": f"File save failed: {str(e)}"}
+    }
 
 @app.get("/sessions")
 async def get_sessions():
-    return {"active_sessions": list(chunk_sessions.keys())}
+    return {"active_sessions": list(chunk_store.sessions.keys()), "store": chunk_store.stats()}
+
+@app.get("/captures")
+async def get_captures(session_id: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """Saved debug recordings, newest first; filter by session ID to find one upload"""
+    found = await asyncio.get_running_loop().run_in_executor(None, captures.find, session_id, limit)
+    return {"captures": found, "writer": captures.stats()}
+
+@app.get("/sessions/{session_id}/partial")
+async def get_partial_transcript(session_id: str) -> Dict[str, Any]:
+    session = chunk_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session ID")
+    transcriber = session.transcriber
+    return {
+        "session_id": session_id,
+        "partial_text": transcriber.partial_text if transcriber else "",
+        "decoded_seconds": transcriber.decoded_samples / 16000 if transcriber else 0.0,
+        "received_seconds": session.contiguous_bytes / (16000 * 2),
+        "received_chunks": session.received_chunks,
+        "total_chunks": session.total_chunks
+    }
 
 def audio_callback(indata, frames, time, status):
     """Callback function for sounddevice stream"""
     if status:
-        print(f"[AUDIO] Status: {status}")
+        log.warning("[AUDIO] Status: %s", status)
     
+    recording = devices.recording  # one tuple read, no lock on the audio thread
     if recording:
-        # Apply gain to boost weak microphone signal
-        audio_float = indata[:, 0] * 10.0  # 20dB boost
+        # Apply gain to boost weak microphone signal (20dB), clip to prevent distortion
+        # and scale to int16 range - whole block at once, written straight into the ring
+        audio_float = indata[:, 0] * 10.0
+        np.clip(audio_float, -1.0, 1.0, out=audio_float)
+        audio_float *= 32767
+        
+        # Debug: print audio levels every 16 blocks to avoid spam
+        if recording[0].buffer.blocks % 16 == 0 and log.isEnabledFor(logging.DEBUG):
+            rms = np.sqrt(np.mean(audio_float**2)) / 32767
+            max_val = np.max(np.abs(audio_float)) / 32767
+            log.debug("[AUDIO] RMS: %.4f, Max: %.4f, Frames: %d (10x gain applied)", rms, max_val, frames)
+        
+        # Every device holding its button hears the same microphone
+        for device in recording:
+            device.buffer.write(audio_float)
+
+def open_input_stream(device_id: Optional[int] = None):
+    """Pick a microphone and start the shared input stream that feeds every recording device"""
+    # Imported here: PortAudio initialisation is slow and only the local recorder needs it
+    import sounddevice as sd
+    
+    # Find microphone device
+    input_devices = sd.query_devices()
+    
+    # Use provided device_id or try to find built-in mic
+    if device_id is not None:
+        selected_device = device_id
+        device_info = input_devices[device_id]
+        log.info("[AUDIO] Using manually selected device: %s", device_id)
+    else:
+        # Try to find best microphone device using pattern matching
+        selected_device = None
         
-        # Clip to prevent distortion
-        audio_float = np.clip(audio_float, -1.0, 1.0)
+        # Priority 1: Try specific working device first (hw:0,6 often works better than hw:0,0)
+        working_candidates = [4, 5, 0]  # hw:0,6, hw:0,7, hw:0,0
+        for candidate in working_candidates:
+            if (candidate < len(input_devices) and 
+                input_devices[candidate]['max_input_channels'] > 0 and
+                'sof-hda-dsp' in input_devices[candidate]['name'].lower()):
+                try:
+                    if input_devices[candidate]['default_samplerate'] >= 16000:
+                        selected_device = candidate
+                        log.info("[AUDIO] Using sof-hda-dsp device %d: %s", candidate, input_devices[candidate]['name'])
+                        break
+                except:
+                    continue
         
-        # Convert float32 to int16 PCM
-        audio_int16 = (audio_float * 32767).astype(np.int16)
+        # Priority 2: Look for system defaults (pulse, pipewire)
+        if selected_device is None:
+            preferred_systems = ['pulse', 'pipewire', 'default']
+            for system in preferred_systems:
+                for i, device in enumerate(input_devices):
+                    if (device['max_input_channels'] > 0 and 
+                        system in device['name'].lower()):
+                        try:
+                            if device['default_samplerate'] >= 16000:
+                                selected_device = i
+                                log.info("[AUDIO] Using system audio: %s", device['name'])
+                                break
+                        except:
+                            continue
+                if selected_device is not None:
+                    break
         
-        # Debug: print audio levels every 100 frames to avoid spam
-        if len(audio_buffer) % 1600 == 0:  # every ~0.1s at 16kHz
-            rms = np.sqrt(np.mean(audio_float**2))
-            max_val = np.max(np.abs(audio_float))
-            print(f"[AUDIO] RMS: {rms:.4f}, Max: {max_val:.4f}, Frames: {frames} (10x gain applied)")
+        # Priority 3: Any working input device
+        if selected_device is None:
+            for i, device in enumerate(input_devices):
+                if (device['max_input_channels'] > 0 and 
+                    device['default_samplerate'] >= 16000):
+                    selected_device = i
+                    log.info("[AUDIO] Fallback to first available: %s", device['name'])
+                    break
         
-        audio_buffer.extend(audio_int16)
+        # Final fallback to system default
+        if selected_device is None:
+            selected_device = sd.default.device[0]
+            log.info("[AUDIO] Using system default device")
+        
+        device_info = input_devices[selected_device]
+    
+    # Print all available input devices for debugging
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("[AUDIO] Available input devices:")
+        for i, device in enumerate(input_devices):
+            if device['max_input_channels'] > 0:
+                marker = ">>> " if i == selected_device else "    "
+                log.debug("%s%d: %s (%d channels)", marker, i, device['name'], device['max_input_channels'])
+    
+    log.info("[AUDIO] Using input device: %s (index: %s), %s Hz, %d channels",
+             device_info['name'], selected_device, device_info['default_samplerate'], device_info['max_input_channels'])
+    
+    # Use device's native sample rate if it's reasonable, otherwise force 16kHz
+    target_samplerate = int(device_info['default_samplerate']) if device_info['default_samplerate'] in [16000, 22050, 44100, 48000] else 16000
+    
+    # Store sample rate for later use in stop_recording
+    start_recording.actual_samplerate = target_samplerate
+    
+    start_recording.stream = sd.InputStream(
+        callback=audio_callback,
+        channels=1,
+        samplerate=target_samplerate,
+        dtype='float32',
+        device=selected_device,  # Use specific microphone device
+        blocksize=1024  # Add blocksize for better performance
+    )
+    start_recording.stream.start()
+    log.info("[AUDIO] Audio stream started successfully at %dHz", target_samplerate)
 
 @app.post("/start-recording")
-async def start_recording(device_id: Optional[int] = None) -> Dict[str, Any]:
-    global recording, last_button_press
+async def start_recording(request: Request, device_id: Optional[int] = None) -> Dict[str, Any]:
+    device = devices.get(request.headers.get("X-Device-ID"))
     
-    current_time = time.time()
-    if current_time - last_button_press < DEBOUNCE_TIME:
+    if not device.press(DEBOUNCE_TIME):
         return {"status": "debounced", "message": "Button press too soon"}
     
-    last_button_press = current_time
-    
     try:
-        if not recording:
-            recording = True
-            audio_buffer.clear()
-            
-            # Find microphone device
-            devices = sd.query_devices()
-            
-            # Use provided device_id or try to find built-in mic
-            if device_id is not None:
-                selected_device = device_id
-                device_info = devices[device_id]
-                print(f"[AUDIO] Using manually selected device: {device_id}")
-            else:
-                # Try to find best microphone device using pattern matching
-                selected_device = None
-                
-                # Priority 1: Try specific working device first (hw:0,6 often works better than hw:0,0)
-                working_candidates = [4, 5, 0]  # hw:0,6, hw:0,7, hw:0,0
-                for candidate in working_candidates:
-                    if (candidate < len(devices) and 
-                        devices[candidate]['max_input_channels'] > 0 and
-                        'sof-hda-dsp' in devices[candidate]['name'].lower()):
-                        try:
-                            if devices[candidate]['default_samplerate'] >= 16000:
-                                selected_device = candidate
-                                print(f"[AUDIO] Using sof-hda-dsp device {candidate}: {devices[candidate]['name']}")
-                                break
-                        except:
-                            continue
-                
-                # Priority 2: Look for system defaults (pulse, pipewire)
-                if selected_device is None:
-                    preferred_systems = ['pulse', 'pipewire', 'default']
-                    for system in preferred_systems:
-                        for i, device in enumerate(devices):
-                            if (device['max_input_channels'] > 0 and 
-                                system in device['name'].lower()):
-                                try:
-                                    if device['default_samplerate'] >= 16000:
-                                        selected_device = i
-                                        print(f"[AUDIO] Using system audio: {device['name']}")
-                                        break
-                                except:
-                                    continue
-                        if selected_device is not None:
-                            break
-                
-                # Priority 3: Any working input device
-                if selected_device is None:
-                    for i, device in enumerate(devices):
-                        if (device['max_input_channels'] > 0 and 
-                            device['default_samplerate'] >= 16000):
-                            selected_device = i
-                            print(f"[AUDIO] Fallback to first available: {device['name']}")
-                            break
-                
-                # Final fallback to system default
-                if selected_device is None:
-                    selected_device = sd.default.device[0]
-                    print(f"[AUDIO] Using system default device")
-                
-                device_info = devices[selected_device]
-            
-            # Print all available input devices for debugging
-            print("[AUDIO] Available input devices:")
-            for i, device in enumerate(devices):
-                if device['max_input_channels'] > 0:
-                    marker = ">>> " if i == selected_device else "    "
-                    print(f"{marker}{i}: {device['name']} ({device['max_input_channels']} channels)")
-            
-            print(f"[AUDIO] Using input device: {device_info['name']} (index: {selected_device})")
-            print(f"[AUDIO] Device sample rate: {device_info['default_samplerate']}")
-            print(f"[AUDIO] Device channels: {device_info['max_input_channels']}")
-            
+        if not device.recording:
             # Start audio stream if not already running
             if not hasattr(start_recording, 'stream') or start_recording.stream.closed:
-                # Use device's native sample rate if it's reasonable, otherwise force 16kHz
-                target_samplerate = int(device_info['default_samplerate']) if device_info['default_samplerate'] in [16000, 22050, 44100, 48000] else 16000
-                
-                # Store sample rate for later use in stop_recording
-                start_recording.actual_samplerate = target_samplerate
-                
-                start_recording.stream = sd.InputStream(
-                    callback=audio_callback,
-                    channels=1,
-                    samplerate=target_samplerate,
-                    dtype='float32',
-                    device=selected_device,  # Use specific microphone device
-                    blocksize=1024  # Add blocksize for better performance
-                )
-                start_recording.stream.start()
-                print(f"[AUDIO] Audio stream started successfully at {target_samplerate}Hz")
+                open_input_stream(device_id)
+            devices.start_recording(device, start_recording.actual_samplerate)
             
             return {"status": "recording_started", "message": "Recording started successfully"}
         else:
@@ -418,134 +633,312 @@ async def start_recording(device_id: Optional[int] = None) -> Dict[str, Any]:
     except Exception as e:
         return {"status": "error", "message": f"Failed to start recording: {str(e)}"}
 
-@app.post("/stop-recording")
-async def stop_recording() -> Dict[str, Any]:
-    global recording, latest_text, last_button_press
+def stop_and_collect(device: DeviceState) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+    """
+    Debounce the device's button, stop its recording and return the take as 16kHz float32.
     
-    current_time = time.time()
-    if current_time - last_button_press < DEBOUNCE_TIME:
-        return {"status": "debounced", "message": "Button press too soon"}
+    Returns (response, None) when there is nothing to transcribe, (None, audio) otherwise.
+    """
+    if not device.press(DEBOUNCE_TIME):
+        return {"status": "debounced", "message": "Button press too soon"}, None
     
-    last_button_press = current_time
+    if not device.recording:
+        return {"status": "not_recording", "message": "Recording was not active"}, None
+    
+    devices.stop_recording(device)
+    audio_buffer = device.buffer
+    
+    # Collect audio data from buffer
+    if len(audio_buffer) == 0:
+        device.latest_text = ""
+        return {
+            "status": "no_audio", 
+            "message": "No audio data recorded"
+        }, None
+    
+    audio_data = audio_buffer.snapshot()
+    
+    # Use actual recording sample rate instead of hardcoded 16kHz
+    actual_samplerate = device.sample_rate
+    if audio_buffer.overrun_samples:
+        log.warning("[AUDIO] %s: recording longer than %.0fs, dropped the first %.1fs",
+                    device.device_id, RECORDER_MAX_SECONDS, audio_buffer.overrun_samples / actual_samplerate)
+    captures.capture("recording", audio_data, actual_samplerate, session_id=device.device_id,
+                     meta={"overrun_samples": audio_buffer.overrun_samples})
+    with metrics.span("resample"):
+        audio = int16_to_whisper(audio_data, actual_samplerate)
+    log.debug("[RECORD] Recorded %d samples at %dHz", len(audio_data), actual_samplerate)
+    return None, audio
+
+def agent_failed(answer: str, success: bool) -> bool:
+    """Agent error, timeout or iteration limit"""
+    return (not success or 
+        "iteration limit" in answer.lower() or 
+        "time limit" in answer.lower() or
+        "agent stopped" in answer.lower() or
+        answer.strip() == "")
+
+def fallback_answer(transcribed_text: str) -> str:
+    return f"Transkrypcja: {transcribed_text} (wyszukiwanie internetowe niedostępne)"
+
+def settle_answer(device: DeviceState, transcribed_text: str, search_result: Dict[str, Any]) -> str:
+    """
+    Final answer for a turn: the fallback if the agent failed, remembered in the
+    device history only when it is a real answer.
+    """
+    answer = search_result.get("answer", "No answer available")
+    failed = agent_failed(answer, search_result.get("success", False))
+    if failed:
+        log.info("[RECORD] Agent failed, using fallback")
+        answer = fallback_answer(transcribed_text)
+    device.remember(transcribed_text, answer, not failed)
+    return answer
+
+@app.post("/stop-recording")
+async def stop_recording(request: Request) -> Dict[str, Any]:
+    device = devices.get(request.headers.get("X-Device-ID"))
     
     try:
-        if recording:
-            recording = False
+        response, audio = stop_and_collect(device)
+        if response is not None:
+            return response
+        
+        # Transcribe audio using Whisper model (same as /transcribe endpoint)
+        try:
+            result = await job_queue.run(transcribe_speech, audio, name="transcribe")
+            transcribed_text = result["text"].strip()
+            
+            log.debug("[RECORD] Transcription result: '%s'", transcribed_text)
             
-            # Collect audio data from buffer
-            if len(audio_buffer) > 0:
-                audio_data = np.array(list(audio_buffer), dtype=np.int16)
+            if transcribed_text:
+                # Let the orchestrator pick the agent, like in /transcribe endpoint
+                search_result = await agent_queue.run(run_turn, transcribed_text, device, name="orchestrator")
                 
-                # Save audio as WAV file
-                timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                wav_file_path = f"/tmp/recording_{timestamp}.wav"
+                log.debug("[RECORD] Routed to %s (%s, confidence %.2f)", search_result.get("intent"),
+                          search_result.get("route_method"), search_result.get("confidence") or 0)
+                log.debug("[RECORD] Answer: '%s', success: %s", search_result.get("answer"), search_result.get("success"))
                 
-                try:
-                    # Use actual recording sample rate instead of hardcoded 16kHz
-                    actual_samplerate = getattr(start_recording, 'actual_samplerate', 16000)
-                    
-                    with wave.open(wav_file_path, 'wb') as wav_file:
-                        wav_file.setnchannels(1)  # mono
-                        wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-                        wav_file.setframerate(actual_samplerate)  # Use actual sample rate
-                        wav_file.writeframes(audio_data.tobytes())
-                    
-                    print(f"[DEBUG] Audio saved with sample rate: {actual_samplerate}Hz")
-                    
-                    print(f"[DEBUG] Audio saved to: {wav_file_path}")
-                    
-                    # Transcribe audio using Whisper model (same as /transcribe endpoint)
-                    try:
-                        print("[DEBUG] Starting transcription...")
-                        result = model.transcribe(wav_file_path)
-                        transcribed_text = result["text"].strip()
-                        
-                        print(f"[DEBUG] Transcription result: '{transcribed_text}'")
-                        
-                        if transcribed_text:
-                            # Use websearch_agent like in /transcribe endpoint
-                            query = f"Przeszukaj internet i odpowiedz na pytanie: {transcribed_text}. Odpowiedz krótko."
-                            print(f"[DEBUG] Searching with query: {query}")
-                            
-                            search_result = websearch_agent.search(query)
-                            answer = search_result.get("answer", "No answer available")
-                            success = search_result.get("success", False)
-                            
-                            print(f"[DEBUG] Full search result: {search_result}")
-                            print(f"[DEBUG] Answer: '{answer}'")
-                            print(f"[DEBUG] Success: {success}")
-                            
-                            # Handle agent timeout/iteration limit
-                            if (not success or 
-                                "iteration limit" in answer.lower() or 
-                                "time limit" in answer.lower() or
-                                "agent stopped" in answer.lower() or
-                                answer.strip() == ""):
-                                print(f"[DEBUG] WebSearch agent failed, using fallback")
-                                answer = f"Transkrypcja: {transcribed_text} (wyszukiwanie internetowe niedostępne)"
-                            
-                            latest_text = answer
-                            print(f"[DEBUG] Final answer: {answer}")
-                            
-                            return {
-                                "status": "recording_stopped", 
-                                "message": "Recording stopped, transcribed and processed",
-                                "file_path": wav_file_path,
-                                "transcription": transcribed_text,
-                                "answer": answer,
-                                "text": answer
-                            }
-                        else:
-                            latest_text = "No speech detected in recording"
-                            return {
-                                "status": "no_speech", 
-                                "message": "No speech detected in recording",
-                                "file_path": wav_file_path,
-                                "text": latest_text
-                            }
-                            
-                    except Exception as transcription_error:
-                        print(f"[DEBUG] Transcription error: {str(transcription_error)}")
-                        latest_text = f"Audio saved to {wav_file_path} (transcription failed)"
-                        return {
-                            "status": "transcription_error", 
-                            "message": f"Audio saved but transcription failed: {str(transcription_error)}",
-                            "file_path": wav_file_path,
-                            "text": latest_text
-                        }
-                    
-                except Exception as save_error:
-                    latest_text = ""
-                    return {
-                        "status": "save_error", 
-                        "message": f"Failed to save audio file: {str(save_error)}"
-                    }
+                # Handle agent timeout/iteration limit
+                answer = settle_answer(device, transcribed_text, search_result)
+                log.info("[RECORD] Final answer: %s", answer)
+                
+                return {
+                    "status": "recording_stopped", 
+                    "message": "Recording stopped, transcribed and processed",
+                    "transcription": transcribed_text,
+                    "answer": answer,
+                    "text": answer,
+                    "recording": device.buffer.stats(device.sample_rate)
+                }
             else:
-                latest_text = ""
+                device.latest_text = "No speech detected in recording"
                 return {
-                    "status": "no_audio", 
-                    "message": "No audio data recorded"
+                    "status": "no_speech", 
+                    "message": "No speech detected in recording",
+                    "text": device.latest_text
                 }
-        else:
-            return {"status": "not_recording", "message": "Recording was not active"}
+                
+        except QueueFullError as e:
+            log.warning("[RECORD] Job queue full (%d/%d)", e.depth, e.capacity)
+            device.latest_text = "Server busy, try again"
+            return {
+                "status": "busy",
+                "message": f"Server busy, job queue is full ({e.depth}/{e.capacity})",
+                "text": device.latest_text
+            }
+        except Exception as transcription_error:
+            log.error("[RECORD] Transcription error: %s", transcription_error)
+            device.latest_text = "Transcription failed"
+            return {
+                "status": "transcription_error", 
+                "message": f"Transcription failed: {str(transcription_error)}",
+                "text": device.latest_text
+            }
     
     except Exception as e:
-        latest_text = ""
+        device.latest_text = ""
         return {"status": "error", "message": f"Failed to stop recording: {str(e)}"}
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def synthesize_sentence(tts, index: int, sentence: str) -> Dict[str, Any]:
+    """TTS one sentence on a worker thread; the text still goes out if the queue is full"""
+    try:
+        with metrics.span("tts"):
+            audio = await job_queue.run(tts.synthesize, sentence, name="tts")
+        encoded = base64.b64encode(audio).decode("ascii")
+    except Exception as e:
+        log.warning("[TTS] Synthesis failed for sentence %d: %s", index, e)
+        encoded = None
+    return {"index": index, "text": sentence, "audio": encoded, "audio_format": "wav" if encoded else None}
+
+async def stream_answer(device: DeviceState, transcribed_text: str, release: Callable[[], None]):
+    """
+    SSE body for /stop-recording/stream.
+    
+    Events: transcription, route, then one sentence event (text + base64 WAV)
+    per finished sentence while the LLM is still generating, and done.
+    TTS for sentence N runs while tokens for sentence N+1 arrive.
+    `release` gives back the agent_queue worker held for the turn.
+    """
+    try:
+        yield sse_event("transcription", {"text": transcribed_text})
+        
+        loop = asyncio.get_running_loop()
+        orchestrator = await loop.run_in_executor(None, registry.get, "orchestrator")
+        tts = await loop.run_in_executor(None, registry.get, "tts")
+        
+        splitter = SentenceSplitter()
+        pending = deque()  # TTS tasks, emitted strictly in sentence order
+        answer_parts = []
+        success = False
+        
+        def schedule(sentence: str):
+            pending.append(asyncio.ensure_future(synthesize_sentence(tts, len(answer_parts) + len(pending), sentence)))
+        
+        async for event in orchestrator.astream(transcribed_text, history=list(device.history)):
+            if event["type"] == "route":
+                yield sse_event("route", {k: v for k, v in event.items() if k != "type"})
+            elif event["type"] == "token":
+                for sentence in splitter.feed(event["text"]):
+                    schedule(sentence)
+            elif event["type"] == "end":
+                success = event["success"]
+            
+            # Emit every sentence whose audio is already done, without waiting on the rest
+            while pending and pending[0].done():
+                item = pending.popleft().result()
+                answer_parts.append(item["text"])
+                yield sse_event("sentence", item)
+        
+        for sentence in splitter.flush():
+            schedule(sentence)
+        
+        if not success and not pending and not answer_parts:
+            schedule(fallback_answer(transcribed_text))
+        
+        while pending:
+            item = await pending.popleft()
+            answer_parts.append(item["text"])
+            yield sse_event("sentence", item)
+        
+        answer = " ".join(answer_parts)
+        # The fallback or an "agent stopped" answer still goes out, but is not kept as context
+        device.remember(transcribed_text, answer, not agent_failed(answer, success))
+        yield sse_event("done", {"answer": answer, "success": success})
+    finally:
+        release()
+
+@app.post("/stop-recording/stream")
+async def stop_recording_stream(request: Request):
+    """
+    Same as /stop-recording, but the answer comes back as Server-Sent Events
+    sentence by sentence, each with synthesized audio, instead of all at once.
+    """
+    device = devices.get(request.headers.get("X-Device-ID"))
+    
+    response, audio = stop_and_collect(device)
+    if response is not None:
+        return response
+    
+    try:
+        result = await job_queue.run(transcribe_speech, audio, name="transcribe")
+    except QueueFullError as e:
+        raise queue_full(e)
+    
+    transcribed_text = result["text"].strip()
+    log.debug("[RECORD] Transcription result: '%s'", transcribed_text)
+    if not transcribed_text:
+        device.latest_text = "No speech detected in recording"
+        return {"status": "no_speech", "message": "No speech detected in recording", "text": device.latest_text}
+    
+    # The streamed turn holds an agent worker like /stop-recording does, so AGENT_CONCURRENCY
+    # bounds it too; released when the stream ends, or after the response if it never started
+    try:
+        release = await agent_queue.hold(name="orchestrator_stream")
+    except QueueFullError as e:
+        raise queue_full(e)
+    
+    return StreamingResponse(
+        stream_answer(device, transcribed_text, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
 @app.get("/latest-text")
-async def get_latest_text() -> Dict[str, str]:
-    return {"text": latest_text}
+async def get_latest_text(request: Request) -> Dict[str, str]:
+    return {"text": devices.get(request.headers.get("X-Device-ID")).latest_text}
+
+@app.get("/devices")
+async def list_devices() -> Dict[str, Any]:
+    """Known walkie-talkies, most recently seen first"""
+    return {"stats": devices.stats(), "devices": devices.list()}
 
 @app.get("/")
 async def root():
     return {"message": "Frank Brain API is running"}
 
+@app.get("/cache")
+async def get_cache_stats() -> Dict[str, Any]:
+    """Answer cache and search result cache hit rates, search latencies by source"""
+    if not registry.is_loaded("websearch"):
+        return {"loaded": False}
+    agent = registry.get("websearch")
+    return {"loaded": True, **agent.cache.stats(), "search": agent.search_layer.stats()}
+
+@app.get("/meals")
+async def get_meals() -> Dict[str, Any]:
+    """Today's and this week's calorie totals and the meal log writer state"""
+    if not registry.is_loaded("dietitian"):
+        return {"loaded": False}
+    return {"loaded": True, **registry.get("dietitian").store.stats()}
+
+@app.get("/llm")
+async def get_llm_stats() -> Dict[str, Any]:
+    """LLM gateway: response cache hit rate and calls, tokens, cost and latency per agent"""
+    if not registry.is_loaded("websearch"):
+        return {"loaded": False}
+    from agents.llm.gateway import get_gateway
+    return {"loaded": True, **get_gateway().stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage, request, queue, LLM and tool latencies"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def ready():
+    status = registry.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.on_event("startup")
+async def startup_event():
+    await job_queue.start()
+    await agent_queue.start()
+    chunk_store.start()
+    captures.start()
+    if WARMUP_ON_STARTUP:
+        registry.warm_up()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
-    global recording
-    recording = False
+    devices.stop_all()
+    await job_queue.stop()
+    await agent_queue.stop()
+    await chunk_store.stop()
+    await asyncio.get_running_loop().run_in_executor(None, captures.stop)
+    if registry.is_loaded("asr") and hasattr(registry.get("asr"), "close"):
+        # Stops the ASR worker processes and frees their shared-memory slots
+        await asyncio.get_running_loop().run_in_executor(None, registry.get("asr").close)
+    if registry.is_loaded("dietitian"):
+        # Writes out meals still waiting for their batch
+        await asyncio.get_running_loop().run_in_executor(None, registry.get("dietitian").close)
+    if registry.is_loaded("websearch") and registry.get("websearch").cache is not None:
+        # Writes out answers and access bumps still waiting for their batch
+        await asyncio.get_running_loop().run_in_executor(None, registry.get("websearch").cache.close)
     if hasattr(start_recording, 'stream') and not start_recording.stream.closed:
         start_recording.stream.stop()
         start_recording.stream.close()
@@ -0,0 +1,233 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; covers a 5ms VAD pass up to a slow agent turn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Trace:
+    """Spans of one request, shared by every task and worker thread handling it"""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.spans: List[Tuple[str, float]] = []  # (stage, seconds), appended from any thread
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. `asr;dur=812.4, agent;dur=1530.2`"""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.spans)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    In-process counters and histograms rendered in the Prometheus text format.
+
+    span() times a stage, feeds `<namespace>_stage_seconds{stage=...}` and
+    appends the span to the current request's Trace, so the same numbers end
+    up in /metrics and in the Server-Timing header the device receives.
+    """
+
+    def __init__(self, namespace: str = "frank"):
+        self.namespace = namespace
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def record_span(self, stage: str, seconds: float):
+        self.observe("stage_seconds", seconds, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((stage, seconds))
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block as one pipeline stage; works in sync and async code"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(stage, time.perf_counter() - started)
+
+    @staticmethod
+    def _labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for k, v in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = f"{self.namespace}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in series.items():
+                    lines.append(f"{full}{self._labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                full = f"{self.namespace}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{self._labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{full}_bucket{self._labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{full}_sum{self._labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{full}_count{self._labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("stage_seconds", "Time spent in each stage of a voice turn")
+metrics.describe("request_seconds", "HTTP request latency by route")
+metrics.describe("requests_total", "HTTP requests by route and status")
+metrics.describe("queue_wait_seconds", "Time jobs spend queued before a worker picks them up")
+metrics.describe("llm_seconds", "LLM call latency by model")
+metrics.describe("llm_tokens_total", "LLM tokens by model and kind")
+metrics.describe("tool_seconds", "Agent tool call latency by tool")
+metrics.describe("upload_bytes_total", "Audio bytes received by route and upload codec")
+metrics.describe("search_seconds", "Web search latency by result source (cache, shared, network, error)")
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current request's trace ID to every log record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+        record.trace_id = trace.id if trace is not None else "-"
+        return True
+
+
+def configure_logging(level: Optional[str] = None):
+    """
+    LOG_LEVEL=DEBUG brings back the per-request detail; the default INFO
+    skips it without formatting the messages at all.
+    """
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger("api")
+    root.handlers[:] = [handler]
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    root.propagate = False
+
+
+def _model_name(callback_kwargs: dict) -> str:
+    params = callback_kwargs.get("invocation_params") or {}
+    return params.get("model_name") or params.get("model") or "llm"
+
+
+def langchain_callbacks() -> list:
+    """
+    LangChain callback handlers that time every LLM and tool call.
+
+    Built on demand so importing this module never imports langchain.
+    """
+    from langchain.callbacks.base import BaseCallbackHandler
+
+    class MetricsCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._started: Dict[str, Tuple[float, str]] = {}
+
+        def _start(self, run_id, label: str):
+            self._started[str(run_id)] = (time.perf_counter(), label)
+
+        def _finish(self, run_id) -> Optional[Tuple[float, str]]:
+            started = self._started.pop(str(run_id), None)
+            if started is None:
+                return None
+            return time.perf_counter() - started[0], started[1]
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, _model_name(kwargs))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, _model_name(kwargs))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            finished = self._finish(run_id)
+            if finished is None:
+                return
+            seconds, model = finished
+            metrics.observe("llm_seconds", seconds, model=model)
+            metrics.record_span("llm", seconds)
+            usage = (response.llm_output or {}).get("token_usage", {})
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if usage.get(kind):
+                    metrics.inc("llm_tokens_total", usage[kind], model=model, kind=kind.split("_")[0])
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self._start(run_id, (serialized or {}).get("name", "tool"))
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            finished = self._finish(run_id)
+            if finished is not None:
+                seconds, tool = finished
+                metrics.observe("tool_seconds", seconds, tool=tool)
+                metrics.record_span(f"tool_{tool}", seconds)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id)
+
+    return [MetricsCallbackHandler()]
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-size numpy ring buffer for the microphone callback.
+
+    write() copies a whole block with at most two slice assignments, so the
+    audio thread never allocates Python objects per sample. When more audio
+    arrives than fits, the oldest samples are overwritten and counted in
+    `overrun_samples` instead of disappearing silently.
+    """
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        self._data = np.zeros(max(1, capacity), dtype=dtype)
+        self._pos = 0          # next write index
+        self.written = 0       # samples written since clear()
+        self.blocks = 0
+        self.overrun_samples = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    def resize(self, capacity: int):
+        """Reallocate for a new capacity (e.g. a different sample rate); drops the contents"""
+        with self._lock:
+            if capacity != self.capacity:
+                self._data = np.zeros(max(1, capacity), dtype=self._data.dtype)
+            self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._pos = 0
+        self.written = 0
+        self.blocks = 0
+        self.overrun_samples = 0
+
+    def write(self, block: np.ndarray):
+        """Append one block of samples, converting to the buffer dtype in place"""
+        n = len(block)
+        if n == 0:
+            return
+        with self._lock:
+            capacity = self.capacity
+            if n >= capacity:
+                # Only the newest `capacity` samples can survive
+                block = block[n - capacity:]
+                np.copyto(self._data, block, casting="unsafe")
+                self._pos = 0
+            else:
+                first = min(n, capacity - self._pos)
+                np.copyto(self._data[self._pos:self._pos + first], block[:first], casting="unsafe")
+                if first < n:
+                    np.copyto(self._data[:n - first], block[first:], casting="unsafe")
+                self._pos = (self._pos + n) % capacity
+            self.overrun_samples += max(0, self.written + n - capacity) - max(0, self.written - capacity)
+            self.written += n
+            self.blocks += 1
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Samples in recording order.
+
+        Zero-copy view while the buffer has not wrapped; one copy otherwise.
+        The view is only stable while nothing writes, i.e. after recording stops.
+        """
+        with self._lock:
+            if self.written <= self.capacity:
+                return self._data[:self.written]
+            return np.concatenate((self._data[self._pos:], self._data[:self._pos]))
+
+    def stats(self, sample_rate: int) -> Dict[str, float]:
+        return {
+            "samples": len(self),
+            "seconds": len(self) / sample_rate,
+            "capacity_seconds": self.capacity / sample_rate,
+            "overrun_seconds": self.overrun_samples / sample_rate
+        }
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class LazyRegistry:
+    """
+    Named components (ASR model, agents) that are built on first use.
+
+    Heavy imports live inside the factories, so importing the API module stays
+    cheap. warm_up() builds components on a background thread and runs an
+    optional warm-up hook on each; status() reports progress for /ready.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Optional[Callable[[Any], None]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._state: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._timings: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[[], Any], warmup: Optional[Callable[[Any], None]] = None):
+        self._factories[name] = factory
+        self._warmups[name] = warmup
+        self._locks[name] = threading.Lock()
+        self._state[name] = "pending"
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            # Another thread may have finished building it while we waited
+            if name not in self._instances:
+                self._state[name] = "loading"
+                started = time.time()
+                try:
+                    self._instances[name] = self._factories[name]()
+                except Exception as e:
+                    self._state[name] = "failed"
+                    self._errors[name] = str(e)
+                    raise
+                self._timings[name] = time.time() - started
+                self._state[name] = "loaded"
+            return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Build and warm up components in the background; returns immediately"""
+        if self._thread is not None:
+            return
+        names = list(names) if names is not None else list(self._factories)
+        self._thread = threading.Thread(target=self._warm_up, args=(names,), name="frank-warmup", daemon=True)
+        self._thread.start()
+
+    def _warm_up(self, names):
+        for name in names:
+            try:
+                instance = self.get(name)
+                warmup = self._warmups.get(name)
+                if warmup is not None:
+                    self._state[name] = "warming"
+                    started = time.time()
+                    warmup(instance)
+                    self._timings[name] += time.time() - started
+                self._state[name] = "ready"
+                log.info("[STARTUP] %s ready in %.2fs", name, self._timings[name])
+            except Exception as e:
+                self._state[name] = "failed"
+                self._errors[name] = str(e)
+                log.error("[STARTUP] %s failed to load: %s", name, e)
+
+    def status(self) -> Dict[str, Any]:
+        components = {}
+        for name, state in self._state.items():
+            info = {"state": state}
+            if name in self._timings:
+                info["load_seconds"] = round(self._timings[name], 3)
+            if name in self._errors:
+                info["error"] = self._errors[name]
+            components[name] = info
+        ready = all(state in ("loaded", "ready") for state in self._state.values())
+        return {"ready": ready, "components": components}
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import numpy as np
+from typing import Any, Awaitable, Callable, List, Optional
+from api.audio import pcm16_to_float32
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+
+class StreamingTranscriber:
+    """
+    Incrementally transcribes a chunked PCM16 upload.
+
+    Audio is decoded in windows as soon as enough contiguous samples have
+    arrived, so when the upload completes only the tail is left to decode.
+    Each window boundary is moved to the quietest frame near its end to
+    avoid cutting words in half.
+
+    Decodes run through `run(fn, *args)`, an awaitable runner such as
+    JobQueue.run, so they share the ASR workers and queue limits with every
+    other decode; one job per window. Without it they go to the loop's
+    default executor.
+
+    By default the transcriber keeps its own copy of the audio. Pass a
+    preallocated `buffer` (e.g. a chunk store session) to read straight from
+    it instead, and call advance() as the contiguous prefix grows.
+    """
+
+    def __init__(
+        self,
+        transcribe_fn: Callable[[np.ndarray, str], str],
+        window_seconds: float = 5.0,
+        search_seconds: float = 1.0,
+        frame_ms: int = 20,
+        prompt_chars: int = 200,
+        buffer=None,
+        run: Optional[Callable[..., Awaitable[Any]]] = None
+    ):
+        self.transcribe_fn = transcribe_fn
+        self.run = run or (lambda fn, *args: asyncio.get_running_loop().run_in_executor(None, fn, *args))
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.search_samples = int(search_seconds * SAMPLE_RATE)
+        self.frame_samples = int(SAMPLE_RATE * frame_ms / 1000)
+        self.prompt_chars = prompt_chars
+
+        self.pcm = bytearray() if buffer is None else buffer  # contiguous audio received so far
+        self._external = buffer is not None
+        self._available = 0             # valid bytes in an external buffer
+        self.decoded_samples = 0        # samples already covered by partials
+        self.partials: List[str] = []
+        self.windows_decoded = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def partial_text(self) -> str:
+        return " ".join(p for p in self.partials if p).strip()
+
+    @property
+    def total_samples(self) -> int:
+        size = self._available if self._external else len(self.pcm)
+        return size // BYTES_PER_SAMPLE
+
+    def append(self, data: bytes):
+        """Append the next contiguous piece of PCM16 audio."""
+        if self._external:
+            raise RuntimeError("append() is not available with an external buffer, use advance()")
+        self.pcm += data
+
+    def advance(self, available_bytes: int):
+        """Mark the first `available_bytes` of the external buffer as contiguous audio."""
+        self._available = max(self._available, available_bytes)
+
+    def _samples(self, start: int, end: int) -> np.ndarray:
+        if self._external:
+            # Preallocated buffers never resize, so a view is safe and saves a copy
+            return pcm16_to_float32(memoryview(self.pcm)[start * BYTES_PER_SAMPLE:end * BYTES_PER_SAMPLE])
+        # Slice first: a live view into the bytearray would block append()
+        return pcm16_to_float32(self.pcm[start * BYTES_PER_SAMPLE:end * BYTES_PER_SAMPLE])
+
+    def _find_cut(self, start: int) -> int:
+        """Pick a window end near start + window at the lowest-energy frame."""
+        end = start + self.window_samples
+        search_start = end - self.search_samples
+        region = self._samples(search_start, end)
+        frames = len(region) // self.frame_samples
+        if frames == 0:
+            return end
+        energy = np.square(region[:frames * self.frame_samples]).reshape(frames, -1).mean(axis=1)
+        quietest = int(np.argmin(energy))
+        return search_start + (quietest + 1) * self.frame_samples
+
+    def _decode(self, start: int, end: int) -> str:
+        prompt = self.partial_text[-self.prompt_chars:]
+        return self.transcribe_fn(self._samples(start, end), prompt).strip()
+
+    async def _decode_ready_windows(self):
+        while self.total_samples - self.decoded_samples >= self.window_samples:
+            start = self.decoded_samples
+            end = self._find_cut(start)
+            self.partials.append(await self.run(self._decode, start, end))
+            self.decoded_samples = end
+            self.windows_decoded += 1
+
+    def schedule(self):
+        """Start decoding completed windows in the background, if any are ready."""
+        if self._task is not None and not self._task.done():
+            return
+        if self.total_samples - self.decoded_samples < self.window_samples:
+            return
+        self._task = asyncio.ensure_future(self._decode_ready_windows())
+        # A failed background window (e.g. a full job queue) is simply decoded again later
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def finalize(self) -> str:
+        """Wait for in-flight windows, decode the remaining tail and return the full text."""
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                log.warning("[ASR] Background window decode failed, decoding it with the tail: %s", e)
+            self._task = None
+        await self._decode_ready_windows()
+        if self.total_samples > self.decoded_samples:
+            start, end = self.decoded_samples, self.total_samples
+            self.partials.append(await self.run(self._decode, start, end))
+            self.decoded_samples = end
+        return self.partial_text
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import re
+import subprocess
+import wave
+from typing import List, Optional
+
+import numpy as np
+
+# Abbreviations whose dot never ends a sentence ("np. banan", "dr Kowalski")
+ABBREVIATIONS = {
+    "np", "tzw", "tj", "ok", "godz", "ul", "nr", "dr", "prof", "mgr", "inż", "wg", "ds",
+    "m.in", "e.g", "i.e"
+}
+# Abbreviations that end a sentence only when a capital letter follows ("100 zł. Potem...")
+TRAILING_ABBREVIATIONS = {"itd", "itp", "zł", "gr", "tys", "mln", "mld", "proc", "min", "r", "w"}
+# A sentence ends at . ! ? or … followed by whitespace
+_BOUNDARY = re.compile(r"([.!?…]+)[\"')\]]*\s+")
+
+
+def wav_bytes(pcm16: bytes, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)  # mono
+        wav_file.setsampwidth(2)  # 16-bit = 2 bytes
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm16)
+    return buffer.getvalue()
+
+
+class SentenceSplitter:
+    """
+    Cuts a stream of LLM tokens into sentences as soon as each one is complete.
+
+    feed() returns the sentences finished by the new token; flush() returns
+    whatever is left once the stream ends.
+    """
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def _is_boundary(self, text: str, match: "re.Match") -> bool:
+        if match.group(1) != ".":
+            return True
+        before = text[:match.start()]
+        last_word = before.rsplit(None, 1)[-1].lower() if before.strip() else ""
+        if last_word in ABBREVIATIONS or last_word.isdigit():
+            return False  # "np. banan", "3. miejsce"
+        if last_word in TRAILING_ABBREVIATIONS:
+            following = text[match.end():match.end() + 1]
+            return following.isupper()
+        return True
+
+    def feed(self, token: str) -> List[str]:
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars or not self._is_boundary(self.buffer, match):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+class TTSEngine:
+    """Text to WAV bytes. Implementations must be safe to call from worker threads."""
+
+    name = "base"
+    sample_rate = 16000
+
+    def synthesize(self, text: str) -> bytes:
+        raise NotImplementedError
+
+
+class StubTTS(TTSEngine):
+    """
+    Stand-in engine with no dependencies: a soft tone whose length follows
+    the text, so devices and benchmarks see realistic audio sizes.
+    """
+
+    name = "stub"
+
+    def __init__(self, seconds_per_char: float = 0.06, sample_rate: int = 16000):
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text: str) -> bytes:
+        samples = max(1, int(len(text) * self.seconds_per_char * self.sample_rate))
+        t = np.arange(samples, dtype=np.float32) / self.sample_rate
+        tone = (0.1 * np.sin(2 * np.pi * 220.0 * t) * 32767).astype("<i2")
+        return wav_bytes(tone.tobytes(), self.sample_rate)
+
+
+class PiperTTS(TTSEngine):
+    """Local Polish TTS through the piper CLI (e.g. pl_PL-gosia-medium.onnx)"""
+
+    name = "piper"
+
+    def __init__(self, model_path: str, binary: str = "piper"):
+        self.model_path = model_path
+        self.binary = binary
+        self.sample_rate = 22050
+        config_path = model_path + ".json"
+        if os.path.exists(config_path):
+            with open(config_path) as config_file:
+                self.sample_rate = json.load(config_file).get("audio", {}).get("sample_rate", self.sample_rate)
+
+    def synthesize(self, text: str) -> bytes:
+        result = subprocess.run(
+            [self.binary, "--model", self.model_path, "--output_raw", "--quiet"],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            check=True
+        )
+        return wav_bytes(result.stdout, self.sample_rate)
+
+
+def load_tts(engine: Optional[str] = None) -> TTSEngine:
+    engine = engine or os.getenv("TTS_ENGINE", "stub")
+    if engine == "piper":
+        model_path = os.getenv("PIPER_MODEL")
+        if not model_path:
+            raise ValueError("PIPER_MODEL must point to a piper .onnx voice when TTS_ENGINE=piper")
+        return PiperTTS(model_path, binary=os.getenv("PIPER_BINARY", "piper"))
+    if engine == "stub":
+        return StubTTS()
+    raise ValueError(f"Unknown TTS engine '{engine}', expected 'stub' or 'piper'")
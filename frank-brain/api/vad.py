@@ -0,0 +1,192 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from api.audio import WHISPER_SAMPLE_RATE, SILENCE_DB
+
+# (offset in chunk, offset in original audio, length) in samples
+Piece = Tuple[int, int, int]
+
+
+class VoiceActivityDetector:
+    """
+    Frame energy + zero-crossing rate speech detector for 16kHz float32 audio.
+
+    A frame is speech when its energy is `margin_db` above the clip's noise
+    floor (10th percentile of frame energies) and above `min_energy_db`, or
+    when it is a bit quieter but crosses zero often enough to be a fricative
+    ("sz", "ś", "cz"). Frames louder than `loud_energy_db` are speech
+    whatever the floor, so a clip that is loud all the way through (no
+    pause to measure the floor in) is not rejected. Detected runs are merged across short pauses, padded,
+    and runs shorter than `min_segment_ms` (button clicks) are dropped.
+    Everything is computed on whole arrays - no per-sample Python.
+    """
+
+    def __init__(
+        self,
+        frame_ms: int = 20,
+        margin_db: float = 12.0,
+        min_energy_db: float = -55.0,
+        zcr_threshold: float = 0.3,
+        min_segment_ms: int = 100,
+        min_speech_ms: int = 200,
+        merge_pause_ms: int = 400,
+        pad_ms: int = 200,
+        max_chunk_seconds: float = 25.0,
+        loud_energy_db: float = -35.0,
+        cut_search_seconds: float = 2.0,
+        sample_rate: int = WHISPER_SAMPLE_RATE
+    ):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.zcr_threshold = zcr_threshold
+        self.min_segment_frames = max(1, min_segment_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.merge_pause_frames = max(1, merge_pause_ms // frame_ms)
+        self.pad = int(sample_rate * pad_ms / 1000)
+        self.max_chunk = int(sample_rate * max_chunk_seconds)
+        self.loud_energy_db = loud_energy_db
+        self.cut_search = int(sample_rate * cut_search_seconds)
+
+    @classmethod
+    def from_env(cls) -> "VoiceActivityDetector":
+        return cls(
+            margin_db=float(os.getenv("VAD_MARGIN_DB", "12")),
+            min_energy_db=float(os.getenv("VAD_MIN_ENERGY_DB", "-55")),
+            min_speech_ms=int(os.getenv("VAD_MIN_SPEECH_MS", "200")),
+            max_chunk_seconds=float(os.getenv("VAD_MAX_CHUNK_SECONDS", "25")),
+            loud_energy_db=float(os.getenv("VAD_LOUD_ENERGY_DB", "-35"))
+        )
+
+    def frame_features(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-frame energy in dBFS and zero-crossing rate"""
+        n = len(audio) // self.frame
+        frames = audio[:n * self.frame].reshape(n, self.frame)
+        energy = np.einsum("ij,ij->i", frames, frames) / self.frame
+        energy_db = np.maximum(10.0 * np.log10(energy + 1e-12), SILENCE_DB)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame - 1)
+        return energy_db, zcr
+
+    def analyze(self, audio: np.ndarray) -> Tuple[List[Tuple[int, int]], Dict[str, Any]]:
+        """
+        Find speech in a clip
+
+        Args:
+            audio (np.ndarray): 16kHz mono float32
+
+        Returns:
+            tuple: [(start, end), ...] speech segments in samples, and a summary dict
+        """
+        total_seconds = len(audio) / self.sample_rate
+        info = {"speech": False, "speech_seconds": 0.0, "total_seconds": total_seconds, "segments": 0}
+        if len(audio) < self.frame:
+            return [], info
+
+        energy_db, zcr = self.frame_features(audio)
+        noise_floor = float(np.percentile(energy_db, 10))
+        threshold = min(max(self.min_energy_db, noise_floor + self.margin_db), self.loud_energy_db)
+        voiced = energy_db > threshold
+        unvoiced = (energy_db > threshold - self.margin_db / 2) & (zcr > self.zcr_threshold)
+        mask = voiced | unvoiced
+        info.update(noise_floor_db=noise_floor, threshold_db=threshold)
+
+        # Run boundaries from the mask edges
+        edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            return [], info
+
+        # Bridge pauses shorter than merge_pause, then drop clicks
+        keep = (starts[1:] - ends[:-1]) >= self.merge_pause_frames
+        starts = np.concatenate((starts[:1], starts[1:][keep]))
+        ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+        long_enough = (ends - starts) >= self.min_segment_frames
+        starts, ends = starts[long_enough], ends[long_enough]
+
+        counts = np.concatenate(([0], np.cumsum(mask)))
+        speech_frames = int((counts[ends] - counts[starts]).sum())
+        if speech_frames < self.min_speech_frames:
+            return [], info
+
+        segments: List[Tuple[int, int]] = []
+        for s, e in zip(starts * self.frame - self.pad, ends * self.frame + self.pad):
+            s, e = max(0, int(s)), min(len(audio), int(e))
+            if segments and s <= segments[-1][1]:
+                segments[-1] = (segments[-1][0], e)
+            else:
+                segments.append((s, e))
+
+        info.update(
+            speech=True,
+            speech_seconds=sum(e - s for s, e in segments) / self.sample_rate,
+            segments=len(segments)
+        )
+        return segments, info
+
+    def trim(self, audio: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Cut leading and trailing silence; returns a view, or an empty array when there is no speech"""
+        segments, info = self.analyze(audio)
+        if not segments:
+            return audio[:0], info
+        return audio[segments[0][0]:segments[-1][1]], info
+
+    def _quietest_cut(self, audio: np.ndarray, start: int) -> int:
+        """End of the lowest-energy frame shortly before start + max_chunk, so a long segment is not cut mid-word"""
+        limit = start + self.max_chunk
+        search_start = max(start + self.frame, limit - self.cut_search)
+        frames = (limit - search_start) // self.frame
+        if frames == 0:
+            return limit
+        region = audio[limit - frames * self.frame:limit].reshape(frames, self.frame)
+        energy = np.einsum("ij,ij->i", region, region)
+        return limit - (frames - 1 - int(np.argmin(energy))) * self.frame
+
+    def chunks(self, audio: np.ndarray, segments: List[Tuple[int, int]]) -> List[Tuple[np.ndarray, List[Piece]]]:
+        """
+        Pack speech segments into chunks of at most `max_chunk` samples, leaving
+        out the pauses between segments. Segments longer than a chunk are cut
+        at the quietest frame in the last `cut_search` samples before the limit.
+
+        Returns [(chunk_audio, pieces)], where pieces map chunk offsets back to
+        the original audio for timestamps.
+        """
+        pieces: List[Piece] = []
+        for s, e in segments:
+            while e - s > self.max_chunk:
+                cut = self._quietest_cut(audio, s)
+                pieces.append((0, s, cut - s))
+                s = cut
+            pieces.append((0, s, e - s))
+
+        groups: List[List[Piece]] = []
+        filled = self.max_chunk
+        for _, start, length in pieces:
+            if filled + length > self.max_chunk:
+                groups.append([])
+                filled = 0
+            groups[-1].append((filled, start, length))
+            filled += length
+
+        result = []
+        for group in groups:
+            if len(group) == 1:
+                _, start, length = group[0]
+                chunk = audio[start:start + length]  # view, no copy
+            else:
+                chunk = np.concatenate([audio[start:start + length] for _, start, length in group])
+            result.append((chunk, group))
+        return result
+
+
+def to_original_time(seconds: float, pieces: List[Piece], sample_rate: int = WHISPER_SAMPLE_RATE) -> float:
+    """Map a timestamp inside a packed chunk back to the original recording"""
+    sample = seconds * sample_rate
+    for offset, start, length in reversed(pieces):
+        if sample >= offset:
+            return (start + min(sample - offset, length)) / sample_rate
+    return pieces[0][1] / sample_rate if pieces else seconds
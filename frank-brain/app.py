@@ -1,24 +1,20 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage,HumanMessage,SystemMessage
 from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
 from tools import add
+from agents.llm.gateway import get_gateway
 import os
 
 def setup_llm_from_env():
     load_dotenv()
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
-
-    if not api_key:
+    gateway = get_gateway()
+    # The stub backend (LLM_BACKEND=stub) answers offline and needs no key
+    if gateway.backend != "stub" and not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY not found in .env file")
 
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        openai_api_key=api_key,
-        base_url=api_base
-    )
+    # OPENAI_API_BASE, when set, is picked up by the gateway
+    llm = gateway.chat("app", model="gpt-4o-mini", temperature=0.7)
 
     return llm
 
@@ -0,0 +1,136 @@
+"""
+Routing accuracy and latency benchmark for the local intent router.
+
+Usage (from frank-brain/):
+
+    python benchmarks/router_bench.py [--repeat 200] [--json]
+
+The cases below are held out from the router's training examples.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.orchestrator.router import IntentRouter, INTENTS, SEARCH, CALORIES, KNOWLEDGE
+
+CASES = [
+    ("Jaka jest aktualna cena Bitcoina?", SEARCH),
+    ("Ile dziś kosztuje złoto?", SEARCH),
+    ("Kto wygrał ostatni wyścig Formuły 1?", SEARCH),
+    ("Jaka pogoda będzie w weekend w Poznaniu?", SEARCH),
+    ("Kiedy gra reprezentacja Polski?", SEARCH),
+    ("Jaki jest kurs franka szwajcarskiego?", SEARCH),
+    ("Co nowego u Elona Muska?", SEARCH),
+    ("Ile kosztuje nowa Tesla w Polsce?", SEARCH),
+    ("O której zamykają Lidla?", SEARCH),
+    ("Jakie są najnowsze wiadomości ze świata?", SEARCH),
+    ("Czy w sobotę będzie słońce?", SEARCH),
+    ("Kto prowadzi w tabeli Ekstraklasy?", SEARCH),
+    ("Gdzie jest najbliższa stacja benzynowa?", SEARCH),
+    ("Kiedy jest premiera nowego Wiedźmina?", SEARCH),
+    ("Ile kalorii ma jabłko?", CALORIES),
+    ("Zjadłem dwie kanapki z serem", CALORIES),
+    ("Ile kcal ma puszka piwa?", CALORIES),
+    ("Na kolację zjadłam sałatkę grecką", CALORIES),
+    ("Ile białka ma twaróg?", CALORIES),
+    ("Ile kalorii ma łyżka masła orzechowego?", CALORIES),
+    ("Wypiłem szklankę soku pomarańczowego", CALORIES),
+    ("Dodaj do dziennika dwa banany", CALORIES),
+    ("Ile tłuszczu ma boczek?", CALORIES),
+    ("Czy orzechy są kaloryczne?", CALORIES),
+    ("Ile kalorii zjadłem w tym tygodniu?", CALORIES),
+    ("Na śniadanie była jajecznica z trzech jaj", CALORIES),
+    ("Co to jest czarna dziura?", KNOWLEDGE),
+    ("Wyjaśnij mi teorię względności", KNOWLEDGE),
+    ("Dlaczego liście zmieniają kolor jesienią?", KNOWLEDGE),
+    ("Ile to jest siedem razy osiem?", KNOWLEDGE),
+    ("Przetłumacz kocham cię na hiszpański", KNOWLEDGE),
+    ("Opowiedz dowcip o gęsi", KNOWLEDGE),
+    ("Kim była Maria Skłodowska-Curie?", KNOWLEDGE),
+    ("Jak się mówi dobranoc po francusku?", KNOWLEDGE),
+    ("Jaka jest stolica Australii?", KNOWLEDGE),
+    ("Ile planet ma Układ Słoneczny?", KNOWLEDGE),
+    ("Jak zrobić naleśniki?", KNOWLEDGE),
+    ("Czym się różni pogoda od klimatu?", KNOWLEDGE),
+    ("Napisz rymowankę o kotach", KNOWLEDGE),
+    ("Jak działa magnes?", KNOWLEDGE),
+    ("Podaj antonim słowa wysoki", KNOWLEDGE),
+    ("Kto napisał Pana Tadeusza?", KNOWLEDGE),
+]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def run(repeat: int) -> dict:
+    started = time.perf_counter()
+    router = IntentRouter()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    confusion = {expected: {got: 0 for got in INTENTS} for expected in INTENTS}
+    methods = {"rule": 0, "ngram": 0, "fallback": 0}
+    mistakes = []
+    for text, expected in CASES:
+        decision = router.route(text)
+        confusion[expected][decision["intent"]] += 1
+        methods[decision["method"]] += 1
+        if decision["intent"] != expected:
+            mistakes.append({"text": text, "expected": expected, **decision})
+
+    latencies_us = []
+    for _ in range(repeat):
+        for text, _ in CASES:
+            t0 = time.perf_counter()
+            router.route(text)
+            latencies_us.append((time.perf_counter() - t0) * 1e6)
+
+    correct = sum(confusion[intent][intent] for intent in INTENTS)
+    # Sending a knowledge/calorie question to search is slow but not wrong; the reverse loses freshness
+    skipped_search = sum(confusion[intent][got] for intent in INTENTS for got in INTENTS if got != SEARCH)
+    return {
+        "cases": len(CASES),
+        "accuracy": correct / len(CASES),
+        "per_intent_recall": {
+            intent: confusion[intent][intent] / max(1, sum(confusion[intent].values())) for intent in INTENTS
+        },
+        "search_agent_skipped": skipped_search / len(CASES),
+        "methods": methods,
+        "confusion": confusion,
+        "mistakes": mistakes,
+        "build_ms": build_ms,
+        "latency_us": {
+            "mean": statistics.fmean(latencies_us),
+            "p50": percentile(latencies_us, 0.50),
+            "p95": percentile(latencies_us, 0.95),
+            "p99": percentile(latencies_us, 0.99)
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intent router accuracy/latency benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="timing passes over all cases")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON only")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"Accuracy: {report['accuracy']:.1%} on {report['cases']} cases "
+              f"(search agent skipped for {report['search_agent_skipped']:.0%})")
+        for intent, recall in report["per_intent_recall"].items():
+            print(f"  {intent:10s} recall {recall:.1%}")
+        print(f"Decided by: {report['methods']}")
+        latency = report["latency_us"]
+        print(f"Latency: p50 {latency['p50']:.1f} us, p95 {latency['p95']:.1f} us, p99 {latency['p99']:.1f} us "
+              f"(router built in {report['build_ms']:.1f} ms)")
+        for mistake in report["mistakes"]:
+            print(f"  MISS {mistake['text']!r}: expected {mistake['expected']}, got {mistake['intent']} "
+                  f"({mistake['method']}, {mistake['confidence']:.2f})")
@@ -0,0 +1,321 @@
+"""
+End-to-end load and latency benchmark for the voice API.
+
+Replays WAV fixtures against /transcribe, /stream and /chunk + /complete on
+the real FastAPI app, in-process (no network). The agents are the real ones
+(router, LangGraph orchestrator, web search with its multi-query search
+layer, answer cache, dietitian); only what is behind them is offline: the
+LLM gateway's stub backend and the fake search backend, each with a fixed
+latency, so runs are repeatable and free. ASR is a stand-in too unless
+--asr real is given. The answer, LLM and search caches are emptied on every
+write unless --warm-caches is given, so every turn pays for the full path.
+
+Usage (from frank-brain/):
+
+    python benchmarks/voice_api_bench.py [--requests 40] [--concurrency 4]
+        [--chunk-size 8192] [--codec pcm16|ima-adpcm|mulaw] [--asr stub|real]
+        [--llm-ms 400] [--search-ms 300] [--warm-caches] [--json] [--out report.json]
+
+Per-stage timings come from the Server-Timing header every response carries.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import wave
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+# Quiet, disk-free server defaults for benchmarking; explicit env vars still win
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CAPTURE_FRACTION", "0")
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import httpx
+import api.main as server
+from api.audio import WHISPER_SAMPLE_RATE, decode_wav_bytes
+from api.codecs import PCM16, IMA_ADPCM, MULAW, encode_ima_adpcm, encode_mulaw
+
+BITCOIN_WAV = os.path.join(ROOT, "..", "sketch_jul20a", "data", "aktualna_cena_bitcoin.wav")
+SCENARIOS = ("transcribe", "stream", "chunked")
+ENCODERS = {
+    PCM16: lambda pcm: pcm,
+    IMA_ADPCM: lambda pcm: encode_ima_adpcm(np.frombuffer(pcm, dtype="<i2")),
+    MULAW: lambda pcm: encode_mulaw(np.frombuffer(pcm, dtype="<i2"))
+}
+
+
+class StandInASR:
+    """Sleeps for `rtf` x audio duration and returns a fixed transcript"""
+
+    name = "stand-in"
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def transcribe(self, audio, initial_prompt=None):
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        return {"text": "Jaka jest aktualna cena bitcoina?", "language": "pl",
+                "segments": [{"start": 0.0, "end": duration, "text": "Jaka jest aktualna cena bitcoina?"}]}
+
+    def warmup(self):
+        pass
+
+
+def use_offline_backends(llm_ms: float, search_ms: float, warm_caches: bool):
+    """Point the real agents at the stub LLM and fake search; read when the agents are built"""
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_LATENCY"] = str(llm_ms / 1000)
+    os.environ["SEARCH_BACKEND"] = "fake"
+    os.environ["SEARCH_FAKE_LATENCY"] = str(search_ms / 1000)
+    os.environ.setdefault("ANSWER_CACHE_PATH", ":memory:")
+    if not warm_caches:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+        os.environ["LLM_CACHE_SIZE"] = "0"
+        os.environ["SEARCH_CACHE_TTL"] = "0"
+
+
+def synthetic_speech(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """Voiced syllables (harmonic stack, ~4 Hz envelope) with noise bursts for fricatives, padded with silence"""
+    t = np.arange(int(seconds * WHISPER_SAMPLE_RATE)) / WHISPER_SAMPLE_RATE
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / WHISPER_SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    fricatives = rng.standard_normal(len(t)) * (np.sin(2 * np.pi * 4 * t + np.pi) > 0.8)
+    speech = 0.2 * voiced * envelope + 0.05 * fricatives
+    pad = np.zeros(int(0.8 * WHISPER_SAMPLE_RATE))
+    audio = np.concatenate((pad, speech, pad)) + rng.standard_normal(len(speech) + 2 * len(pad)) * 0.001
+    return audio.astype(np.float32)
+
+
+def silence(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    return (rng.standard_normal(int(seconds * WHISPER_SAMPLE_RATE)) * 0.001).astype(np.float32)
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def to_wav(pcm16: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(WHISPER_SAMPLE_RATE)
+        wav_file.writeframes(pcm16)
+    return buffer.getvalue()
+
+
+def load_fixtures(speech_seconds: float, codec: str = PCM16) -> dict:
+    rng = np.random.default_rng(0)
+    clips = {
+        "synthetic_speech": synthetic_speech(speech_seconds, rng),
+        "silence": silence(3.0, rng)
+    }
+    if os.path.exists(BITCOIN_WAV):
+        with open(BITCOIN_WAV, "rb") as f:
+            clips = {"aktualna_cena_bitcoin": decode_wav_bytes(f.read())[0], **clips}
+    fixtures = {}
+    for name, audio in clips.items():
+        pcm = to_pcm16(audio)
+        fixtures[name] = {"pcm": pcm, "wav": to_wav(pcm), "upload": ENCODERS[codec](pcm), "codec": codec,
+                          "seconds": len(audio) / WHISPER_SAMPLE_RATE}
+    return fixtures
+
+
+def parse_server_timing(header: str) -> dict:
+    stages = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            stages[name] = stages.get(name, 0.0) + float(duration)
+    return stages
+
+
+def split_upload(fixture: dict, chunk_size: int) -> list:
+    """Chunks of the encoded upload; ADPCM chunks are cut on block boundaries like the device does"""
+    if fixture["codec"] == IMA_ADPCM:
+        chunk_size = max(chunk_size - chunk_size % 256, 256)
+    upload = fixture["upload"]
+    return [upload[i:i + chunk_size] for i in range(0, len(upload), chunk_size)]
+
+
+def response_error(response: httpx.Response) -> Optional[str]:
+    """None for a successful response, else a short reason for the errors histogram"""
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        if isinstance(body, dict) and "error" in body:
+            return f"error: {str(body['error'])[:120]}"
+    return None
+
+
+async def one_request(client: httpx.AsyncClient, scenario: str, fixture: dict, chunk_size: int, index: int):
+    """Returns (error or None, stage_ms); chunked uploads sum stages over all their requests"""
+    stages: dict = {}
+
+    def collect(response: httpx.Response):
+        for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+            stages[name] = stages.get(name, 0.0) + ms
+
+    if scenario == "transcribe":
+        response = await client.post("/transcribe/", files={"file": ("clip.wav", fixture["wav"], "audio/wav")})
+        collect(response)
+        return response_error(response), stages
+    codec_headers = {"X-Audio-Codec": fixture["codec"]}
+    if scenario == "stream":
+        response = await client.post("/stream/", content=fixture["upload"], headers=codec_headers)
+        collect(response)
+        return response_error(response), stages
+
+    session_id = f"bench-{index}-{time.monotonic_ns()}"
+    chunks = split_upload(fixture, chunk_size)
+    for chunk_id, chunk in enumerate(chunks):
+        response = await client.post("/chunk", content=chunk, headers={
+            "X-Session-ID": session_id, "X-Chunk-ID": str(chunk_id), "X-Total-Chunks": str(len(chunks)),
+            **codec_headers
+        })
+        collect(response)
+        if response.status_code != 200:
+            return f"/chunk {response_error(response)}", stages
+    response = await client.post("/complete", json={"session_id": session_id})
+    collect(response)
+    return response_error(response), stages
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {"mean": statistics.fmean(ordered), "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": ordered[-1]}
+
+
+async def run_case(client, scenario: str, fixture: dict, requests: int, concurrency: int, chunk_size: int) -> dict:
+    latencies, stage_values, errors = [], {}, Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                error, stages = await one_request(client, scenario, fixture, chunk_size, index)
+            except Exception as e:
+                # Kept, so a misconfigured run (missing package, broken stub backend) shows its cause
+                error, stages = f"{type(e).__name__}: {str(e)[:120]}", {}
+            latencies.append((time.perf_counter() - started) * 1000)
+            if error is not None:
+                errors[error] += 1
+            for name, ms in stages.items():
+                stage_values.setdefault(name, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "failures": sum(errors.values()),
+        "errors": dict(errors.most_common()),
+        "wall_s": wall,
+        "throughput_rps": requests / wall,
+        "audio_seconds_per_s": requests * fixture["seconds"] / wall,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {name: summarize(values) for name, values in sorted(stage_values.items())}
+    }
+
+
+async def run(args) -> dict:
+    fixtures = load_fixtures(args.speech_seconds, args.codec)
+    if args.asr == "stub":
+        server.registry.register("asr", lambda: StandInASR(args.asr_rtf))
+    use_offline_backends(args.llm_ms, args.search_ms, args.warm_caches)
+    server.registry.register("tts", server.load_tts)
+
+    await server.startup_event()
+    # Load outside the timed runs
+    server.registry.get("asr")
+    server.registry.get("orchestrator")
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for scenario in args.scenarios:
+                for name, fixture in fixtures.items():
+                    results[f"{scenario}/{name}"] = await run_case(
+                        client, scenario, fixture, args.requests, args.concurrency, args.chunk_size
+                    )
+    finally:
+        await server.shutdown_event()
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "chunk_size": args.chunk_size,
+            "codec": args.codec,
+            "asr": args.asr,
+            "asr_rtf": args.asr_rtf if args.asr == "stub" else None,
+            "llm_ms": args.llm_ms,
+            "search_ms": args.search_ms,
+            "warm_caches": args.warm_caches,
+            "workers": server.job_queue.workers,
+            "fixtures": {name: round(fixture["seconds"], 2) for name, fixture in fixtures.items()},
+            "upload": {name: {"bytes": len(fixture["upload"]), "chunks": len(split_upload(fixture, args.chunk_size))}
+                       for name, fixture in fixtures.items()}
+        },
+        "results": results,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is KiB on Linux
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voice API load/latency benchmark")
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario and fixture")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--chunk-size", type=int, default=8192, help="bytes per /chunk upload")
+    parser.add_argument("--codec", choices=sorted(ENCODERS), default=PCM16, help="upload codec for /stream and /chunk")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--speech-seconds", type=float, default=4.0, help="length of the synthetic speech clip")
+    parser.add_argument("--asr", choices=("stub", "real"), default="stub", help="stand-in or the configured ASR backend")
+    parser.add_argument("--asr-rtf", type=float, default=0.1, help="stand-in ASR seconds per second of audio")
+    parser.add_argument("--llm-ms", type=float, default=400, help="stub LLM latency per call")
+    parser.add_argument("--search-ms", type=float, default=300, help="fake web search latency per query")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="keep the answer, LLM and search caches, so repeated questions mostly hit them")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON only")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'case':40s} {'rps':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'fail':>5s}")
+        for case, result in report["results"].items():
+            latency = result["latency_ms"]
+            print(f"{case:40s} {result['throughput_rps']:7.1f} {latency['p50']:9.1f} {latency['p95']:9.1f} "
+                  f"{latency['p99']:9.1f} {result['failures']:5d}")
+            for stage, stats in result["stages_ms"].items():
+                print(f"    {stage:36s} {'':7s} {stats['p50']:9.1f} {stats['p95']:9.1f} {stats['p99']:9.1f}")
+            for error, count in result["errors"].items():
+                print(f"    ! {count}x {error}")
+        for name, upload in report["config"]["upload"].items():
+            print(f"Upload {name} ({args.codec}): {upload['bytes']} bytes, {upload['chunks']} chunks")
+        print(f"Peak RSS: {report['peak_rss_mb']:.1f} MB")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other from the frank-brain root, as api/main.py sets up
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
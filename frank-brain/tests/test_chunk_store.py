@@ -0,0 +1,122 @@
+import pytest
+
+from api.chunk_store import ChunkStore, ChunkStoreFullError, InvalidChunkError, SessionTooLargeError
+
+KB = 1024
+
+
+def fill(store, session_id, total, stride=KB, last=None):
+    for chunk_id in range(total):
+        size = last if last is not None and chunk_id == total - 1 else stride
+        store.put(session_id, chunk_id, total, bytes([chunk_id % 256]) * size)
+    return store.get(session_id)
+
+
+def test_session_assembles_in_place():
+    store = ChunkStore()
+    session = fill(store, "a", 4, last=100)
+    assert session.complete
+    assert session.size == 3 * KB + 100
+    assert bytes(session.data()[KB:KB + 2]) == b"\x01\x01"
+    assert store.memory_bytes == 4 * KB
+
+
+def test_out_of_order_and_duplicates():
+    store = ChunkStore()
+    store.put("a", 2, 3, b"c" * 10)
+    store.put("a", 0, 3, b"a" * KB)
+    assert store.get("a").next_chunk == 1
+    store.put("a", 0, 3, b"a" * KB)
+    session = store.put("a", 1, 3, b"b" * KB)
+    assert session.complete and session.duplicates == 1
+    assert session.contiguous_bytes == session.size == 2 * KB + 10
+
+
+def test_chunk_size_is_checked():
+    store = ChunkStore()
+    store.put("a", 0, 3, b"a" * KB)
+    with pytest.raises(InvalidChunkError):
+        store.put("a", 1, 3, b"b" * (KB - 1))
+    with pytest.raises(InvalidChunkError):
+        store.put("a", 2, 3, b"c" * (KB + 1))
+    with pytest.raises(InvalidChunkError):
+        store.put("a", 1, 4, b"b" * KB)
+
+
+def test_pending_last_chunk_is_counted():
+    store = ChunkStore(max_memory_bytes=10 * KB)
+    store.put("a", 3, 4, b"z" * 300)
+    assert store.memory_bytes == 300
+    store.put("a", 3, 4, b"z" * 200)  # retransmit replaces the held copy
+    assert store.memory_bytes == 200
+    with pytest.raises(ChunkStoreFullError):
+        store.put("b", 1, 2, b"y" * (10 * KB))
+    assert store.memory_bytes == 200
+
+    for chunk_id in range(3):
+        session = store.put("a", chunk_id, 4, b"a" * KB)
+    assert session.pending_last is None
+    assert session.complete and session.size == 3 * KB + 200
+    assert store.memory_bytes == 4 * KB
+
+
+def test_pop_keeps_bytes_counted_until_release():
+    store = ChunkStore()
+    fill(store, "a", 4)
+    session = store.pop("a")
+    assert "a" not in store
+    assert store.memory_bytes == 4 * KB
+    store.release(session)
+    assert store.memory_bytes == 0
+    store.release(session)
+    assert store.memory_bytes == 0
+
+
+def test_discard_releases_pending_only_session():
+    store = ChunkStore()
+    store.put("a", 1, 2, b"z" * 100)
+    store.discard("a")
+    assert store.memory_bytes == 0 and "a" not in store
+
+
+def test_large_sessions_spill_and_caps_hold():
+    store = ChunkStore(max_session_bytes=64 * KB, spill_bytes=8 * KB, max_spill_bytes=32 * KB)
+    with pytest.raises(SessionTooLargeError):
+        store.put("huge", 0, 65, b"x" * KB)
+    session = fill(store, "a", 16, stride=2 * KB)
+    assert session.spilled
+    assert store.spill_bytes_used == 32 * KB and store.memory_bytes == 0
+    with pytest.raises(ChunkStoreFullError):
+        store.put("b", 0, 16, b"x" * KB)
+    assert store.stats()["rejected"] == 2
+
+
+def test_buffer_in_use_stays_counted_until_view_released():
+    store = ChunkStore(spill_bytes=4 * KB, max_spill_bytes=16 * KB)
+    session = fill(store, "a", 8, stride=2 * KB)
+    assert session.spilled
+    view = session.data()  # what a decode thread holds while /complete runs
+
+    store.release(store.pop("a"))
+    assert store.stats()["lingering_sessions"] == 1
+    assert store.spill_bytes_used == 16 * KB
+    with pytest.raises(ChunkStoreFullError):
+        store.put("b", 0, 8, b"x" * (2 * KB))
+    assert bytes(view[:2]) == b"\x00\x00"
+
+    view.release()
+    session = fill(store, "b", 8, stride=2 * KB)
+    assert store.stats()["lingering_sessions"] == 0
+    assert store.spill_bytes_used == 16 * KB
+    store.discard("b")
+    assert store.spill_bytes_used == 0
+
+
+def test_evict_idle_skips_completing_sessions():
+    store = ChunkStore(ttl=10)
+    fill(store, "idle", 2)
+    fill(store, "busy", 2).completing = True
+    now = store.get("idle").last_activity + 11
+    assert store.evict_idle(now) == 1
+    assert "idle" not in store and "busy" in store
+    assert store.memory_bytes == 2 * KB
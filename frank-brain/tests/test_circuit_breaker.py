@@ -0,0 +1,125 @@
+import asyncio
+import importlib.util
+import os
+import time
+
+import pytest
+
+GROCERY_DIR = os.path.join(os.path.dirname(__file__), "..", "agents", "grocery-list")
+
+
+def load(name):
+    # agents/grocery-list is not an importable package
+    spec = importlib.util.spec_from_file_location(f"grocery_{name}", os.path.join(GROCERY_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+client = load("client")
+stub = load("stub_server")
+
+
+def test_opens_after_threshold():
+    breaker = client.CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.admit() == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.admit() is None
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count():
+    breaker = client.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_admits_a_single_trial():
+    breaker = client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.admit() == "trial"
+    assert breaker.admit() is None
+
+    breaker.release_trial()
+    assert breaker.admit() == "trial"
+
+
+def test_trial_outcome_closes_or_reopens():
+    breaker = client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.admit() == "trial"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.admit() == "trial"
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+@pytest.fixture
+def service():
+    server, url, config = stub.start_stub_server(fail_rate=1.0)
+    yield url, config
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_fails_fast_and_recovers(service):
+    url, config = service
+    breaker = client.CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    grocery = client.GroceryServiceClient(url, retries=0, backoff=0, breaker=breaker)
+    try:
+        for _ in range(2):
+            status, _, _ = grocery.convert("mleko i chleb")
+            assert status == 503
+        assert breaker.state == "open"
+
+        requests_before = config.requests
+        with pytest.raises(client.CircuitOpenError):
+            grocery.convert("mleko i chleb")
+        assert config.requests == requests_before
+
+        config.fail_rate = 0.0
+        time.sleep(0.11)
+        status, body, _ = grocery.convert("mleko i chleb")
+        assert status == 200
+        assert body["items"] == ["mleko", "chleb"]
+        assert breaker.state == "closed"
+    finally:
+        grocery.close()
+
+
+def test_async_client_shares_the_breaker(service):
+    url, config = service
+    breaker = client.CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    grocery = client.GroceryServiceClient(url, retries=0, backoff=0, breaker=breaker)
+
+    async def scenario():
+        try:
+            status, _, _ = await grocery.aconvert("jajka")
+            assert status == 503
+            requests_before = config.requests
+            with pytest.raises(client.CircuitOpenError):
+                await grocery.aconvert("jajka")
+            assert config.requests == requests_before
+
+            config.fail_rate = 0.0
+            await asyncio.sleep(0.11)
+            status, body, _ = await grocery.aconvert("jajka")
+            assert (status, body["items"]) == (200, ["jajka"])
+        finally:
+            await grocery.aclose()
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from api.codecs import (
+    ADPCM_BLOCK_BYTES, IMA_ADPCM, MULAW, PCM16, CodecError, _INDEX_ADJUST, _STEPS,
+    decode, decode_ima_adpcm, decode_mulaw, encode_ima_adpcm, encode_mulaw
+)
+
+BLOCK_SAMPLES = 1 + 2 * (ADPCM_BLOCK_BYTES - 4)  # 505
+
+
+def speech_like(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 16000
+    signal = 8000 * np.sin(2 * np.pi * 220 * t) + 2000 * np.sin(2 * np.pi * 1250 * t) + rng.normal(0, 300, n)
+    return signal.astype(np.int16)
+
+
+def snr_db(original, decoded):
+    error = original.astype(np.float64) - decoded
+    return 10 * np.log10((original.astype(np.float64) ** 2).sum() / max(1.0, (error ** 2).sum()))
+
+
+def reference_decode(data, block_bytes=ADPCM_BLOCK_BYTES):
+    """Straight per-sample IMA-ADPCM decoder to check the vectorised one against"""
+    steps, adjust = _STEPS.tolist(), _INDEX_ADJUST.tolist()
+    out = []
+    for start in range(0, len(data), block_bytes):
+        block = data[start:start + block_bytes]
+        predictor = int.from_bytes(block[0:2], "little", signed=True)
+        index = block[2]
+        out.append(predictor)
+        for byte in block[4:]:
+            for code in (byte & 0x0F, byte >> 4):
+                step = steps[index]
+                diff = step >> 3
+                if code & 4:
+                    diff += step
+                if code & 2:
+                    diff += step >> 1
+                if code & 1:
+                    diff += step >> 2
+                predictor += -diff if code & 8 else diff
+                predictor = max(-32768, min(32767, predictor))
+                index = max(0, min(88, index + adjust[code]))
+                out.append(predictor)
+    return np.array(out, dtype=np.int16)
+
+
+def adpcm_length(n):
+    # A block holds a header sample plus pairs of codes, so a final block
+    # with an even sample count decodes one padding sample more
+    last = n - (n - 1) // BLOCK_SAMPLES * BLOCK_SAMPLES
+    return n + (1 - last % 2)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 504, 505, 506, 507, 1011, 16000, 16001])
+def test_adpcm_round_trip(n):
+    samples = speech_like(n)
+    decoded = decode_ima_adpcm(encode_ima_adpcm(samples))
+    assert decoded.dtype == np.int16
+    assert decoded.size == adpcm_length(n)
+    assert snr_db(samples, decoded[:n]) > 25
+
+
+@pytest.mark.parametrize("n", [2, 505, 1011, 4000])
+def test_adpcm_matches_reference_decoder(n):
+    samples = speech_like(n, seed=n)
+    data = encode_ima_adpcm(samples)
+    np.testing.assert_array_equal(decode_ima_adpcm(data), reference_decode(data))
+
+
+def test_adpcm_full_scale_clips_like_reference():
+    t = np.arange(3000) / 16000
+    samples = np.clip(32767 * np.sin(2 * np.pi * 440 * t) * 1.2, -32768, 32767).astype(np.int16)
+    data = encode_ima_adpcm(samples)
+    np.testing.assert_array_equal(decode_ima_adpcm(data), reference_decode(data))
+
+
+@pytest.mark.parametrize("tail", [1, 2, 3])
+def test_adpcm_truncated_block_is_an_error(tail):
+    data = encode_ima_adpcm(speech_like(BLOCK_SAMPLES))
+    with pytest.raises(CodecError):
+        decode_ima_adpcm(data + data[:tail])
+
+
+def test_adpcm_via_decode():
+    samples = speech_like(1011)
+    decoded = decode(IMA_ADPCM, encode_ima_adpcm(samples), {"block": str(ADPCM_BLOCK_BYTES)})
+    assert decoded.size == 1011
+
+
+@pytest.mark.parametrize("n", [1, 7, 160, 161])
+def test_mulaw_round_trip(n):
+    samples = speech_like(n)
+    data = encode_mulaw(samples)
+    assert len(data) == n
+    decoded = decode_mulaw(data)
+    assert decoded.size == n
+    np.testing.assert_array_equal(decode(MULAW, data), decoded)
+
+
+def test_mulaw_error_is_relative_to_magnitude():
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    decoded = decode_mulaw(encode_mulaw(samples.astype(np.int16))).astype(np.int32)
+    error = np.abs(decoded - samples)
+    assert error[np.abs(samples) < 256].max() <= 8
+    assert (error / np.maximum(np.abs(samples), 256)).max() < 0.05
+    assert np.all(np.sign(decoded[np.abs(samples) > 64]) == np.sign(samples[np.abs(samples) > 64]))
+
+
+def test_pcm16_drops_odd_trailing_byte():
+    samples = np.array([1, -2, 32767, -32768], dtype="<i2")
+    decoded = decode(PCM16, samples.tobytes() + b"\x01")
+    np.testing.assert_array_equal(decoded, samples)
@@ -0,0 +1,67 @@
+import pytest
+
+from agents.dietitian.nutrition import NutritionIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return NutritionIndex.load()
+
+
+@pytest.mark.parametrize("text, food, grams", [
+    ("ile kalorii ma banan", "banan", 120),
+    ("ile kalorii ma 100g chleba", "chleb", 100),
+    ("ile kalorii ma pół litra mleka", "mleko", 500),
+    ("ile kcal ma puszka piwa", "piwo", 330),
+    ("ile kalorii ma 1,5 kg ziemniaków", "ziemniak", 1500),
+    ("ile kalorii mają 3 jajka", "jajko", 165),
+])
+def test_lookup_portions(index, text, food, grams):
+    result = index.lookup(text)
+    assert result["food"] == food
+    assert result["grams"] == pytest.approx(grams)
+    assert result["kcal"] == pytest.approx(result["kcal_100g"] * grams / 100, abs=0.1)
+    assert result["match"] == "exact"
+
+
+def test_lookup_units(index):
+    assert index.lookup("ile kalorii ma banan")["unit"] == "piece"
+    assert index.lookup("ile kalorii ma pół litra mleka")["unit"] == "ml"
+    assert index.lookup("ile kalorii ma 100g chleba")["kcal"] == pytest.approx(250)
+
+
+@pytest.mark.parametrize("text, food", [
+    ("ile kalorii ma jabko", "jabłko"),
+    ("ile kalorii ma ziemiak", "ziemniak"),
+])
+def test_lookup_tolerates_typos(index, text, food):
+    result = index.lookup(text)
+    assert (result["food"], result["match"]) == (food, "fuzzy")
+
+
+@pytest.mark.parametrize("text", [
+    "ile kalorii ma cola zero",
+    "ile kalorii ma piwo bezalkoholowe",
+    "ile kalorii ma łyżka masła orzechowego",
+    "ile kalorii ma sos",
+    "ile kalorii ma ryba",
+])
+def test_lookup_leaves_unknown_foods_to_search(index, text):
+    # A qualifier the table has no row for must not fall back to the plain food
+    assert index.lookup(text) is None
+
+
+def test_parse_items_splits_a_meal(index):
+    items = index.parse_items("zjadłem dwa jajka i kromkę chleba z masłem")
+    assert [(item["food"], item["grams"]) for item in items] == [("jajko", 110), ("chleb", 35), ("masło", 10)]
+    assert items[0]["amount"] == 2
+
+
+def test_parse_items_counts_words(index):
+    items = index.parse_items("zjadłem dwie kanapki z serem")
+    assert [item["food"] for item in items] == ["kanapka", "ser żółty"]
+    assert items[0]["grams"] == pytest.approx(200)
+
+
+def test_parse_items_rejects_partly_unknown_meal(index):
+    assert index.parse_items("na śniadanie była jajecznica z trzech jaj") is None
@@ -0,0 +1,26 @@
+import pytest
+
+from agents.orchestrator.router import CALORIES, KNOWLEDGE, SEARCH, IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("ile kalorii ma banan", CALORIES),
+    ("jaka jest aktualna cena bitcoina", SEARCH),
+    ("co to jest fotosynteza", KNOWLEDGE),
+])
+def test_rules(router, text, intent):
+    decision = router.route(text)
+    assert (decision["intent"], decision["method"]) == (intent, "rule")
+    assert 0 < decision["confidence"] <= 1
+
+
+def test_every_text_gets_an_intent(router):
+    for text in ("", "hmm", "opowiedz mi coś ciekawego o gęsiach"):
+        decision = router.route(text)
+        assert decision["intent"] in (SEARCH, CALORIES, KNOWLEDGE)
+        assert decision["method"] in ("rule", "ngram", "fallback")
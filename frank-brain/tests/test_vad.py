@@ -0,0 +1,47 @@
+import numpy as np
+
+from api.vad import VoiceActivityDetector, to_original_time
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.3, freq=200):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def silence(seconds, noise=0.0):
+    rng = np.random.default_rng(0)
+    return (noise * rng.standard_normal(int(seconds * RATE))).astype(np.float32)
+
+
+def test_silence_and_noise_are_not_speech():
+    vad = VoiceActivityDetector()
+    for audio in (silence(2), silence(2, noise=0.001)):
+        segments, info = vad.analyze(audio)
+        assert segments == [] and not info["speech"]
+
+
+def test_loud_clip_without_pauses_is_speech():
+    segments, info = VoiceActivityDetector().analyze(tone(2))
+    assert info["speech"]
+    assert segments == [(0, 2 * RATE)]
+
+
+def test_trim_cuts_surrounding_silence():
+    vad = VoiceActivityDetector(pad_ms=0)
+    audio = np.concatenate((silence(1, noise=0.001), tone(1), silence(1, noise=0.001)))
+    trimmed, info = vad.trim(audio)
+    assert info["speech"]
+    assert abs(len(trimmed) - RATE) <= vad.frame * 2
+
+
+def test_long_segment_is_chunked_and_mapped_back():
+    vad = VoiceActivityDetector(max_chunk_seconds=2.0, cut_search_seconds=0.5)
+    audio = tone(5)
+    chunks = vad.chunks(audio, [(0, len(audio))])
+    assert len(chunks) == 3
+    assert all(len(chunk) <= vad.max_chunk for chunk, _ in chunks)
+    assert sum(len(chunk) for chunk, _ in chunks) == len(audio)
+    _, pieces = chunks[1]
+    assert to_original_time(0.0, pieces) == pieces[0][1] / RATE
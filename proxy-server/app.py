@@ -1,22 +1,256 @@
-from fastapi import FastAPI
-import platform
-from subprocess import run, PIPE
+"""
+Reverse proxy in front of frank-brain.
+
+Every request is forwarded to UPSTREAM_URL over a pooled keep-alive
+httpx client; request and response bodies are streamed through as they
+arrive (uploads, the SSE answer stream), never buffered. A background
+prober checks the upstream every PROBE_INTERVAL seconds and keeps its
+health and round-trip times, so /health answers from memory.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+log = logging.getLogger('proxy')
+
+SERVER_IP = os.getenv('SERVER_IP', '100.77.2.1')
+UPSTREAM_URL = os.getenv('UPSTREAM_URL', f'http://{SERVER_IP}:8000').rstrip('/')
+PROBE_PATH = os.getenv('PROBE_PATH', '/')
+PROBE_INTERVAL = float(os.getenv('PROBE_INTERVAL', '5'))
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', '2'))
+# Failed probes in a row before the upstream is reported down
+DOWN_AFTER = int(os.getenv('PROBE_DOWN_AFTER', '2'))
+
+# Milliseconds; LAN / tailscale round trips up to a struggling server
+RTT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+# Connection-level headers that must not be forwarded (RFC 9110 7.6.1)
+HOP_BY_HOP = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection', 'te',
+    'trailer', 'transfer-encoding', 'upgrade'
+}
 
 app = FastAPI()
 
-SERVER_IP = '100.77.2.1'
 
-@app.get('/health')
-def health_check():
-    param = '-c'
+class RttHistogram:
+    """Probe round trips: cumulative bucket counts plus the last few hundred samples for percentiles"""
 
-    try:
-        result = run(['ping', param, '3', SERVER_IP], stdout=PIPE, text=True, timeout=5)
+    def __init__(self, buckets=RTT_BUCKETS, recent: int = 256):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=recent)
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.recent.append(ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)], 2) if ordered else None
+
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count, 2) if self.count else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'buckets_ms': buckets
+        }
+
+
+class UpstreamMonitor:
+    """Probes the upstream in the background; /health reads the cached result"""
+
+    def __init__(self, client: httpx.AsyncClient, path: str = PROBE_PATH, interval: float = PROBE_INTERVAL,
+                 timeout: float = PROBE_TIMEOUT, down_after: int = DOWN_AFTER):
+        self.client = client
+        self.path = path
+        self.interval = interval
+        self.timeout = timeout
+        self.down_after = down_after
+        self.rtt = RttHistogram()
+        self.status = 'unknown'  # until the first probe finishes
+        self.failures = 0        # in a row
+        self.probes = 0
+        self.last_probe: Optional[float] = None
+        self.last_ok: Optional[float] = None
+        self.last_rtt_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self):
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(self.path, timeout=self.timeout)
+            ok = response.status_code < 500
+            error = None if ok else f'HTTP {response.status_code}'
+        except httpx.HTTPError as e:
+            ok, error = False, f'{type(e).__name__}: {e}'
+        rtt_ms = (time.perf_counter() - started) * 1000
+        self.probes += 1
+        self.last_probe = time.time()
+        if ok:
+            self.rtt.observe(rtt_ms)
+            self.last_rtt_ms = rtt_ms
+            self.last_ok = self.last_probe
+            self.failures = 0
+            self.status = 'up'
+        else:
+            self.failures += 1
+            self.last_error = error
+            if self.failures >= self.down_after or self.status == 'unknown':
+                if self.status != 'down':
+                    log.warning('[PROXY] Upstream %s down: %s', UPSTREAM_URL, error)
+                self.status = 'down'
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def to_dict(self) -> Dict[str, Any]:
         return {
+            'status': self.status,
             'ip': SERVER_IP,
-            'returncode': result.returncode,
-            'stdout': result.stdout,
-            'stderr': result.stderr
+            'upstream': UPSTREAM_URL,
+            'last_rtt_ms': round(self.last_rtt_ms, 2) if self.last_rtt_ms is not None else None,
+            'checked_ago_s': round(time.time() - self.last_probe, 1) if self.last_probe else None,
+            'last_ok_ago_s': round(time.time() - self.last_ok, 1) if self.last_ok else None,
+            'consecutive_failures': self.failures,
+            'last_error': self.last_error,
+            'probes': self.probes,
+            'rtt': self.rtt.to_dict()
         }
-    except Exception as e:
-        return {'error': str(e)}
\ No newline at end of file
+
+
+client: Optional[httpx.AsyncClient] = None
+monitor: Optional[UpstreamMonitor] = None
+forwarded = {'requests': 0, 'errors': 0, 'active': 0}
+
+
+@app.on_event('startup')
+async def startup_event():
+    global client, monitor
+    client = httpx.AsyncClient(
+        base_url=UPSTREAM_URL,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv('PROXY_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('PROXY_KEEPALIVE_CONNECTIONS', '20')),
+            keepalive_expiry=float(os.getenv('PROXY_KEEPALIVE_EXPIRY', '60'))
+        ),
+        # Long read timeout: an agent turn or a long SSE answer can take a while between bytes
+        timeout=httpx.Timeout(connect=5.0, read=float(os.getenv('PROXY_READ_TIMEOUT', '300')), write=60.0, pool=10.0)
+    )
+    monitor = UpstreamMonitor(client)
+    monitor.start()
+
+
+@app.on_event('shutdown')
+async def shutdown_event():
+    await monitor.stop()
+    await client.aclose()
+
+
+@app.get('/health')
+async def health_check():
+    """Upstream health and probe round trips from the background prober; never waits on the network"""
+    health = monitor.to_dict()
+    return JSONResponse(health, status_code=503 if health['status'] == 'down' else 200)
+
+
+@app.get('/proxy/stats')
+async def proxy_stats() -> Dict[str, Any]:
+    return {**forwarded, 'health': monitor.to_dict()}
+
+
+def forward_headers(request: Request) -> Dict[str, str]:
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP and k.lower() != 'host'}
+    client_ip = request.client.host if request.client else ''
+    previous = request.headers.get('x-forwarded-for')
+    headers['x-forwarded-for'] = f'{previous}, {client_ip}' if previous else client_ip
+    headers['x-forwarded-proto'] = request.url.scheme
+    headers['x-forwarded-host'] = request.headers.get('host', '')
+    return headers
+
+
+@app.api_route('/{path:path}', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'HEAD'])
+async def proxy(path: str, request: Request):
+    """Forward anything else to frank-brain, streaming both bodies"""
+    has_body = 'content-length' in request.headers or 'transfer-encoding' in request.headers
+    upstream_request = client.build_request(
+        request.method,
+        '/' + path,
+        params=request.query_params.multi_items(),
+        headers=forward_headers(request),
+        content=request.stream() if has_body else None
+    )
+    forwarded['requests'] += 1
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException as e:
+        forwarded['errors'] += 1
+        return JSONResponse({'detail': f'Upstream timeout: {e}'}, status_code=504)
+    except httpx.HTTPError as e:
+        forwarded['errors'] += 1
+        return JSONResponse({'detail': f'Upstream unavailable: {type(e).__name__}: {e}'}, status_code=502)
+
+    forwarded['active'] += 1
+    closed = False
+
+    async def close():
+        nonlocal closed
+        if not closed:
+            closed = True
+            forwarded['active'] -= 1
+            await upstream.aclose()
+
+    async def body():
+        # aiter_raw: bytes go out as they arrive, still compressed if the upstream compressed them
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await close()
+
+    # The background task also runs when the body generator was never started (client gone
+    # before the first send), which would otherwise leak the pooled connection and the counter
+    response = StreamingResponse(body(), status_code=upstream.status_code, background=BackgroundTask(close))
+    # raw_headers keeps repeated headers (Set-Cookie) that a dict would merge
+    response.raw_headers = [
+        (name.encode('latin-1'), value.encode('latin-1'))
+        for name, value in upstream.headers.multi_items() if name.lower() not in HOP_BY_HOP
+    ]
+    return response
@@ -2281,6 +2281,7 @@ void startRecording() {
   HTTPClient http;
   http.begin(String(serverURL) + "/start-recording");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", WiFi.macAddress());  // server keeps recording state per device
   
   int httpResponseCode = http.POST("");
   
@@ -2316,6 +2317,7 @@ void stopRecording() {
   HTTPClient http;
   http.begin(String(serverURL) + "/stop-recording");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", WiFi.macAddress());  // server keeps recording state per device
   
   int httpResponseCode = http.POST("");
   